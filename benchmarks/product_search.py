@@ -0,0 +1,87 @@
+"""
+Scaling benchmark for the in-memory product search (the inverted index of
+src/infra/storage/repositories/inmemory/product.py).
+
+Indexes synthetic catalogs of growing sizes and prints the time per search for
+queries matching a handful of products (a sku, its prefix, a typo of it),
+which stays flat as the catalog grows, and for a brand shared by 1% of the
+catalog, which grows with the number of matches rather than of products.
+
+    python -m benchmarks.product_search --max-products 1000000
+
+The index of a million products takes a bit over 6 GB of memory.
+"""
+
+import random
+import asyncio
+import argparse
+from time import perf_counter
+from typing import Optional
+
+from src.domain.product.models import Product
+from src.infra.storage.repositories.inmemory.product import ProductRepository
+
+WORDS = ["steel", "mug", "blue", "bottle", "lamp", "desk", "cable", "charger", "case", "pro"]
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+
+def code(rng: random.Random, length: int) -> str:
+    # random like real skus, sequential ones share most of their trigrams
+    return "".join(rng.choices(ALPHABET, k=length))
+
+
+def synthetic_product(number: int, rng: random.Random, brands: list[str]) -> Product:
+    return Product(
+        id=f"{number:012d}",
+        name=f"{brands[number % len(brands)]} {' '.join(rng.sample(WORDS, 3))} {code(rng, 8)}",
+        category_id=None,
+        description=" ".join(rng.choices(WORDS, k=8)),
+        price=9.99,
+    )
+
+
+async def timed(repository: ProductRepository, query: str, runs: int) -> float:
+    started = perf_counter()
+    for _ in range(runs):
+        await repository.search_products(query, 20)
+    return (perf_counter() - started) / runs
+
+
+async def run(max_products: int, runs: int) -> None:
+    rng = random.Random(0)
+    brands = [code(rng, 6) for _ in range(100)]
+    repository = ProductRepository()
+
+    def sku(size: int) -> str:
+        return repository.products[f"{size // 2:012d}"].name.split()[-1]
+
+    queries = {
+        "sku": sku,
+        "prefix": lambda size: sku(size)[:-2],
+        "typo": lambda size: sku(size)[:2] + sku(size)[3] + sku(size)[2] + sku(size)[4:],
+        "1% brand": lambda size: brands[7],
+    }
+    print(f"{'products':>12}" + "".join(f"{name:>16}" for name in queries))
+
+    size, indexed = 10_000, 0
+    while size <= max_products:
+        for number in range(indexed, size):
+            await repository.create_product(synthetic_product(number, rng, brands))
+        indexed = size
+
+        timings = [await timed(repository, query(size), runs) for query in queries.values()]
+        print(f"{size:>12}" + "".join(f"{t * 1e6:>13.0f} us" for t in timings))
+        size *= 10
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-products", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=20, help="searches per query and size")
+    args = parser.parse_args(argv)
+
+    asyncio.run(run(args.max_products, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Scaling benchmark for the in-memory sales bucketing (src/services/sales/bucketing.py).
+
+Buckets synthetic sales spread over a year at growing sizes and prints the time
+per sale, which stays flat when the cost is linear. Sales are generated lazily,
+so even 10M of them never sit in memory at once, generating them is timed on
+its own and taken out of the figures.
+
+    python -m benchmarks.sales_bucketing --max-sales 10000000
+"""
+
+import random
+import argparse
+from time import perf_counter
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, Optional
+
+from src.domain.sales.models import GRANULARITY_STEPS, Sale
+from src.services.sales.bucketing import bucket_sales
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=364)
+
+
+def synthetic_sales(count: int, seed: int = 0) -> Iterator[Sale]:
+    rng = random.Random(seed)
+    span = (END - START).total_seconds()
+    for _ in range(count):
+        quantity = rng.randint(1, 5)
+        yield Sale(
+            id="bench",
+            product_id="bench",
+            quantity=quantity,
+            total_price=quantity * 9.99,
+            created_at=START + timedelta(seconds=rng.random() * span),
+        )
+
+
+def timed(count: int, consume: Callable[[Iterator[Sale]], object]) -> float:
+    started = perf_counter()
+    consume(synthetic_sales(count))
+    return perf_counter() - started
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-sales", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    runs = {
+        "by day": lambda sales: bucket_sales(sales, START, END, GRANULARITY_STEPS["day"]),
+        "by week": lambda sales: bucket_sales(sales, START, END, GRANULARITY_STEPS["week"]),
+        "by month": lambda sales: bucket_sales(sales, START, END, GRANULARITY_STEPS["month"]),
+    }
+
+    print(f"{'sales':>12} " + " ".join(f"{name:>22}" for name in runs))
+
+    count = 10_000
+    while count <= args.max_sales:
+        # what it takes to only build and iterate the sales
+        baseline = timed(count, lambda sales: deque(sales, maxlen=0))
+
+        cells = []
+        for consume in runs.values():
+            seconds = timed(count, consume) - baseline
+            cells.append(f"{seconds:>8.2f}s {seconds / count * 1e9:>7.0f} ns/sale")
+
+        print(f"{count:>12} " + " ".join(f"{cell:>22}" for cell in cells))
+        count *= 10
+
+
+if __name__ == "__main__":
+    main()
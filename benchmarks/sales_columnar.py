@@ -0,0 +1,117 @@
+"""
+Memory and latency benchmark for the in-memory columnar sales store
+(src/infra/storage/repositories/columnar/sales.py).
+
+Fills a store with N synthetic sales spread over a year, then prints the memory
+its columns take per million sales and the time of the analytics queries.
+
+    python -m benchmarks.sales_columnar --sales 10000000
+"""
+
+import uuid
+import random
+import asyncio
+import argparse
+from time import perf_counter
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Iterator, Optional
+
+from src.domain.sales.models import Sale
+from src.infra.storage.repositories.columnar.sales import SalesColumns
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=365)
+
+
+def synthetic_sales(count: int, products: list[str], seed: int = 0) -> Iterator[Sale]:
+    rng = random.Random(seed)
+    step = (END - START) / count
+    for index in range(count):
+        quantity = rng.randint(1, 5)
+        yield Sale(
+            id=str(uuid.UUID(int=rng.getrandbits(128))),
+            product_id=rng.choice(products),
+            quantity=quantity,
+            total_price=quantity * 9.99,
+            # appended in time order, like sales coming in
+            created_at=START + index * step,
+        )
+
+
+def fill(store: SalesColumns, count: int, products: list[str], chunk: int = 100_000) -> None:
+    batch = []
+    for sale in synthetic_sales(count, products):
+        batch.append(sale)
+        if len(batch) == chunk:
+            store.append(batch)
+            batch = []
+    store.append(batch)
+
+
+async def timed(query: Callable[[], Awaitable[object]], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        started = perf_counter()
+        await query()
+        elapsed = perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+async def run(args: argparse.Namespace) -> None:
+    categories = [str(uuid.uuid4()) for _ in range(args.categories)]
+    products = [str(uuid.uuid4()) for _ in range(args.products)]
+
+    store = SalesColumns()
+    store.product_categories.update(
+        {product: categories[i % len(categories)] for i, product in enumerate(products)}
+    )
+
+    started = perf_counter()
+    fill(store, args.sales, products)
+    print(f"loaded {store.size} sales in {perf_counter() - started:.1f}s")
+
+    row_bytes = sum(getattr(store, name).itemsize for name in ("ids", "created_at", "products"))
+    row_bytes += sum(
+        getattr(store, n).itemsize for n in ("categories", "total_prices", "quantities")
+    )
+    print(f"{row_bytes} B per sale, {row_bytes * 1_000_000 / 2**20:.1f} MiB per million sales")
+    print(f"columns hold {store.nbytes / 2**20:.1f} MiB (including room to grow)")
+
+    repository = store.repository()
+    month = START + timedelta(days=180)
+    queries = {
+        "day buckets, 30 days": lambda: repository.aggregate_sales(
+            month, month + timedelta(days=30), "day"
+        ),
+        "week buckets, 1 product, year": lambda: repository.aggregate_sales(
+            START, END, "week", product_id=products[0]
+        ),
+        "month buckets, 1 category, year": lambda: repository.aggregate_sales(
+            START, END, "month", category_id=categories[0]
+        ),
+        "compare, 2 x 7 days by day": lambda: asyncio.gather(
+            repository.aggregate_sales(month, month + timedelta(days=7), "day"),
+            repository.aggregate_sales(START, START + timedelta(days=7), "day"),
+        ),
+        "page of 100 sales, 1 day": lambda: repository.get_sales_between_dates(
+            month, month + timedelta(days=1), limit=100
+        ),
+    }
+
+    for name, query in queries.items():
+        seconds = await timed(query, args.repeat)
+        print(f"  {name:<34} {seconds * 1e6:>12.0f} us")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5, help="best of this many runs per query")
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
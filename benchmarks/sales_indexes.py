@@ -0,0 +1,187 @@
+"""
+Planner benchmark for the sales date range indexes (migration f0b9a1f77401).
+
+Seeds a scratch copy of the `sales` table with N rows, appended in created_at
+order like the real one, then runs the queries behind `/sales/between-dates`
+and `/sales/compare` under EXPLAIN ANALYZE, once with the indexes the table
+had before the migration and once with the ones it has after.
+
+    python -m benchmarks.sales_indexes --rows 5000000
+
+Everything happens in the `sales_bench` schema, which is dropped at the end.
+"""
+
+import json
+import argparse
+from typing import Optional
+
+from sqlalchemy import Connection, create_engine, text
+
+from src.infra.storage.db import db_url
+
+SCHEMA = "sales_bench"
+
+BEFORE = [
+    "create index on sales (created_at)",
+    "create index on sales (product_id)",
+]
+
+AFTER = [
+    "create index on sales (created_at)",
+    "create index ix_sales_product_id_created_at on sales (product_id, created_at)"
+    " include (total_price, quantity)",
+    "create index ix_sales_created_at_brin on sales using brin (created_at)",
+]
+
+# product 0 is as busy as any other, the data is uniform
+PRODUCT = "md5('0')::uuid"
+
+QUERIES = {
+    "between dates, 1 day": """
+        select * from sales
+        where created_at >= :end - interval '1 day' and created_at <= :end
+    """,
+    "between dates, 1 product, 30 days": f"""
+        select * from sales
+        where product_id = {PRODUCT}
+          and created_at >= :end - interval '30 days' and created_at <= :end
+    """,
+    "daily buckets, 1 product, 90 days": f"""
+        select date_bin('1 day', created_at, :end - interval '90 days'),
+               sum(total_price), sum(quantity), count(*)
+        from sales
+        where product_id = {PRODUCT}
+          and created_at >= :end - interval '90 days' and created_at < :end
+        group by 1
+    """,
+    "weekly buckets, all products, 90 days": """
+        select date_bin('7 days', created_at, :end - interval '90 days'),
+               sum(total_price), sum(quantity), count(*)
+        from sales
+        where created_at >= :end - interval '90 days' and created_at < :end
+        group by 1
+    """,
+}
+
+
+def seed(conn: Connection, rows: int, products: int, days: int) -> None:
+    conn.execute(text(f"drop schema if exists {SCHEMA} cascade"))
+    conn.execute(text(f"create schema {SCHEMA}"))
+    conn.execute(text(f"set search_path to {SCHEMA}"))
+
+    conn.execute(text("""
+            create table sales (
+                id uuid primary key,
+                product_id uuid not null,
+                quantity integer not null,
+                total_price double precision not null,
+                created_at timestamptz not null
+            )
+            """))
+    conn.execute(
+        text("""
+            insert into sales
+            select gen_random_uuid(),
+                   md5((i % :products)::text)::uuid,
+                   1 + i % 5,
+                   (1 + i % 5) * 9.99,
+                   now() - make_interval(days => :days) + i * make_interval(days => :days) / :rows
+            from generate_series(1, :rows) as i
+            """),
+        {"rows": rows, "products": products, "days": days},
+    )
+
+
+def index(conn: Connection, statements: list[str]) -> None:
+    for (name,) in conn.execute(
+        text(
+            "select indexname from pg_indexes"
+            " where schemaname = :schema and indexname <> 'sales_pkey'"
+        ),
+        {"schema": SCHEMA},
+    ).all():
+        conn.execute(text(f"drop index {SCHEMA}.{name}"))
+
+    for statement in statements:
+        conn.execute(text(statement))
+
+    # fresh stats, and a visibility map so index only scans are actually index only
+    conn.execute(text("vacuum analyze sales"))
+
+
+def measure(conn: Connection, repeat: int) -> dict[str, tuple[float, str]]:
+    end = conn.execute(text("select max(created_at) from sales")).scalar_one()
+
+    timings = {}
+    for name, query in QUERIES.items():
+        best: Optional[float] = None
+        for _ in range(repeat):
+            (plan,) = conn.execute(
+                text(f"explain (analyze, buffers, format json) {query}"), {"end": end}
+            ).scalar_one()
+            if best is None or plan["Execution Time"] < best:
+                best, nodes = plan["Execution Time"], _scans(plan["Plan"])
+
+        timings[name] = (best, ", ".join(nodes))
+
+    return timings
+
+
+def _scans(node: dict) -> list[str]:
+    """The scan nodes of a plan, e.g. `Index Only Scan (ix_sales_product_id_created_at)`"""
+    scans = []
+    if "Scan" in node["Node Type"]:
+        scans.append(f"{node['Node Type']} ({node.get('Index Name', node.get('Relation Name'))})")
+
+    for child in node.get("Plans", []):
+        scans += _scans(child)
+
+    return scans
+
+
+def index_sizes(conn: Connection) -> dict[str, str]:
+    rows = conn.execute(
+        text(
+            "select indexrelid::regclass::text, pg_size_pretty(pg_relation_size(indexrelid))"
+            " from pg_index where indrelid = 'sales'::regclass"
+        )
+    ).all()
+    return dict(rows)
+
+
+def report(title: str, timings: dict[str, tuple[float, str]], sizes: dict[str, str]) -> None:
+    print(f"\n{title}")
+    for name, (ms, scans) in timings.items():
+        print(f"  {name:<40} {ms:>10.2f} ms  {scans}")
+    for name, size in sizes.items():
+        print(f"  {name:<40} {size:>13}")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs per query")
+    parser.add_argument("--url", default=None, help="defaults to the configured database")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.url or db_url(sync=True), isolation_level="AUTOCOMMIT")
+    with engine.connect() as conn:
+        try:
+            print(f"seeding {args.rows} sales over {args.days} days, {args.products} products")
+            seed(conn, args.rows, args.products, args.days)
+
+            index(conn, BEFORE)
+            report("before", measure(conn, args.repeat), index_sizes(conn))
+
+            index(conn, AFTER)
+            report("after", measure(conn, args.repeat), index_sizes(conn))
+        finally:
+            conn.execute(text(f"drop schema if exists {SCHEMA} cascade"))
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
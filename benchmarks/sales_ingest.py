@@ -0,0 +1,104 @@
+"""
+End-to-end benchmark of the bulk sales ingestion (POST /sales/bulk, `ingest-sales`).
+
+Generates an NDJSON export of N sales of a scratch product, spread over the
+current month, and feeds it to the same service the endpoint and the CLI use:
+parsing, validation, COPY and the rollup upsert are all in the figures,
+generating the export is not.
+
+    python -m benchmarks.sales_ingest --rows 1000000
+
+The scratch product, its sales and its rollup rows are deleted at the end.
+"""
+
+import json
+import random
+import asyncio
+import argparse
+from time import perf_counter
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import text
+
+from src.domain.product.models import Product, ProductCategory
+from src.infra.storage.db import get_engine, get_session_factory
+from src.services.sales.ingest import read_rows
+from src.services.sales.service import ProductService
+from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
+
+
+def export(product_id: str, rows: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    span = (now - month_start).total_seconds()
+
+    lines = []
+    for _ in range(rows):
+        quantity = rng.randint(1, 5)
+        created_at = datetime.fromtimestamp(
+            month_start.timestamp() + rng.random() * span, timezone.utc
+        )
+        lines.append(
+            json.dumps(
+                {
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "total_price": quantity * 9.99,
+                    "created_at": created_at.isoformat(),
+                }
+            )
+        )
+    return lines
+
+
+async def run(rows: int, chunk_size: int) -> None:
+    engine = get_engine()
+    session_factory = get_session_factory(engine)
+    uow = SQLAlchemyUnitOfWork(session_factory)
+
+    category = ProductCategory.create("ingest bench", None)
+    product = Product.create("ingest bench", category.id, "", 9.99)
+    async with uow:
+        await uow.products.add_category(category)
+    async with uow:
+        await uow.products.create_product(product)
+
+    try:
+        lines = export(product.id, rows)
+
+        async def stream() -> AsyncIterator[str]:
+            for line in lines:
+                yield line
+
+        started = perf_counter()
+        report = await ProductService(uow).ingest_sales(read_rows(stream()), chunk_size)
+        elapsed = perf_counter() - started
+
+        assert report.accepted == rows, report
+        print(f"{rows} sales in {elapsed:.2f}s, {rows / elapsed:,.0f} sales/s")
+    finally:
+        async with session_factory() as session, session.begin():
+            for table in ("sales_daily_rollup", "sales"):
+                await session.execute(
+                    text(f"delete from {table} where product_id = :id"), {"id": product.id}
+                )
+            await session.execute(text("delete from products where id = :id"), {"id": product.id})
+            await session.execute(
+                text("delete from product_categories where id = :id"), {"id": category.id}
+            )
+        await engine.dispose()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="sales per transaction")
+    args = parser.parse_args(argv)
+
+    asyncio.run(run(args.rows, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+from typing import Optional
+from dataclasses import dataclass
+
+from fastapi import Header, Query, Request
+
+from src.infra.storage.db import get_engine, get_session_factory, has_replica, read_only
+from src.services.sales.cache import SalesBucketCache
+from src.services.product.cache import CatalogCache
+from src.uow.sqlalchemy import ReadOnlySQLAlchemyUnitOfWork, SQLAlchemyUnitOfWork
+
+# returned after every write when a replica is configured, clients echo it back
+# on their next reads to be guaranteed to see their own writes
+CONSISTENCY_TOKEN_HEADER = "X-Consistency-Token"
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+@dataclass
+class Pagination:
+    limit: int
+    cursor: Optional[str]
+
+
+def get_uow(request: Request) -> SQLAlchemyUnitOfWork:
+    """
+    Build a unit of work bound to the session factory created in the lifespan.
+    Falls back to a private engine when the lifespan has not run (e.g. bare TestClient).
+    """
+    uow = SQLAlchemyUnitOfWork(
+        getattr(request.app.state, "session_factory", None),
+        track_consistency=has_replica(),
+        after_commit=getattr(request.app.state, "after_commit", ()),
+    )
+
+    # picked up by the middleware to send back the consistency token
+    request.state.uow = uow
+    return uow
+
+
+def get_read_uow(
+    request: Request,
+    x_consistency_token: Optional[str] = Header(default=None),
+) -> ReadOnlySQLAlchemyUnitOfWork:
+    """
+    Build a read-only unit of work, routed to the replica when one is configured.
+    Falls back to a private engine when the lifespan has not run, like `get_uow`.
+    """
+    session_factory = getattr(request.app.state, "read_session_factory", None)
+    return ReadOnlySQLAlchemyUnitOfWork(
+        session_factory or get_session_factory(read_only(get_engine())),
+        primary_session_factory=getattr(request.app.state, "primary_read_session_factory", None),
+        consistency_token=x_consistency_token,
+        sales_store=getattr(request.app.state, "sales_store", None),
+    )
+
+
+def get_sales_cache(request: Request) -> Optional[SalesBucketCache]:
+    """The process wide cache of the sales comparisons, None when it is off"""
+    return getattr(request.app.state, "sales_cache", None)
+
+
+def get_catalog_cache(
+    request: Request,
+    x_consistency_token: Optional[str] = Header(default=None),
+) -> Optional[CatalogCache]:
+    """
+    The process wide cache of the products and categories, None when it is off.
+    Also None for the reads that must see a write of theirs: an entry can have been
+    read from a replica that hadn't replayed the write yet, after the commit dropped it.
+    """
+    if x_consistency_token:
+        return None
+
+    return getattr(request.app.state, "catalog_cache", None)
+
+
+def version_etag(name: str, version: int) -> str:
+    """Strong ETag of a list endpoint, from the version of the table behind it"""
+    return f'"{name}-{version}"'
+
+
+def not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether the copy the client has (`If-None-Match`) is still the current one"""
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    # If-None-Match compares weakly, a W/ prefix doesn't matter
+    return etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+
+def get_pagination(
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+) -> Optional[Pagination]:
+    """
+    Keyset pagination parameters of a list endpoint, None when the client
+    asked for neither, in which case the whole list is returned as before
+    """
+    if limit is None and cursor is None:
+        return None
+
+    return Pagination(limit=limit or DEFAULT_PAGE_SIZE, cursor=cursor)
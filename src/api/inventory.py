@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import JSONResponse, Response
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 
-from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
+from src.uow.sqlalchemy import ReadOnlySQLAlchemyUnitOfWork, SQLAlchemyUnitOfWork
+from src.api.dependencies import (
+    Pagination,
+    get_pagination,
+    get_read_uow,
+    get_uow,
+    not_modified,
+    version_etag,
+)
 from src.services.inventory.service import InventoryService
 
 InventoryRouter = APIRouter(prefix="/inventory", tags=["Inventory"])
@@ -16,7 +26,7 @@ class InventoryUpdateSchema(BaseModel):
 
 @InventoryRouter.get("/current/{product_id}")
 async def current_inventory_for_product(
-    product_id: str, uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork)
+    product_id: str, uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow)
 ):
     """Fetch the current inventory item for a given product ID"""
     service = InventoryService(uow)
@@ -29,17 +39,34 @@ async def current_inventory_for_product(
 
 
 @InventoryRouter.get("/current")
-async def current_inventory_list(uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork)):
-    """Fetch all inventory items"""
+async def current_inventory_list(
+    page: Optional[Pagination] = Depends(get_pagination),
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+    if_none_match: Optional[str] = Header(default=None),
+):
+    """
+    Fetch all inventory items.
+    With `limit` and/or `cursor` a page of them is returned along with the `next_cursor`.
+    Answers `304` when `If-None-Match` has the `ETag` of the current inventory.
+    """
     service = InventoryService(uow)
-    inventory_items = await service.current_inventory_list()
 
-    return JSONResponse(content=jsonable_encoder(inventory_items))
+    # read before the items, so the tag is never newer than they are
+    etag = version_etag("inventory", await service.current_inventory_version())
+    if not_modified(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if page:
+        inventory_items = await service.current_inventory_page(page.limit, page.cursor)
+    else:
+        inventory_items = await service.current_inventory_list()
+
+    return JSONResponse(content=jsonable_encoder(inventory_items), headers={"ETag": etag})
 
 
 @InventoryRouter.post("/update")
 async def add_inventory_update(
-    request: InventoryUpdateSchema, uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork)
+    request: InventoryUpdateSchema, uow: SQLAlchemyUnitOfWork = Depends(get_uow)
 ):
     """Add a new inventory update for a product"""
     service = InventoryService(uow)
@@ -51,9 +78,22 @@ async def add_inventory_update(
     return JSONResponse(status_code=404, content={"message": "Product not found"})
 
 
+@InventoryRouter.post("/update/batch")
+async def add_inventory_updates(
+    request: list[InventoryUpdateSchema], uow: SQLAlchemyUnitOfWork = Depends(get_uow)
+):
+    """Apply many inventory updates at once, reporting the outcome of each"""
+    service = InventoryService(uow)
+    results = await service.add_inventory_updates(
+        [(update.product_id, update.quantity) for update in request]
+    )
+
+    return JSONResponse(content=jsonable_encoder(results))
+
+
 @InventoryRouter.get("/low-stock-alerts")
 async def low_stock_alerts(
-    threshold: int = 10, uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork)
+    threshold: int = 10, uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow)
 ):
     """Get a list of inventory items that are at or below the low stock threshold"""
     service = InventoryService(uow)
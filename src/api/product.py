@@ -1,14 +1,36 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+import json
+from uuid import UUID
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 
-from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
-from src.services.product.service import ProductService
+from src.uow.sqlalchemy import ReadOnlySQLAlchemyUnitOfWork, SQLAlchemyUnitOfWork
+from src.api.dependencies import (
+    DEFAULT_PAGE_SIZE,
+    Pagination,
+    get_catalog_cache,
+    get_pagination,
+    get_read_uow,
+    get_uow,
+    not_modified,
+    version_etag,
+)
+from src.infra.config import config
+from src.domain.product.models import Product
+from src.services.product.cache import CatalogCache
+from src.services.product.service import ProductBatchResult, ProductService
 
 ProductRouter = APIRouter(prefix="/products", tags=["Product"])
 CategoryRouter = APIRouter(prefix="/categories", tags=["Category"])
 
+MAX_SEARCH_LENGTH = 200
+
+# products fetched by a single multi-get
+MAX_PRODUCT_IDS = 1000
+
 
 class ProductSchema(BaseModel):
     """Request schema for products"""
@@ -19,6 +41,18 @@ class ProductSchema(BaseModel):
     price: float
 
 
+class IdentifiedProductSchema(ProductSchema):
+    """Request schema for the products of a bulk update"""
+
+    id: UUID
+
+
+class ProductIdsSchema(BaseModel):
+    """Request schema for fetching products by ID"""
+
+    ids: list[str] = Field(max_length=MAX_PRODUCT_IDS)
+
+
 class ProductCategorySchema(BaseModel):
     """Request schema for product categories"""
 
@@ -26,27 +60,185 @@ class ProductCategorySchema(BaseModel):
     description: str
 
 
+# the whole payload is validated in one pass, and only looked at item by item when it fails
+PRODUCTS_ADAPTER = TypeAdapter(list[ProductSchema])
+IDENTIFIED_PRODUCTS_ADAPTER = TypeAdapter(list[IdentifiedProductSchema])
+
+
 @ProductRouter.get("/")
 async def get_products(
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    ids: Optional[str] = Query(default=None),
+    page: Optional[Pagination] = Depends(get_pagination),
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+    cache: Optional[CatalogCache] = Depends(get_catalog_cache),
+    if_none_match: Optional[str] = Header(default=None),
 ):
     """
     Get all products.
+    With `ids` (comma separated), only those of them that exist, in the same order.
+    With `limit` and/or `cursor` a page of them is returned along with the `next_cursor`.
+    Answers `304` when `If-None-Match` has the `ETag` of the current products.
     """
+    if ids is not None:
+        product_ids = [product_id for product_id in ids.split(",") if product_id]
+        if len(product_ids) > MAX_PRODUCT_IDS:
+            return JSONResponse(
+                status_code=422,
+                content={"status": "error", "message": f"At most {MAX_PRODUCT_IDS} ids"},
+            )
+
+        service = ProductService(uow, cache)
+        return JSONResponse(
+            content=jsonable_encoder(await service.get_products_by_ids(product_ids))
+        )
+
+    service = ProductService(uow, cache)
+
+    # read before the products, so the tag is never newer than they are
+    version = await service.get_products_version()
+    etag = version_etag("products", version)
+    if not_modified(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if page:
+        results = await service.get_products_page(page.limit, page.cursor)
+    else:
+        results = await service.get_products(version)
+    return JSONResponse(content=jsonable_encoder(results), headers={"ETag": etag})
+
+
+@ProductRouter.post("/by-ids")
+async def get_products_by_ids(
+    request: ProductIdsSchema,
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+    cache: Optional[CatalogCache] = Depends(get_catalog_cache),
+):
+    """
+    Same as `GET /products/?ids=`, for lists of IDs too long for a URL.
+    """
+    service = ProductService(uow, cache)
+    products = await service.get_products_by_ids(request.ids)
+    return JSONResponse(content=jsonable_encoder(products))
+
+
+@ProductRouter.get("/search")
+async def search_products(
+    q: str = Query(min_length=1, max_length=MAX_SEARCH_LENGTH),
+    page: Optional[Pagination] = Depends(get_pagination),
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+):
+    """
+    Search the products by name and description, best matches first. Every word of `q`
+    has to start a word of the product, or the name has to be close to `q` (typos).
+    Always paginated, pass `next_cursor` back as `cursor` for the next page.
+    """
+    page = page or Pagination(limit=DEFAULT_PAGE_SIZE, cursor=None)
+
     service = ProductService(uow)
-    results = await service.get_products()
+    results = await service.search_products(q, page.limit, page.cursor)
     return JSONResponse(content=jsonable_encoder(results))
 
 
+@ProductRouter.post("/bulk")
+async def create_products(request: Request, uow: SQLAlchemyUnitOfWork = Depends(get_uow)):
+    """
+    Create many products at once, the body being a JSON list of `ProductSchema`.
+    Answers with the outcome of each, in order: `created`, or `invalid` (with the
+    `error`) and `unknown_category` for the ones that were skipped.
+    """
+    items, errors = _validate_items(PRODUCTS_ADAPTER, await request.body())
+    if items is None:
+        return JSONResponse(status_code=422, content={"status": "error", "message": errors[0]})
+
+    products = [
+        Product.create(
+            name=item.name,
+            category_id=item.category_id,
+            description=item.description,
+            price=item.price,
+        )
+        for _, item in items
+    ]
+    return await _save_products(uow, items, products, errors)
+
+
+@ProductRouter.put("/bulk")
+async def update_products(request: Request, uow: SQLAlchemyUnitOfWork = Depends(get_uow)):
+    """
+    Update many products at once, the body being a JSON list of `ProductSchema` with their
+    `id`. Those that don't exist are created, so an import can be replayed.
+    Answers with the outcome of each, in order: `created`, `updated`, or `invalid`,
+    `unknown_category` and `duplicate` (an `id` given again later) for the skipped ones.
+    """
+    items, errors = _validate_items(IDENTIFIED_PRODUCTS_ADAPTER, await request.body())
+    if items is None:
+        return JSONResponse(status_code=422, content={"status": "error", "message": errors[0]})
+
+    products = [
+        Product(
+            id=str(item.id),
+            name=item.name,
+            category_id=item.category_id,
+            description=item.description,
+            price=item.price,
+        )
+        for _, item in items
+    ]
+    return await _save_products(uow, items, products, errors)
+
+
+def _validate_items(
+    adapter: TypeAdapter, body: bytes
+) -> tuple[Optional[list[tuple[int, Any]]], dict[int, str]]:
+    """
+    The (index, item) of the items of a JSON list that validate, and why the others don't
+    by index. (None, {0: reason}) when the body isn't a JSON list at all.
+    """
+    try:
+        return list(enumerate(adapter.validate_json(body))), {}
+    except ValidationError as exc:
+        failures = exc.errors()
+
+    errors: dict[int, str] = {}
+    for failure in failures:
+        location = failure["loc"]
+        if not location or not isinstance(location[0], int):
+            return None, {0: failure["msg"]}
+
+        field = ".".join(str(part) for part in location[1:])
+        errors.setdefault(location[0], f"{field}: {failure['msg']}" if field else failure["msg"])
+
+    raw = json.loads(body)
+    valid = [index for index in range(len(raw)) if index not in errors]
+    return list(zip(valid, adapter.validate_python([raw[index] for index in valid]))), errors
+
+
+async def _save_products(
+    uow: SQLAlchemyUnitOfWork,
+    items: list[tuple[int, Any]],
+    products: list[Product],
+    errors: dict[int, str],
+) -> JSONResponse:
+    service = ProductService(uow)
+    saved = await service.save_products(products, config.catalog.bulk_chunk_size)
+
+    results = dict(zip((index for index, _ in items), saved))
+    for index, error in errors.items():
+        results[index] = ProductBatchResult(id=None, status="invalid", error=error)
+
+    return JSONResponse(content=jsonable_encoder([results[index] for index in range(len(results))]))
+
+
 @ProductRouter.get("/{product_id}")
 async def get_product(
     product_id: str,
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+    cache: Optional[CatalogCache] = Depends(get_catalog_cache),
 ):
     """
     Get a product by ID.
     """
-    service = ProductService(uow)
+    service = ProductService(uow, cache)
     product = await service.get_product(product_id)
 
     if not product:
@@ -61,7 +253,7 @@ async def get_product(
 @ProductRouter.post("/")
 async def create_product(
     product: ProductSchema,
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    uow: SQLAlchemyUnitOfWork = Depends(get_uow),
 ):
     """
     Create a new product.
@@ -80,7 +272,7 @@ async def create_product(
 async def update_product(
     product_id: str,
     product: ProductSchema,
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    uow: SQLAlchemyUnitOfWork = Depends(get_uow),
 ):
     """
     Update an existing product.
@@ -107,7 +299,7 @@ async def update_product(
 @ProductRouter.delete("/{product_id}")
 async def delete_product(
     product_id: str,
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    uow: SQLAlchemyUnitOfWork = Depends(get_uow),
 ):
     """
     Delete a product by ID.
@@ -119,25 +311,40 @@ async def delete_product(
 
 @CategoryRouter.get("/")
 async def get_categories(
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    page: Optional[Pagination] = Depends(get_pagination),
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+    cache: Optional[CatalogCache] = Depends(get_catalog_cache),
+    if_none_match: Optional[str] = Header(default=None),
 ):
     """
     Get all product categories.
+    With `limit` and/or `cursor` a page of them is returned along with the `next_cursor`.
+    Answers `304` when `If-None-Match` has the `ETag` of the current categories.
     """
-    service = ProductService(uow)
-    result = await service.get_categories()
-    return JSONResponse(content=jsonable_encoder(result))
+    service = ProductService(uow, cache)
+
+    version = await service.get_categories_version()
+    etag = version_etag("categories", version)
+    if not_modified(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if page:
+        result = await service.get_categories_page(page.limit, page.cursor)
+    else:
+        result = await service.get_categories(version)
+    return JSONResponse(content=jsonable_encoder(result), headers={"ETag": etag})
 
 
 @CategoryRouter.get("/{category_id}")
 async def get_category(
     category_id: str,
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+    cache: Optional[CatalogCache] = Depends(get_catalog_cache),
 ):
     """
     Get a product category by ID.
     """
-    service = ProductService(uow)
+    service = ProductService(uow, cache)
     result = await service.get_category(category_id)
 
     if not result:
@@ -152,7 +359,7 @@ async def get_category(
 @CategoryRouter.post("/")
 async def create_category(
     category: ProductCategorySchema,
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    uow: SQLAlchemyUnitOfWork = Depends(get_uow),
 ):
     """
     Create a new product category.
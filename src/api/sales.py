@@ -1,16 +1,34 @@
+import json
 from datetime import datetime
-from typing import Optional, Literal
+from typing import AsyncIterator, Optional, Literal
 
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
-from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
+from src.uow.sqlalchemy import ReadOnlySQLAlchemyUnitOfWork, SQLAlchemyUnitOfWork
+from src.api.dependencies import (
+    Pagination,
+    get_pagination,
+    get_read_uow,
+    get_sales_cache,
+    get_uow,
+)
+from src.infra.config import config
+from src.services.sales.cache import SalesBucketCache
+from src.services.sales.ingest import read_lines, read_rows
 from src.services.sales.service import ProductService
 
 SalesRouter = APIRouter(prefix="/sales", tags=["Sales"])
 
+NDJSON = "application/x-ndjson"
+
+# each period adds its share of rows to the comparison query
+MAX_COMPARED_PERIODS = 60
+
+MAX_TOP_SALES = 100
+
 
 class SaleSchema(BaseModel):
     product_id: str
@@ -18,10 +36,29 @@ class SaleSchema(BaseModel):
     total_price: float
 
 
+class PeriodSchema(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class ComparePeriodsSchema(BaseModel):
+    periods: list[PeriodSchema] = Field(min_length=1, max_length=MAX_COMPARED_PERIODS)
+    product_id: Optional[str] = None
+    category_id: Optional[str] = None
+    granularity: Literal["day", "week", "month"] = "day"
+
+    @model_validator(mode="after")
+    def same_length(self) -> "ComparePeriodsSchema":
+        lengths = {period.end - period.start for period in self.periods}
+        if len(lengths) > 1:
+            raise ValueError("The time periods must be of the same length.")
+        return self
+
+
 @SalesRouter.post("/")
 async def create_sale(
     request: SaleSchema,
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    uow: SQLAlchemyUnitOfWork = Depends(get_uow),
 ):
     """
     Create a new sale.
@@ -32,23 +69,100 @@ async def create_sale(
     return JSONResponse(content=jsonable_encoder(sale), status_code=201)
 
 
+@SalesRouter.post("/bulk")
+async def ingest_sales(
+    request: Request,
+    content_type: Optional[str] = Header(default=None),
+    uow: SQLAlchemyUnitOfWork = Depends(get_uow),
+):
+    """
+    Record the sales of a POS export, streamed as NDJSON or, with `Content-Type: text/csv`,
+    as CSV with a header line. Every row has a `product_id`, `quantity` and `total_price`,
+    and optionally an `id` and a `created_at`.
+    Rows that aren't valid are skipped and reported with their line number.
+    """
+    format = "csv" if content_type and "csv" in content_type else "ndjson"
+
+    service = ProductService(uow)
+    report = await service.ingest_sales(read_rows(read_lines(request.stream()), format))
+
+    return JSONResponse(content=jsonable_encoder(report))
+
+
 @SalesRouter.get("/between-dates")
 async def get_sales_between_dates(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     product_id: Optional[str] = None,
     category_id: Optional[str] = None,
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    accept: Optional[str] = Header(default=None),
+    page: Optional[Pagination] = Depends(get_pagination),
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
 ):
     """
     Get sales between two dates.
+    With `limit` and/or `cursor` a page of them is returned along with the `next_cursor`.
+    With `Accept: application/x-ndjson` the sales are streamed, one JSON object per line.
     """
     service = ProductService(uow)
+
+    if accept and NDJSON in accept:
+        sales_stream = service.stream_sales_between_dates(
+            start_date, end_date, product_id, category_id, config.db.stream_batch_size
+        )
+        return StreamingResponse(
+            _ndjson_lines(sales_stream, config.db.stream_batch_size), media_type=NDJSON
+        )
+
+    if page:
+        sales_page = await service.get_sales_page(
+            page.limit, page.cursor, start_date, end_date, product_id, category_id
+        )
+        return JSONResponse(content=jsonable_encoder(sales_page))
+
     sales = await service.get_sales_between_dates(start_date, end_date, product_id, category_id)
 
     return JSONResponse(content=jsonable_encoder(sales))
 
 
+@SalesRouter.get("/summary")
+async def summarize_sales(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    product_id: Optional[str] = None,
+    category_id: Optional[str] = None,
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+):
+    """
+    Count, quantity and revenue of the sales `/sales/between-dates` would return,
+    without the sales themselves.
+    """
+    service = ProductService(uow)
+    summary = await service.summarize_sales(start_date, end_date, product_id, category_id)
+
+    return JSONResponse(content=jsonable_encoder(summary))
+
+
+@SalesRouter.get("/top")
+async def top_sales(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    metric: Literal["revenue", "quantity", "count"] = "revenue",
+    group_by: Literal["product", "category"] = "product",
+    category_id: Optional[str] = None,
+    n: int = Query(default=10, ge=1, le=MAX_TOP_SALES),
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+):
+    """
+    Top `n` products (or categories, with `group_by=category`) by revenue, quantity
+    or number of sales between two dates, ranked in the database.
+    """
+    service = ProductService(uow)
+    top = await service.top_sales(start_date, end_date, metric, n, group_by, category_id)
+
+    return JSONResponse(content=jsonable_encoder(top))
+
+
 @SalesRouter.get("/compare")
 async def compare_sales(
     first_start: datetime,
@@ -58,14 +172,50 @@ async def compare_sales(
     product_id: Optional[str] = None,
     category_id: Optional[str] = None,
     granularity: Literal["day", "week", "month"] = "day",
-    uow: SQLAlchemyUnitOfWork = Depends(SQLAlchemyUnitOfWork),
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+    cache: Optional[SalesBucketCache] = Depends(get_sales_cache),
 ):
     """
     Compare sales for a product or category.
     """
-    service = ProductService(uow)
+    service = ProductService(uow, cache)
     comparison = await service.compare_sales(
         first_start, first_end, second_start, second_end, product_id, category_id, granularity
     )
 
     return JSONResponse(content=jsonable_encoder(comparison))
+
+
+@SalesRouter.post("/compare/periods")
+async def compare_periods(
+    request: ComparePeriodsSchema,
+    uow: ReadOnlySQLAlchemyUnitOfWork = Depends(get_read_uow),
+    cache: Optional[SalesBucketCache] = Depends(get_sales_cache),
+):
+    """
+    Compare sales of several periods of the same length, e.g. this week against
+    the previous four and the same week last year. Each bucket has one total per period.
+    """
+    service = ProductService(uow, cache)
+    comparison = await service.compare_periods(
+        [(period.start, period.end) for period in request.periods],
+        request.product_id,
+        request.category_id,
+        request.granularity,
+    )
+
+    return JSONResponse(content=jsonable_encoder(comparison))
+
+
+async def _ndjson_lines(items: AsyncIterator, batch_size: int) -> AsyncIterator[str]:
+    """Serialize items as they arrive, one line each, sent in chunks of `batch_size` lines"""
+    lines: list[str] = []
+    async for item in items:
+        lines.append(json.dumps(jsonable_encoder(item)) + "\n")
+
+        if len(lines) >= batch_size:
+            yield "".join(lines)
+            lines = []
+
+    if lines:
+        yield "".join(lines)
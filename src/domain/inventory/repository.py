@@ -6,16 +6,32 @@ from src.domain.inventory.models import InventoryItem, InventoryUpdate
 
 class AbstractInventoryRepository(ABC):
     @abstractmethod
-    async def add_inventory_update(self, update: InventoryUpdate) -> None:
-        """Persist a new inventory update"""
+    async def add_inventory_update(self, update: InventoryUpdate) -> InventoryItem:
+        """Persist a new inventory update and return the resulting inventory item"""
+
+    @abstractmethod
+    async def add_inventory_updates(self, updates: List[InventoryUpdate]) -> List[InventoryItem]:
+        """
+        Persist many updates at once, return the resulting item
+        of every product they touched, ordered by product ID
+        """
 
     @abstractmethod
     async def get_by_product(self, product_id: str) -> Optional[InventoryItem]:
         """Fetch a single inventory item by its product ID"""
 
     @abstractmethod
-    async def list(self) -> List[InventoryItem]:
-        """Return all inventory items"""
+    async def list(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> List[InventoryItem]:
+        """
+        Return all inventory items, or when paginating, up to `limit` of them
+        ordered by product ID, starting after the item of product `after`
+        """
+
+    @abstractmethod
+    async def get_version(self) -> int:
+        """A number that changes whenever any item does, cheaper to read than the items"""
 
     @abstractmethod
     async def low_stock_alerts(self, threshold: int = 10) -> List[InventoryItem]:
@@ -0,0 +1,51 @@
+import json
+import base64
+from dataclasses import dataclass
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor can't be decoded"""
+
+
+@dataclass
+class Page(Generic[T]):
+    items: list[T]
+    # pass it back to get the next page, None on the last page
+    next_cursor: Optional[str]
+
+
+def encode_cursor(*key: str) -> str:
+    """Opaque cursor holding the sort key of the last item of a page"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str, length: int = 1) -> list[str]:
+    """The sort key of `length` parts held by a cursor built with `encode_cursor`"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+    if (
+        not isinstance(key, list)
+        or len(key) != length
+        or not all(isinstance(part, str) for part in key)
+    ):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+
+    return key
+
+
+def make_page(items: list[T], limit: int, key: Callable[[T], tuple[str, ...]]) -> Page[T]:
+    """
+    Build a page from up to `limit + 1` items read after the cursor,
+    the extra item only tells whether there is a next page
+    """
+    if len(items) <= limit:
+        return Page(items=items, next_cursor=None)
+
+    items = items[:limit]
+    return Page(items=items, next_cursor=encode_cursor(*key(items[-1])))
@@ -27,6 +27,14 @@ class Product:
         )
 
 
+@dataclass
+class ProductMatch:
+    """A product found by a search, the higher the score the better the match"""
+
+    product: Product
+    score: float
+
+
 @dataclass
 class ProductCategory:
     id: UUID
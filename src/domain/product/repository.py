@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Optional
 
-from .models import Product, ProductCategory
+from .models import Product, ProductCategory, ProductMatch
 
 
 class AbstractProductRepository(ABC):
@@ -11,8 +11,49 @@ class AbstractProductRepository(ABC):
         pass
 
     @abstractmethod
-    async def get_products(self) -> list[Product]:
-        """Get all products"""
+    async def get_products(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> list[Product]:
+        """
+        Get all products, or when paginating, up to `limit` of them
+        ordered by ID, starting after the product with ID `after`
+        """
+        pass
+
+    @abstractmethod
+    async def get_products_by_ids(self, product_ids: list[str]) -> list[Product]:
+        """The existing products among `product_ids`, in no particular order, in one query"""
+        pass
+
+    @abstractmethod
+    async def get_products_version(self) -> int:
+        """A number that changes whenever any product does, cheaper to read than the products"""
+        pass
+
+    @abstractmethod
+    async def search_products(
+        self, query: str, limit: int, after: Optional[tuple[float, str]] = None
+    ) -> list[ProductMatch]:
+        """
+        Up to `limit` products whose name or description has words starting with every
+        word of `query`, or (when the backend can) whose name is close to it despite typos.
+        Best matches first, then by ID, starting after the (score, ID) `after`.
+        """
+        pass
+
+    @abstractmethod
+    async def existing_product_ids(self, product_ids: list[str]) -> set[str]:
+        """Get the subset of `product_ids` that belong to existing products"""
+        pass
+
+    @abstractmethod
+    async def existing_category_ids(self, category_ids: list[str]) -> set[str]:
+        """Get the subset of `category_ids` that belong to existing categories"""
+        pass
+
+    @abstractmethod
+    async def get_product_categories(self, product_ids: list[str]) -> dict[str, Optional[str]]:
+        """The category of each of the existing products among `product_ids`"""
         pass
 
     @abstractmethod
@@ -20,6 +61,14 @@ class AbstractProductRepository(ABC):
         """Create a new product"""
         pass
 
+    @abstractmethod
+    async def upsert_products(self, products: list[Product]) -> list[Product]:
+        """
+        Create the products, or update the existing ones with the same ID, all at once.
+        The IDs have to be unique among `products`.
+        """
+        pass
+
     @abstractmethod
     async def update_product(self, product: Product) -> Product:
         """Update an existing product"""
@@ -46,6 +95,16 @@ class AbstractProductRepository(ABC):
         pass
 
     @abstractmethod
-    async def get_categories(self) -> list[ProductCategory]:
-        """Get all product categories"""
+    async def get_categories_version(self) -> int:
+        """A number that changes whenever any category does, cheaper to read than the categories"""
+        pass
+
+    @abstractmethod
+    async def get_categories(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> list[ProductCategory]:
+        """
+        Get all product categories, or when paginating, up to `limit` of them
+        ordered by ID, starting after the category with ID `after`
+        """
         pass
@@ -0,0 +1,14 @@
+import re
+
+_WORD = re.compile(r"\w+")
+
+# words of a query that are looked at, each one is a condition of the search
+MAX_SEARCH_TERMS = 8
+
+
+def search_terms(text: str) -> list[str]:
+    """
+    The lowercased words of a text, as postgres' 'simple' text search
+    configuration splits them, in order and without duplicates
+    """
+    return list(dict.fromkeys(word.lower() for word in _WORD.findall(text or "")))
@@ -1,9 +1,23 @@
 from uuid import uuid4
+from typing import Literal, Optional
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 UUID = str
 
+Granularity = Literal["day", "week", "month"]
+
+# what the sales are ranked by, and what they are grouped by when ranked
+SalesMetric = Literal["revenue", "quantity", "count"]
+SalesGrouping = Literal["product", "category"]
+
+# every bucket of a granularity has the same width, so a "month" is 4 weeks
+GRANULARITY_STEPS: dict[str, timedelta] = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(weeks=4),
+}
+
 
 @dataclass
 class Sale:
@@ -12,13 +26,54 @@ class Sale:
     quantity: int
     total_price: float
     created_at: datetime
+    # category of the product, filled in by the repository when not given
+    category_id: Optional[UUID] = None
 
     @classmethod
-    def create(cls, product_id: UUID, quantity: int, total_price: float) -> "Sale":
+    def create(
+        cls,
+        product_id: UUID,
+        quantity: int,
+        total_price: float,
+        category_id: Optional[UUID] = None,
+    ) -> "Sale":
         return cls(
             id=str(uuid4()),
             product_id=product_id,
             quantity=quantity,
             total_price=total_price,
             created_at=datetime.now(timezone.utc),
+            category_id=category_id,
         )
+
+
+@dataclass
+class SalesBucket:
+    """Totals of the sales that fall in [start, start + step)"""
+
+    start: datetime
+    total_price: float
+    quantity: int
+    count: int
+
+
+@dataclass
+class SalesTotal:
+    """Totals of the sales of one product or category (`id`)"""
+
+    id: UUID
+    total_price: float
+    quantity: int
+    count: int
+
+    def metric(self, metric: SalesMetric) -> float:
+        return self.total_price if metric == "revenue" else getattr(self, metric)
+
+
+@dataclass
+class SalesSummary:
+    """Totals of all the sales matching a query"""
+
+    count: int
+    quantity: int
+    total_price: float
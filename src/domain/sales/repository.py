@@ -1,16 +1,20 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from .models import Sale
+from .models import (
+    Granularity,
+    Sale,
+    SalesBucket,
+    SalesGrouping,
+    SalesMetric,
+    SalesSummary,
+    SalesTotal,
+)
 
 
-class AbstractSalesRepository(ABC):
-    @abstractmethod
-    async def add_sale(self, sale: Sale) -> Sale:
-        """Persist a new sale"""
-        # just for testing, because I have no way to simulate perchases
-        pass
+class AbstractSalesReader(ABC):
+    """What reading the sales takes, all a read-only store (e.g. the columnar one) provides"""
 
     @abstractmethod
     async def get_sales_between_dates(
@@ -19,6 +23,114 @@ class AbstractSalesRepository(ABC):
         end_date: Optional[datetime] = None,
         product_id: Optional[str] = None,
         category_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[tuple[datetime, str]] = None,
     ) -> list[Sale]:
-        """Retrieve sales between two dates"""
+        """
+        Retrieve sales between two dates, or when paginating, up to `limit` of them
+        ordered by (created_at, id), starting after the (created_at, id) key `after`
+        """
+        pass
+
+    @abstractmethod
+    def stream_sales_between_dates(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sale]:
+        """Yield the sales between two dates, holding at most `batch_size` of them in memory"""
+        pass
+
+    @abstractmethod
+    async def summarize_sales(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> SalesSummary:
+        """Count and totals of the sales `get_sales_between_dates` would return"""
+        pass
+
+    @abstractmethod
+    async def aggregate_sales(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: Granularity = "day",
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> list[SalesBucket]:
+        """
+        Total the sales between two dates in buckets of `granularity` counted from `start`.
+        Only non-empty buckets are returned, ordered by their start.
+        """
+        pass
+
+    @abstractmethod
+    async def top_sales(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        metric: SalesMetric = "revenue",
+        n: int = 10,
+        group_by: SalesGrouping = "product",
+        category_id: Optional[str] = None,
+    ) -> list[SalesTotal]:
+        """
+        The `n` products (or categories) with the highest `metric` between two dates,
+        highest first, ties broken by id
+        """
+        pass
+
+    async def aggregate_sales_periods(
+        self,
+        periods: list[tuple[datetime, datetime]],
+        granularity: Granularity = "day",
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> list[list[SalesBucket]]:
+        """
+        `aggregate_sales` of each (start, end) period, in the order of `periods`.
+        Backends that can total every period in one go should override this.
+        """
+        return [
+            await self.aggregate_sales(start, end, granularity, product_id, category_id)
+            for start, end in periods
+        ]
+
+
+class AbstractSalesRepository(AbstractSalesReader):
+    @abstractmethod
+    async def add_sale(self, sale: Sale) -> Sale:
+        """Persist a new sale"""
+        # just for testing, because I have no way to simulate perchases
+        pass
+
+    @abstractmethod
+    async def add_sales(self, sales: list[Sale]) -> int:
+        """Persist many sales at once, returns how many were written"""
+        pass
+
+    @abstractmethod
+    async def check_new_sales(
+        self, sales: list[Sale]
+    ) -> tuple[set[str], set[tuple[str, datetime]]]:
+        """
+        Before recording sales, in a single lookup: the ids of their products that exist,
+        and the (id, created_at) of those of them that are already recorded
+        """
+        pass
+
+    @abstractmethod
+    async def set_product_category(self, product_id: str, category_id: Optional[str]) -> None:
+        """Move the sales of a product to the category it was moved to"""
+        pass
+
+    @abstractmethod
+    async def set_product_categories(self, categories: dict[str, Optional[str]]) -> None:
+        """Move the sales of many products at once, {product id: category id}"""
         pass
@@ -0,0 +1,133 @@
+"""
+Maintenance commands, run them with `python -m src.entrypoint.cli <command> --help`
+"""
+
+import sys
+import asyncio
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from src.infra.storage.db import get_engine, get_session_factory
+from src.infra.storage.partitions import (
+    add_months,
+    create_sales_partitions,
+    expire_sales_partitions,
+    month_of,
+)
+from src.services.sales.ingest import read_rows
+from src.services.sales.service import ProductService
+from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
+
+
+async def backfill_sales_rollup(args: argparse.Namespace) -> None:
+    """Rebuild the daily sales rollup from the raw sales"""
+    engine = get_engine()
+    session_factory = get_session_factory(engine)
+
+    try:
+        if args.start is None or args.end is None:
+            async with SQLAlchemyUnitOfWork(session_factory) as uow:
+                written = await uow.sales.backfill_daily_rollup(args.start, args.end)
+            print(f"rebuilt {written} rollup rows")
+            return
+
+        # one transaction per chunk of days, so big backfills don't hold locks for long
+        written = 0
+        chunk_start = args.start
+        while chunk_start <= args.end:
+            chunk_end = min(chunk_start + timedelta(days=args.chunk_days - 1), args.end)
+
+            async with SQLAlchemyUnitOfWork(session_factory) as uow:
+                written += await uow.sales.backfill_daily_rollup(chunk_start, chunk_end)
+            print(f"rebuilt {chunk_start} -> {chunk_end}")
+
+            chunk_start = chunk_end + timedelta(days=1)
+
+        print(f"rebuilt {written} rollup rows")
+    finally:
+        await engine.dispose()
+
+
+async def sales_partitions(args: argparse.Namespace) -> None:
+    """Create the coming months' sales partitions and expire the old ones"""
+    engine = get_engine()
+    session_factory = get_session_factory(engine)
+    this_month = month_of(datetime.now(timezone.utc).date())
+
+    try:
+        async with session_factory() as session, session.begin():
+            created = await create_sales_partitions(
+                session, this_month, add_months(this_month, args.ahead)
+            )
+            print(f"created {', '.join(created) or 'nothing'}")
+
+            if args.retain_months is not None:
+                expired = await expire_sales_partitions(
+                    session, add_months(this_month, -args.retain_months), drop=args.drop
+                )
+                print(f"{'dropped' if args.drop else 'detached'} {', '.join(expired) or 'nothing'}")
+    finally:
+        await engine.dispose()
+
+
+async def ingest_sales(args: argparse.Namespace) -> None:
+    """Record the sales of a POS export, NDJSON or CSV with a header line"""
+    engine = get_engine()
+    session_factory = get_session_factory(engine)
+    format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    async def lines() -> AsyncIterator[str]:
+        with sys.stdin if args.path == "-" else open(args.path, newline="") as export:
+            for line in export:
+                yield line.rstrip("\n")
+
+    try:
+        service = ProductService(SQLAlchemyUnitOfWork(session_factory))
+        report = await service.ingest_sales(read_rows(lines(), format), args.chunk_size)
+
+        for error in report.errors:
+            print(f"line {error.line}: {error.message}")
+        print(f"accepted {report.accepted} sales, rejected {report.rejected}")
+    finally:
+        await engine.dispose()
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.entrypoint.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser("backfill-sales-rollup", help=backfill_sales_rollup.__doc__)
+    backfill.add_argument("--start", type=date.fromisoformat, help="first day (default: all)")
+    backfill.add_argument("--end", type=date.fromisoformat, help="last day (default: all)")
+    backfill.add_argument("--chunk-days", type=int, default=31, help="days per transaction")
+    backfill.set_defaults(handler=backfill_sales_rollup)
+
+    partitions = commands.add_parser("sales-partitions", help=sales_partitions.__doc__)
+    partitions.add_argument("--ahead", type=int, default=3, help="months to create in advance")
+    partitions.add_argument(
+        "--retain-months",
+        type=int,
+        help="expire the partitions older than this many months (default: keep everything)",
+    )
+    partitions.add_argument("--drop", action="store_true", help="drop expired partitions")
+    partitions.set_defaults(handler=sales_partitions)
+
+    ingest = commands.add_parser("ingest-sales", help=ingest_sales.__doc__)
+    ingest.add_argument("path", help="the export, - for stdin")
+    ingest.add_argument(
+        "--format", choices=["ndjson", "csv"], help="default: csv for .csv files, else ndjson"
+    )
+    ingest.add_argument("--chunk-size", type=int, default=10_000, help="sales per transaction")
+    ingest.set_defaults(handler=ingest_sales)
+
+    return parser
+
+
+def main() -> None:
+    args = _parser().parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
 from src.utils.lifespan_builder import lifespan_builder
+from src.domain.pagination import InvalidCursor
+from src.api.dependencies import CONSISTENCY_TOKEN_HEADER
 from src.api.product import ProductRouter, CategoryRouter
 from src.api.inventory import InventoryRouter
 from src.api.sales import SalesRouter
@@ -14,6 +16,28 @@ app.include_router(InventoryRouter)
 app.include_router(SalesRouter)
 
 
+@app.middleware("http")
+async def consistency_token_middleware(request: Request, call_next):
+    """Send back the WAL position of the request's write, for read-your-writes on the replica"""
+    response = await call_next(request)
+
+    uow = getattr(request.state, "uow", None)
+    token = getattr(uow, "consistency_token", None)
+    if token:
+        response.headers[CONSISTENCY_TOKEN_HEADER] = token
+
+    return response
+
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(_, exc: InvalidCursor):
+    """A cursor that wasn't handed out by us"""
+    return JSONResponse(
+        status_code=400,
+        content={"status": "error", "message": str(exc)},
+    )
+
+
 # exception handler
 @app.exception_handler(Exception)
 async def exception_handler(_, exc: Exception):
@@ -30,3 +54,16 @@ async def health_check():
     Health check endpoint.
     """
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """
+    Counters of the in-process caches, for monitoring.
+    """
+    sales_cache = getattr(request.app.state, "sales_cache", None)
+    catalog_cache = getattr(request.app.state, "catalog_cache", None)
+    return {
+        "sales_bucket_cache": sales_cache.stats() if sales_cache else None,
+        "catalog_cache": catalog_cache.stats() if catalog_cache else None,
+    }
@@ -1,4 +1,5 @@
 import dotenv
+from typing import Literal, Optional
 from dataclasses import dataclass
 from pydantic import BaseModel
 
@@ -13,11 +14,52 @@ class DBConfig(BaseModel):
     password: str
     database_name: str
 
+    # optional streaming replica, read-only units of work are routed to it
+    replica_host: Optional[str] = None
+    replica_port: Optional[int] = None
+    # how long a read waits for the replica to replay the caller's last write
+    # (see the consistency token) before falling back to the primary
+    replica_wait_timeout: float = 0.5
+
+    # rows fetched per round trip when streaming large results
+    stream_batch_size: int = 1000
+
+
+class AnalyticsConfig(BaseModel):
+    """In-process analytics configuration"""
+
+    # load the sales into memory at startup and serve the read-only sales queries from there,
+    # needs numpy, see src/infra/storage/repositories/columnar/sales.py
+    sales_in_memory: bool = False
+
+    # buckets kept by the sales comparisons, 0 turns the cache off
+    compare_cache_size: int = 100_000
+    # seconds after which a bucket is taken to be final, and the most an open
+    # bucket is served from the cache when its sales come from another process
+    compare_cache_settle: float = 30
+
+
+class CatalogConfig(BaseModel):
+    """Product catalog configuration"""
+
+    # products, categories and lists of them kept in memory, 0 turns the cache off
+    cache_size: int = 10_000
+    # seconds an entry is served for at most
+    cache_ttl: float = 60
+    # "postgres" shares the invalidations between processes with LISTEN/NOTIFY,
+    # "local" is enough with a single process
+    cache_backend: Literal["local", "postgres"] = "local"
+
+    # products written per transaction by the bulk endpoints
+    bulk_chunk_size: int = 1000
+
 
 class Config(BaseModel):
     """Configuration class for the application"""
 
     db: DBConfig
+    analytics: AnalyticsConfig = AnalyticsConfig()
+    catalog: CatalogConfig = CatalogConfig()
 
 
 def _load_config() -> Config:
@@ -25,6 +67,7 @@ def _load_config() -> Config:
     Load environment variables from a .env file.
     """
     dotenv.load_dotenv(".env")
+    optional = dotenv.dotenv_values(".env")
 
     return Config(
         db=DBConfig(
@@ -34,6 +77,21 @@ def _load_config() -> Config:
             username=dotenv.get_key(".env", "DB_USERNAME"),
             password=dotenv.get_key(".env", "DB_PASSWORD"),
             database_name=dotenv.get_key(".env", "DB_DATABASE_NAME"),
+            replica_host=optional.get("DB_REPLICA_HOST"),
+            replica_port=optional.get("DB_REPLICA_PORT"),
+            replica_wait_timeout=optional.get("DB_REPLICA_WAIT_TIMEOUT", 0.5),
+            stream_batch_size=optional.get("DB_STREAM_BATCH_SIZE", 1000),
+        ),
+        analytics=AnalyticsConfig(
+            sales_in_memory=optional.get("ANALYTICS_SALES_IN_MEMORY", False),
+            compare_cache_size=optional.get("ANALYTICS_COMPARE_CACHE_SIZE", 100_000),
+            compare_cache_settle=optional.get("ANALYTICS_COMPARE_CACHE_SETTLE", 30),
+        ),
+        catalog=CatalogConfig(
+            cache_size=optional.get("CATALOG_CACHE_SIZE", 10_000),
+            cache_ttl=optional.get("CATALOG_CACHE_TTL", 60),
+            cache_backend=optional.get("CATALOG_CACHE_BACKEND", "local"),
+            bulk_chunk_size=optional.get("CATALOG_BULK_CHUNK_SIZE", 1000),
         ),
     )
 
@@ -0,0 +1,68 @@
+"""
+Catalog cache invalidations shared between processes through postgres LISTEN/NOTIFY,
+so every uvicorn worker drops what any of them changed, without another service.
+"""
+
+import json
+import asyncio
+from uuid import uuid4
+from typing import Any, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.services.product.cache import CatalogInvalidations, CatalogKey
+
+CHANNEL = "catalog_invalidations"
+
+# notifications are capped at 8000 bytes, past this many keys the others drop everything
+MAX_NOTIFIED_KEYS = 100
+
+
+class PostgresCatalogInvalidations(CatalogInvalidations):
+    def __init__(self, engine: AsyncEngine, channel: str = CHANNEL):
+        self.engine = engine
+        self.channel = channel
+        # our own notifications come back to us too, they're told apart by this
+        self.sender = str(uuid4())
+
+        # held out of the pool for as long as the process listens
+        self.connection: Optional[AsyncConnection] = None
+        self.driver_connection: Any = None
+        self.on_invalidation: Optional[Callable[[Optional[list[CatalogKey]]], None]] = None
+        # the connection runs one statement at a time, commits publish concurrently
+        self.lock = asyncio.Lock()
+
+    async def start(self, on_invalidation: Callable[[Optional[list[CatalogKey]]], None]) -> None:
+        self.on_invalidation = on_invalidation
+        self.connection = await self.engine.connect()
+        self.driver_connection = (await self.connection.get_raw_connection()).driver_connection
+        await self.driver_connection.add_listener(self.channel, self._received)
+
+    async def publish(self, keys: list[CatalogKey]) -> None:
+        if self.driver_connection is None:
+            return
+
+        payload = json.dumps(
+            {
+                "sender": self.sender,
+                "keys": keys if len(keys) <= MAX_NOTIFIED_KEYS else None,
+            }
+        )
+        async with self.lock:
+            await self.driver_connection.execute("select pg_notify($1, $2)", self.channel, payload)
+
+    def _received(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        message = json.loads(payload)
+        if message["sender"] == self.sender or self.on_invalidation is None:
+            return
+
+        keys = message["keys"]
+        self.on_invalidation(None if keys is None else [tuple(key) for key in keys])
+
+    async def stop(self) -> None:
+        if self.connection is None:
+            return
+
+        await self.driver_connection.remove_listener(self.channel, self._received)
+        await self.connection.close()
+        self.connection = self.driver_connection = None
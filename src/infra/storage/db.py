@@ -1,6 +1,11 @@
-from functools import lru_cache
-
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import declarative_base
 
 from src.infra.config import config
@@ -8,23 +13,48 @@ from src.infra.config import config
 Base = declarative_base()
 
 
-def db_url(sync: bool = False) -> str:
+def db_url(sync: bool = False, replica: bool = False) -> str:
     engine = f"{config.db.engine}+asyncpg://" if not sync else f"{config.db.engine}://"
 
+    host, port = config.db.host, config.db.port
+    if replica:
+        host, port = config.db.replica_host, config.db.replica_port or config.db.port
+
     url = (
         f"{engine}"
         f"{config.db.username}:{config.db.password}"
-        f"@{config.db.host}:{config.db.port}"
+        f"@{host}:{port}"
         f"/{config.db.database_name}"
     )
     return url
 
 
-def get_engine():
-    """Returns a SQLAlchemy engine based on the configuration"""
-    return create_async_engine(db_url(), pool_size=10, max_overflow=20, pool_timeout=120)
+def has_replica() -> bool:
+    """Whether a read replica is configured"""
+    return config.db.replica_host is not None
+
+
+def get_engine(replica: bool = False) -> AsyncEngine:
+    """
+    Returns a new SQLAlchemy engine (and connection pool) based on the configuration.
+    The application creates exactly one of these per process (two with a replica), in the lifespan.
+    """
+    return create_async_engine(
+        db_url(replica=replica), pool_size=10, max_overflow=20, pool_timeout=120
+    )
+
+
+def read_only(engine: AsyncEngine) -> AsyncEngine:
+    """
+    Returns a view of `engine` sharing its pool, whose transactions start as
+    `BEGIN READ ONLY` (asyncpg sends that in the same round trip as the BEGIN)
+    """
+    return engine.execution_options(postgresql_readonly=True)
 
 
-def get_session_factory():
-    """Returns a SQLAlchemy session factory based on the configuration"""
-    return async_sessionmaker(bind=get_engine(), expire_on_commit=True, autoflush=False)
+def get_session_factory(engine: Optional[AsyncEngine] = None) -> async_sessionmaker[AsyncSession]:
+    """
+    Returns a SQLAlchemy session factory bound to `engine`.
+    If no engine is given a new one is created, which is only meant for scripts and tests.
+    """
+    return async_sessionmaker(bind=engine or get_engine(), expire_on_commit=True, autoflush=False)
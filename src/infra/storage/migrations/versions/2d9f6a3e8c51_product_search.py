@@ -0,0 +1,65 @@
+"""Full text and typo tolerant search over products
+
+Revision ID: 2d9f6a3e8c51
+Revises: 8e5b0c7d1a24
+Create Date: 2026-10-18 23:18:04.552907
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2d9f6a3e8c51"
+down_revision: Union[str, None] = "8e5b0c7d1a24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# same expression as the ORM model's, names weigh more than descriptions
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A')"
+    " || setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema"""
+    # stored, so searches don't re-parse every product (adding it rewrites the table once)
+    op.add_column(
+        "products",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR, persisted=True),
+        ),
+    )
+    op.create_index(
+        "ix_products_search_vector", "products", ["search_vector"], postgresql_using="gin"
+    )
+
+    # pg_trgm ships with postgres but is a contrib module some builds leave out,
+    # without it the search only matches whole words and prefixes
+    connection = op.get_bind()
+    has_trigrams = connection.scalar(
+        sa.text("select exists (select 1 from pg_available_extensions where name = 'pg_trgm')")
+    )
+    if has_trigrams:
+        op.execute("create extension if not exists pg_trgm")
+        op.create_index(
+            "ix_products_name_trgm",
+            "products",
+            ["name"],
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema"""
+    op.execute("drop index if exists ix_products_name_trgm")
+    op.drop_index("ix_products_search_vector", table_name="products")
+    op.drop_column("products", "search_vector")
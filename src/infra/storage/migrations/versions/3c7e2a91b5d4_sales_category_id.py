@@ -0,0 +1,84 @@
+"""Denormalize the product category onto sales
+
+Revision ID: 3c7e2a91b5d4
+Revises: 5d4189a66e41
+Create Date: 2026-10-18 17:42:18.204551
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "3c7e2a91b5d4"
+down_revision: Union[str, None] = "5d4189a66e41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# sales updated per transaction by the backfill
+BACKFILL_BATCH_SIZE = 10_000
+
+
+def upgrade() -> None:
+    """Upgrade schema"""
+    # nullable and without a default, so adding it doesn't rewrite the table
+    op.add_column("sales", sa.Column("category_id", postgresql.UUID(as_uuid=False), nullable=True))
+
+    connection = op.get_bind()
+
+    # one transaction per batch, in (created_at, id) order, so the row locks
+    # are short lived and a big table keeps taking writes meanwhile
+    with op.get_context().autocommit_block():
+        after = None
+        while True:
+            params = {"offset": BACKFILL_BATCH_SIZE - 1}
+            after_filter = ""
+            if after:
+                params.update(after_created_at=after[0], after_id=after[1])
+                after_filter = "(sales.created_at, sales.id) > (:after_created_at, :after_id)"
+
+            # last sale of the batch, none when this is the last one
+            upper = connection.execute(
+                sa.text(
+                    "select sales.created_at, sales.id from sales"
+                    + (f" where {after_filter}" if after else "")
+                    + " order by sales.created_at, sales.id offset :offset limit 1"
+                ),
+                params,
+            ).first()
+
+            filters = ["products.id = sales.product_id"]
+            if after:
+                filters.append(after_filter)
+            if upper:
+                params.update(upper_created_at=upper[0], upper_id=upper[1])
+                filters.append("(sales.created_at, sales.id) <= (:upper_created_at, :upper_id)")
+
+            connection.execute(
+                sa.text(
+                    "update sales set category_id = products.category_id from products where "
+                    + " and ".join(filters)
+                ),
+                params,
+            )
+
+            if upper is None:
+                break
+            after = tuple(upper)
+
+    # category date ranges, covering like the per product one
+    op.create_index(
+        "ix_sales_category_id_created_at",
+        "sales",
+        ["category_id", "created_at"],
+        postgresql_include=["total_price", "quantity"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema"""
+    op.drop_index("ix_sales_category_id_created_at", table_name="sales")
+    op.drop_column("sales", "category_id")
@@ -0,0 +1,131 @@
+"""Partition sales by month
+
+Revision ID: 5d4189a66e41
+Revises: f0b9a1f77401
+Create Date: 2026-10-18 13:27:09.551846
+
+"""
+
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "5d4189a66e41"
+down_revision: Union[str, None] = "f0b9a1f77401"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# partitions created past the current month, later ones come from the
+# `sales-partitions` maintenance command
+MONTHS_AHEAD = 3
+
+
+def _sales_table(name: str, *args, **kwargs) -> None:
+    op.create_table(
+        name,
+        sa.Column("id", postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column(
+            "product_id",
+            postgresql.UUID(as_uuid=False),
+            sa.ForeignKey("products.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("total_price", sa.Float(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        *args,
+        **kwargs,
+    )
+
+
+def _sales_indexes() -> None:
+    op.create_index("ix_sales_created_at", "sales", ["created_at"])
+    op.create_index(
+        "ix_sales_product_id_created_at",
+        "sales",
+        ["product_id", "created_at"],
+        postgresql_include=["total_price", "quantity"],
+    )
+    op.create_index("ix_sales_created_at_brin", "sales", ["created_at"], postgresql_using="brin")
+
+
+def _drop_sales_indexes(table: str) -> None:
+    for name in (
+        "ix_sales_created_at",
+        "ix_sales_product_id_created_at",
+        "ix_sales_created_at_brin",
+    ):
+        op.drop_index(name, table_name=table, if_exists=True)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema"""
+    # move the current table out of the way, along with the names it holds
+    op.rename_table("sales", "sales_unpartitioned")
+    _drop_sales_indexes("sales_unpartitioned")
+    op.drop_index("ix_sales_id", table_name="sales_unpartitioned")
+    op.execute("alter table sales_unpartitioned rename constraint sales_pkey to sales_old_pkey")
+
+    # the partition key has to be part of every unique constraint
+    _sales_table(
+        "sales",
+        sa.PrimaryKeyConstraint("id", "created_at", name="sales_pkey"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+
+    # one partition per UTC month, from the oldest sale to a few months from now
+    now = datetime.now(timezone.utc)
+    oldest, newest = (
+        op.get_bind()
+        .execute(sa.text("select min(created_at), max(created_at) from sales_unpartitioned"))
+        .one()
+    )
+    month = (oldest or now).astimezone(timezone.utc).date().replace(day=1)
+    through = _add_months(
+        max(newest or now, now).astimezone(timezone.utc).date().replace(day=1), MONTHS_AHEAD
+    )
+
+    while month <= through:
+        following = _add_months(month, 1)
+        op.execute(
+            f"create table sales_{month:%Y_%m} partition of sales"
+            f" for values from ('{month} 00:00:00+00') to ('{following} 00:00:00+00')"
+        )
+        month = following
+
+    # whatever no month partition takes, so an insert never fails for a missing partition
+    op.execute("create table sales_default partition of sales default")
+
+    op.execute(
+        "insert into sales (id, product_id, quantity, total_price, created_at)"
+        " select id, product_id, quantity, total_price, created_at from sales_unpartitioned"
+    )
+    op.drop_table("sales_unpartitioned")
+
+    # built once the rows are in, cheaper than maintaining them during the copy
+    _sales_indexes()
+
+
+def downgrade() -> None:
+    """Downgrade schema"""
+    _sales_table("sales_unpartitioned")
+    op.execute(
+        "insert into sales_unpartitioned (id, product_id, quantity, total_price, created_at)"
+        " select id, product_id, quantity, total_price, created_at from sales"
+    )
+
+    # drops every partition along with it
+    op.drop_table("sales")
+    op.rename_table("sales_unpartitioned", "sales")
+    op.create_primary_key("sales_pkey", "sales", ["id"])
+    op.create_index("ix_sales_id", "sales", ["id"])
+    _sales_indexes()
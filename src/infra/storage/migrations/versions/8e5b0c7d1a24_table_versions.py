@@ -0,0 +1,69 @@
+"""Per-table change counters, for the ETags of the list endpoints
+
+Revision ID: 8e5b0c7d1a24
+Revises: 3c7e2a91b5d4
+Create Date: 2026-10-18 21:06:51.730412
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8e5b0c7d1a24"
+down_revision: Union[str, None] = "3c7e2a91b5d4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# tables whose writes are counted
+VERSIONED_TABLES = ("products", "product_categories", "inventory_items")
+
+# counters per table, writers pick one by backend pid, so that concurrent
+# transactions don't queue on a single row until they commit
+SHARDS = 16
+
+
+def upgrade() -> None:
+    """Upgrade schema"""
+    op.create_table(
+        "table_versions",
+        sa.Column("table_name", sa.String(), primary_key=True, nullable=False),
+        sa.Column("shard", sa.SmallInteger(), primary_key=True, nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+    )
+
+    # upserted, so the counters come back by themselves if the table is emptied
+    op.execute(
+        f"""
+        create function bump_table_version() returns trigger language plpgsql as $$
+        begin
+            insert into table_versions (table_name, shard, version)
+            values (TG_TABLE_NAME, pg_backend_pid() % {SHARDS}, 1)
+            on conflict (table_name, shard)
+            do update set version = table_versions.version + 1;
+            return null;
+        end
+        $$
+        """
+    )
+
+    # once per statement, not per row, bulk writes count once
+    for table in VERSIONED_TABLES:
+        op.execute(
+            f"""
+            create trigger {table}_version
+            after insert or update or delete or truncate on {table}
+            for each statement execute function bump_table_version()
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema"""
+    for table in VERSIONED_TABLES:
+        op.execute(f"drop trigger {table}_version on {table}")
+    op.execute("drop function bump_table_version()")
+    op.drop_table("table_versions")
@@ -0,0 +1,58 @@
+"""Sales daily rollup
+
+Revision ID: b9798e64ee9a
+Revises: ccf14c57f0b3
+Create Date: 2026-10-18 09:12:40.218113
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b9798e64ee9a"
+down_revision: Union[str, None] = "ccf14c57f0b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema"""
+    op.create_table(
+        "sales_daily_rollup",
+        sa.Column("day", sa.Date(), primary_key=True, nullable=False),
+        sa.Column(
+            "product_id",
+            postgresql.UUID(as_uuid=False),
+            sa.ForeignKey("products.id", ondelete="CASCADE"),
+            primary_key=True,
+            nullable=False,
+        ),
+        sa.Column("quantity", sa.BigInteger(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+    )
+    op.create_index(
+        "ix_sales_daily_rollup_product_id_day", "sales_daily_rollup", ["product_id", "day"]
+    )
+
+    # existing sales, days are UTC days
+    op.execute(
+        """
+        insert into sales_daily_rollup (day, product_id, quantity, revenue, count)
+        select (created_at at time zone 'UTC')::date, product_id,
+               sum(quantity), sum(total_price), count(*)
+        from sales
+        group by 1, 2
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema"""
+    op.drop_index("ix_sales_daily_rollup_product_id_day", table_name="sales_daily_rollup")
+    op.drop_table("sales_daily_rollup")
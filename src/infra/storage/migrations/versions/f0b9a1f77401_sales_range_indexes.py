@@ -0,0 +1,67 @@
+"""Sales range indexes
+
+Revision ID: f0b9a1f77401
+Revises: b9798e64ee9a
+Create Date: 2026-10-18 11:03:52.640317
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f0b9a1f77401"
+down_revision: Union[str, None] = "b9798e64ee9a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema"""
+    # built concurrently so a big sales table keeps taking writes meanwhile,
+    # which can't happen inside the migration's transaction
+    with op.get_context().autocommit_block():
+        # per product date ranges, covering so the aggregates never touch the heap
+        op.create_index(
+            "ix_sales_product_id_created_at",
+            "sales",
+            ["product_id", "created_at"],
+            postgresql_include=["total_price", "quantity"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # sales are appended in created_at order, so a few pages of block ranges
+        # are enough to skip most of the table on wide date ranges
+        op.create_index(
+            "ix_sales_created_at_brin",
+            "sales",
+            ["created_at"],
+            postgresql_using="brin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # the composite index above starts with product_id, this one is dead weight on inserts
+        op.drop_index(
+            "ix_sales_product_id",
+            table_name="sales",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema"""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_sales_product_id",
+            "sales",
+            ["product_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index("ix_sales_created_at_brin", table_name="sales", postgresql_concurrently=True)
+        op.drop_index(
+            "ix_sales_product_id_created_at", table_name="sales", postgresql_concurrently=True
+        )
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Text, Double, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy import Column, Computed, String, Text, Double, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID as PG_UUID
+from sqlalchemy.orm import deferred
 
 from src.infra.storage.db import Base
 
@@ -14,6 +15,7 @@ class ProductCategory(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),)
 
     id = Column(PG_UUID(as_uuid=False), primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -25,3 +27,16 @@ class Product(Base):
     )
     description = Column(Text, nullable=True)
     price = Column(Double, nullable=False)
+
+    # what the search matches, maintained by postgres (see migration 2d9f6a3e8c51),
+    # deferred so that reading products doesn't drag it along
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                "setweight(to_tsvector('simple', coalesce(name, '')), 'A')"
+                " || setweight(to_tsvector('simple', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+        )
+    )
@@ -1,21 +1,61 @@
 import uuid
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Date, Index, Integer, Float, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from src.infra.storage.db import Base
 
 
 class Sale(Base):
-    __tablename__ = "sales"
+    """Partitioned by UTC month of `created_at`, see `src.infra.storage.partitions`"""
 
-    id = Column(
-        PG_UUID(as_uuid=False), primary_key=True, default=uuid.uuid4, nullable=False, index=True
+    __tablename__ = "sales"
+    __table_args__ = (
+        # per product date ranges, covering so aggregates are index only scans
+        Index(
+            "ix_sales_product_id_created_at",
+            "product_id",
+            "created_at",
+            postgresql_include=["total_price", "quantity"],
+        ),
+        # per category date ranges, without going through products
+        Index(
+            "ix_sales_category_id_created_at",
+            "category_id",
+            "created_at",
+            postgresql_include=["total_price", "quantity"],
+        ),
+        # wide date ranges over the append-mostly table
+        Index("ix_sales_created_at_brin", "created_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
+
+    # the partition key is part of the primary key, postgres can't enforce uniqueness without it
+    id = Column(PG_UUID(as_uuid=False), primary_key=True, default=uuid.uuid4, nullable=False)
     product_id = Column(
         PG_UUID(as_uuid=False),
         ForeignKey("products.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     quantity = Column(Integer, nullable=False)
     total_price = Column(Float, nullable=False)
-    created_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), primary_key=True, nullable=False, index=True)
+    # copy of the product's category, taken when the sale is written and
+    # rewritten when the product moves to another category
+    category_id = Column(PG_UUID(as_uuid=False), nullable=True)
+
+
+class SalesDailyRollup(Base):
+    """Sales totals per UTC day and product, kept up to date by every write to `sales`"""
+
+    __tablename__ = "sales_daily_rollup"
+    __table_args__ = (Index("ix_sales_daily_rollup_product_id_day", "product_id", "day"),)
+
+    day = Column(Date, primary_key=True, nullable=False)
+    product_id = Column(
+        PG_UUID(as_uuid=False),
+        ForeignKey("products.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+    quantity = Column(BigInteger, nullable=False)
+    revenue = Column(Float, nullable=False)
+    count = Column(BigInteger, nullable=False)
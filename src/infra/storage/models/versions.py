@@ -0,0 +1,17 @@
+from sqlalchemy import BigInteger, Column, SmallInteger, String
+
+from src.infra.storage.db import Base
+
+
+class TableVersion(Base):
+    """
+    Write counters of the tables behind the list endpoints, bumped by a trigger after every
+    statement that changes them (see migration 8e5b0c7d1a24). A table's version is the sum
+    of its shards.
+    """
+
+    __tablename__ = "table_versions"
+
+    table_name = Column(String, primary_key=True, nullable=False)
+    shard = Column(SmallInteger, primary_key=True, nullable=False)
+    version = Column(BigInteger, nullable=False)
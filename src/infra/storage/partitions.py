@@ -0,0 +1,127 @@
+"""
+Maintenance of the monthly partitions of `sales`.
+
+Each partition is named `sales_YYYY_MM` and holds one UTC month of `created_at`.
+Sales outside of every month partition land in `sales_default`, so an insert
+never fails for lack of a partition, the next `create_sales_partitions` moves
+them where they belong.
+"""
+
+import re
+from datetime import date, datetime, time, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PARTITION = "sales_default"
+
+_PARTITION_NAME = re.compile(r"^sales_(\d{4})_(\d{2})$")
+
+
+def month_of(day: date) -> date:
+    """First day of the month `day` is in"""
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"sales_{month:%Y_%m}"
+
+
+async def sales_partitions(session: AsyncSession) -> list[date]:
+    """The months that have a partition, in order"""
+    result = await session.execute(text("""
+            select child.relname
+            from pg_inherits
+            join pg_class child on child.oid = pg_inherits.inhrelid
+            where pg_inherits.inhparent = 'sales'::regclass
+            """))
+
+    months = []
+    for (name,) in result.all():
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+
+    return sorted(months)
+
+
+async def create_sales_partitions(session: AsyncSession, first: date, last: date) -> list[str]:
+    """Create the missing partitions for the months from `first` to `last`, returns their names"""
+    existing = set(await sales_partitions(session))
+    created = []
+
+    month = month_of(first)
+    while month <= month_of(last):
+        if month not in existing:
+            await _create_partition(session, month)
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+
+    return created
+
+
+async def expire_sales_partitions(
+    session: AsyncSession, before: date, drop: bool = False
+) -> list[str]:
+    """
+    Detach the partitions of the months before `before`, returns their names.
+    Detached partitions stay around as plain tables (e.g. to archive them) unless `drop`.
+    Their days of the daily rollup go with them, so that the totals read from it
+    keep agreeing with the sales.
+    """
+    expired = []
+    for month in await sales_partitions(session):
+        if month >= month_of(before):
+            break
+
+        name = partition_name(month)
+        await session.execute(text(f"alter table sales detach partition {name}"))
+        if drop:
+            await session.execute(text(f"drop table {name}"))
+        await session.execute(
+            text("delete from sales_daily_rollup where day >= :first and day < :next"),
+            {"first": month, "next": add_months(month, 1)},
+        )
+        expired.append(name)
+
+    return expired
+
+
+async def _create_partition(session: AsyncSession, month: date) -> None:
+    name = partition_name(month)
+    lower, upper = _utc_midnight(month), _utc_midnight(add_months(month, 1))
+    bounds = f"for values from ('{lower.isoformat()}') to ('{upper.isoformat()}')"
+
+    stranded = await session.scalar(
+        text(
+            f"select exists (select from {DEFAULT_PARTITION}"
+            " where created_at >= :lower and created_at < :upper)"
+        ),
+        {"lower": lower, "upper": upper},
+    )
+    if not stranded:
+        await session.execute(text(f"create table {name} partition of sales {bounds}"))
+        return
+
+    # postgres refuses a partition over rows the default one already holds,
+    # so those are moved over with the default partition detached meanwhile
+    await session.execute(text(f"alter table sales detach partition {DEFAULT_PARTITION}"))
+    await session.execute(text(f"create table {name} partition of sales {bounds}"))
+    await session.execute(
+        text(
+            f"with moved as (delete from {DEFAULT_PARTITION}"
+            " where created_at >= :lower and created_at < :upper returning *)"
+            f" insert into {name} select * from moved"
+        ),
+        {"lower": lower, "upper": upper},
+    )
+    await session.execute(text(f"alter table sales attach partition {DEFAULT_PARTITION} default"))
+
+
+def _utc_midnight(day: date) -> datetime:
+    return datetime.combine(day, time(), tzinfo=timezone.utc)
@@ -0,0 +1,444 @@
+"""
+Sales kept in process as NumPy columns, for analytics served from memory.
+
+Optional (NumPy is only imported when `ANALYTICS_SALES_IN_MEMORY` is on): the
+store is loaded from the database at startup and every sale committed through
+this process's units of work is appended to it afterwards, and dropped once its
+product is deleted through them. Sales written by other processes are not seen
+until a restart, so it fits single process deployments, or analytics that can
+live with that. The same goes for the months `sales-partitions` expires: their
+sales are still counted from memory until the API restarts.
+
+Per row: id (16 B), created_at (8 B), product (4 B), category (4 B),
+total_price (8 B) and quantity (4 B), 44 B, so ~44 MB per million sales,
+up to twice that right after the columns grow.
+"""
+
+from uuid import UUID
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Union
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.domain.sales.models import (
+    GRANULARITY_STEPS,
+    Granularity,
+    Sale as DomainSale,
+    SalesBucket,
+    SalesGrouping,
+    SalesMetric,
+    SalesSummary,
+    SalesTotal,
+)
+from src.domain.sales.repository import AbstractSalesReader
+from src.infra.storage.models.sales import Sale as SaleORM
+from src.services.sales.ranking import top_totals
+
+if TYPE_CHECKING:
+    from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+# category code of products without a category
+_NO_CATEGORY = -1
+
+# what `SalesColumns.select` picks out of the columns
+Rows = Union[slice, np.ndarray]
+
+_COLUMNS = {
+    "ids": "S16",
+    "created_at": np.int64,
+    "products": np.int32,
+    "categories": np.int32,
+    "total_prices": np.float64,
+    "quantities": np.int32,
+}
+
+
+class SalesColumns:
+    """
+    The sales as one NumPy array per column, ordered by (created_at, id).
+    Products and categories are stored as small integer codes, `created_at`
+    as microseconds since the epoch.
+
+    Everything runs on the event loop without awaiting in the middle
+    of a change, so readers never see a half appended batch.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.size = 0
+        for name, dtype in _COLUMNS.items():
+            setattr(self, name, np.empty(capacity, dtype=dtype))
+
+        self.product_ids: list[str] = []
+        self.product_codes: dict[str, int] = {}
+        self.category_ids: list[str] = []
+        self.category_codes: dict[str, int] = {}
+
+        # category of the products, for the sales appended without one
+        self.product_categories: dict[str, Optional[str]] = {}
+
+        # appends are in order most of the time, the rare one that isn't
+        # gets everything re-sorted before the next read
+        self.ordered = True
+
+    @classmethod
+    async def load(cls, session: AsyncSession, batch_size: int = 10_000) -> "SalesColumns":
+        """Read every sale from the database, `batch_size` rows at a time"""
+        store = cls()
+
+        query = select(
+            SaleORM.id,
+            SaleORM.product_id,
+            SaleORM.quantity,
+            SaleORM.total_price,
+            SaleORM.created_at,
+            SaleORM.category_id,
+        ).order_by(SaleORM.created_at, SaleORM.id)
+
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            store.append([DomainSale(*row) for row in rows])
+
+        return store
+
+    def append(self, sales: list[DomainSale]) -> None:
+        """Add sales, with their category or else the one of their product"""
+        if not sales:
+            return
+
+        count = len(sales)
+        self._reserve(self.size + count)
+
+        new = slice(self.size, self.size + count)
+        self.ids[new] = [UUID(s.id).bytes for s in sales]
+        self.created_at[new] = [_micros(s.created_at) for s in sales]
+        self.products[new] = [self._product_code(s.product_id) for s in sales]
+        self.categories[new] = [
+            self._category_code(
+                s.category_id
+                if s.category_id is not None
+                else self.product_categories.get(s.product_id)
+            )
+            for s in sales
+        ]
+        self.total_prices[new] = [s.total_price for s in sales]
+        self.quantities[new] = [s.quantity for s in sales]
+
+        if self.ordered:
+            keys = list(zip(self.created_at[new].tolist(), self.ids[new].tolist()))
+            if self.size:
+                keys.insert(0, (int(self.created_at[self.size - 1]), self.ids[self.size - 1]))
+            self.ordered = all(a <= b for a, b in zip(keys, keys[1:]))
+
+        self.size += count
+
+    async def record_committed(self, uow: "SQLAlchemyUnitOfWork") -> None:
+        """After-commit hook of the units of work, appends the sales they just committed"""
+        # the sales come back from the database with their category
+        self.append(uow.sales.added)
+
+        for product_id, category_id in uow.sales.recategorized:
+            self.set_product_category(product_id, category_id)
+
+        # their sales were deleted along with them
+        self.remove_products(uow.products.deleted_products)
+
+    def remove_products(self, product_ids: list[str]) -> None:
+        """Drop the sales of products, the columns are compacted in place"""
+        codes = [self.product_codes[p] for p in product_ids if p in self.product_codes]
+        for product_id in product_ids:
+            self.product_categories.pop(product_id, None)
+        if not codes:
+            return
+
+        # the rows kept stay in the same order, sorted or not
+        kept = np.flatnonzero(~np.isin(self.products[: self.size], codes))
+        for name in _COLUMNS:
+            column = getattr(self, name)
+            column[: len(kept)] = column[kept]
+        self.size = len(kept)
+
+    def set_product_category(self, product_id: str, category_id: Optional[str]) -> None:
+        """Move the sales of a product to another category"""
+        self.product_categories[product_id] = category_id
+
+        code = self.product_codes.get(product_id)
+        if code is not None:
+            sales = self.products[: self.size] == code
+            self.categories[: self.size][sales] = self._category_code(category_id)
+
+    def repository(self) -> "SalesRepository":
+        return SalesRepository(self)
+
+    def select(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> Rows:
+        """
+        The sales in [start, end] of a product and/or category, in order.
+        A slice of the columns when only dates are given (reading it copies nothing),
+        the positions of the matching sales otherwise.
+        """
+        self._sort()
+        created_at = self.created_at[: self.size]
+
+        # the rows are ordered, so a date range is a slice found by binary search
+        lo = int(np.searchsorted(created_at, _micros(start), "left")) if start else 0
+        hi = int(np.searchsorted(created_at, _micros(end), "right")) if end else self.size
+        rows = slice(lo, hi)
+
+        mask = None
+        for column, codes, value in (
+            (self.products, self.product_codes, product_id),
+            (self.categories, self.category_codes, category_id),
+        ):
+            if not value:
+                continue
+
+            code = codes.get(value)
+            if code is None:
+                return np.empty(0, dtype=np.intp)
+
+            matches = column[rows] == code
+            mask = matches if mask is None else mask & matches
+
+        if mask is None:
+            return rows
+
+        return lo + np.flatnonzero(mask)
+
+    def sales_at(self, rows: Rows) -> list[DomainSale]:
+        return [
+            DomainSale(
+                id=_uuid(sale_id),
+                product_id=self.product_ids[product],
+                quantity=quantity,
+                total_price=total_price,
+                created_at=_EPOCH + timedelta(microseconds=created_at),
+                category_id=self.category_ids[category] if category != _NO_CATEGORY else None,
+            )
+            for sale_id, product, quantity, total_price, created_at, category in zip(
+                self.ids[rows].tolist(),
+                self.products[rows].tolist(),
+                self.quantities[rows].tolist(),
+                self.total_prices[rows].tolist(),
+                self.created_at[rows].tolist(),
+                self.categories[rows].tolist(),
+            )
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the columns"""
+        return sum(getattr(self, name).nbytes for name in _COLUMNS)
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self.ids)
+        if size <= capacity:
+            return
+
+        # doubling keeps appends amortized O(1)
+        while capacity < size:
+            capacity *= 2
+
+        for name in _COLUMNS:
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[: self.size] = column[: self.size]
+            setattr(self, name, grown)
+
+    def _sort(self) -> None:
+        if self.ordered:
+            return
+
+        order = np.lexsort((self.ids[: self.size], self.created_at[: self.size]))
+        for name in _COLUMNS:
+            column = getattr(self, name)
+            column[: self.size] = column[: self.size][order]
+
+        self.ordered = True
+
+    def _product_code(self, product_id: str) -> int:
+        code = self.product_codes.get(product_id)
+        if code is None:
+            code = self.product_codes[product_id] = len(self.product_ids)
+            self.product_ids.append(product_id)
+        return code
+
+    def _category_code(self, category_id: Optional[str]) -> int:
+        if category_id is None:
+            return _NO_CATEGORY
+
+        code = self.category_codes.get(category_id)
+        if code is None:
+            code = self.category_codes[category_id] = len(self.category_ids)
+            self.category_ids.append(category_id)
+        return code
+
+
+class SalesRepository(AbstractSalesReader):
+    """
+    Read-only sales repository over a `SalesColumns` store.
+    Sales are recorded through the database, the store follows after each commit.
+    """
+
+    def __init__(self, store: SalesColumns) -> None:
+        self.store = store
+
+    async def get_sales_between_dates(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[tuple[datetime, str]] = None,
+    ) -> List[DomainSale]:
+        rows = self.store.select(start_date, end_date, product_id, category_id)
+
+        if after is not None:
+            after_micros, after_id = _micros(after[0]), UUID(after[1]).bytes
+            created_at, ids = self.store.created_at[rows], self.store.ids[rows]
+            keep = (created_at > after_micros) | ((created_at == after_micros) & (ids > after_id))
+            rows = _positions(rows)[keep]
+
+        if limit is not None:
+            rows = _part(rows, 0, limit)
+
+        return self.store.sales_at(rows)
+
+    async def stream_sales_between_dates(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[DomainSale]:
+        rows = self.store.select(start_date, end_date, product_id, category_id)
+        count = rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+        for offset in range(0, count, batch_size):
+            for sale in self.store.sales_at(_part(rows, offset, offset + batch_size)):
+                yield sale
+
+    async def summarize_sales(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> SalesSummary:
+        rows = self.store.select(start_date, end_date, product_id, category_id)
+        quantities = self.store.quantities[rows]
+
+        return SalesSummary(
+            count=len(quantities),
+            quantity=int(quantities.sum(dtype=np.int64)),
+            total_price=float(self.store.total_prices[rows].sum()),
+        )
+
+    async def aggregate_sales(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: Granularity = "day",
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> List[SalesBucket]:
+        start = _as_utc(start)
+        step = GRANULARITY_STEPS[granularity]
+
+        rows = self.store.select(start, end, product_id, category_id)
+        indexes = (self.store.created_at[rows] - _micros(start)) // (step // _MICROSECOND)
+
+        # one vectorized pass per total
+        counts = np.bincount(indexes)
+        totals = np.bincount(indexes, weights=self.store.total_prices[rows])
+        quantities = np.bincount(indexes, weights=self.store.quantities[rows])
+
+        return [
+            SalesBucket(
+                start=start + index * step,
+                total_price=float(totals[index]),
+                quantity=int(quantities[index]),
+                count=int(counts[index]),
+            )
+            for index in np.flatnonzero(counts).tolist()
+        ]
+
+    async def top_sales(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        metric: SalesMetric = "revenue",
+        n: int = 10,
+        group_by: SalesGrouping = "product",
+        category_id: Optional[str] = None,
+    ) -> List[SalesTotal]:
+        rows = self.store.select(start, end, category_id=category_id)
+
+        if group_by == "product":
+            ids, codes = self.store.product_ids, self.store.products[rows]
+        else:
+            ids, codes = self.store.category_ids, self.store.categories[rows]
+            # the sales of products without a category aren't ranked
+            known = codes != _NO_CATEGORY
+            rows, codes = _positions(rows)[known], codes[known]
+
+        # one vectorized pass per total, then only the products (or categories) are ranked
+        counts = np.bincount(codes, minlength=len(ids))
+        totals = np.bincount(codes, weights=self.store.total_prices[rows], minlength=len(ids))
+        quantities = np.bincount(codes, weights=self.store.quantities[rows], minlength=len(ids))
+
+        return top_totals(
+            (
+                SalesTotal(
+                    id=ids[code],
+                    total_price=float(totals[code]),
+                    quantity=int(quantities[code]),
+                    count=int(counts[code]),
+                )
+                for code in np.flatnonzero(counts).tolist()
+            ),
+            metric,
+            n,
+        )
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Timezone aware UTC datetime, naive ones are taken to be UTC already"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+
+    return value.astimezone(timezone.utc)
+
+
+def _micros(value: datetime) -> int:
+    return (_as_utc(value) - _EPOCH) // _MICROSECOND
+
+
+def _uuid(value: bytes) -> str:
+    # numpy drops the trailing zero bytes of fixed size strings
+    digits = value.ljust(16, b"\0").hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+def _positions(rows: Rows) -> np.ndarray:
+    if isinstance(rows, slice):
+        return np.arange(rows.start, rows.stop)
+    return rows
+
+
+def _part(rows: Rows, start: int, stop: int) -> Rows:
+    """`rows[start:stop]`, still a slice of the columns if `rows` is one"""
+    if isinstance(rows, slice):
+        return slice(min(rows.start + start, rows.stop), min(rows.start + stop, rows.stop))
+    return rows[start:stop]
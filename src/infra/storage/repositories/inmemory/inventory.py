@@ -1,29 +1,59 @@
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
 from typing import Optional
 
 from src.domain.inventory.models import InventoryItem, InventoryUpdate
 from src.domain.inventory.repository import AbstractInventoryRepository
+from src.infra.storage.repositories.inmemory.pagination import paginate
 
 
 class InventoryRepository(AbstractInventoryRepository):
     def __init__(self) -> None:
         self.inventory_updates: list[InventoryUpdate] = []
         self.inventory: dict[str, InventoryItem] = {}
-
-    async def add_inventory_update(self, update: InventoryUpdate) -> None:
+        # (quantity, product_id) for every item, kept sorted so low stock is a bisect
+        self.by_quantity: list[tuple[int, str]] = []
+        # the product ids of the items, kept sorted so a page is a bisect away
+        self.product_ids: list[str] = []
+        # bumped by every write
+        self.version = 0
+
+    async def add_inventory_update(self, update: InventoryUpdate) -> InventoryItem:
         self.inventory_updates.append(update)
+        self.version += 1
 
         if update.product_id in self.inventory:
-            self.inventory[update.product_id].quantity += update.quantity
+            item = self.inventory[update.product_id]
+            del self.by_quantity[bisect_left(self.by_quantity, (item.quantity, item.product_id))]
+            item.quantity += update.quantity
         else:
+            insort(self.product_ids, update.product_id)
             self.inventory[update.product_id] = InventoryItem(
                 product_id=update.product_id, quantity=update.quantity
             )
 
+        item = self.inventory[update.product_id]
+        insort(self.by_quantity, (item.quantity, item.product_id))
+        return item
+
+    async def add_inventory_updates(self, updates: list[InventoryUpdate]) -> list[InventoryItem]:
+        for update in updates:
+            await self.add_inventory_update(update)
+
+        product_ids = sorted({update.product_id for update in updates})
+        return [self.inventory[product_id] for product_id in product_ids]
+
     async def get_by_product(self, product_id: str) -> Optional[InventoryItem]:
         return self.inventory.get(product_id)
 
+    async def get_version(self) -> int:
+        return self.version
+
     async def low_stock_alerts(self, threshold: int = 10) -> list[InventoryItem]:
-        return [item for item in self.inventory.values() if item.quantity <= threshold]
+        end = bisect_right(self.by_quantity, threshold, key=itemgetter(0))
+        return [self.inventory[product_id] for _, product_id in self.by_quantity[:end]]
 
-    async def list(self) -> list[InventoryItem]:
-        return list(self.inventory.values())
+    async def list(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> list[InventoryItem]:
+        return paginate(self.inventory, self.product_ids, limit, after)
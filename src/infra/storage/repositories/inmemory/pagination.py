@@ -0,0 +1,22 @@
+from bisect import bisect_right
+from typing import Any, Mapping, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def paginate(
+    items: Mapping[Any, T],
+    keys: list[Any],
+    limit: Optional[int] = None,
+    after: Optional[Any] = None,
+) -> list[T]:
+    """
+    Same as the sql `paginate`, but over items already in memory, along with
+    their keys kept sorted: a page is a bisect to `after` and a slice of `limit`
+    """
+    if limit is None and after is None:
+        return list(items.values())
+
+    start = bisect_right(keys, after) if after is not None else 0
+    end = start + limit if limit is not None else None
+    return [items[key] for key in keys[start:end]]
@@ -1,37 +1,217 @@
+import math
+import heapq
+from bisect import bisect_left, insort
 from typing import Optional
 
 from src.domain.product.repository import AbstractProductRepository
-from src.domain.product.models import Product, ProductCategory
+from src.domain.product.models import Product, ProductCategory, ProductMatch
+from src.domain.product.search import MAX_SEARCH_TERMS, search_terms
+from src.infra.storage.repositories.inmemory.pagination import paginate
+
+# weights of a word found in the name and only in the description, ts_rank's A and B
+NAME_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+
+# how much of the query's trigrams a name needs to be a match, pg_trgm's default
+WORD_SIMILARITY_THRESHOLD = 0.6
 
 
 class ProductRepository(AbstractProductRepository):
     def __init__(self) -> None:
         self.products: dict[str, Product] = {}
         self.categories: dict[str, ProductCategory] = {}
+        # the ids of both, kept sorted so a page is a bisect away
+        self.product_ids: list[str] = []
+        self.category_ids: list[str] = []
+        # bumped by every write
+        self.products_version = 0
+        self.categories_version = 0
+
+        # inverted index for the search: word -> {product id: weight}
+        self.postings: dict[str, dict[str, float]] = {}
+        # every word of the index sorted, those starting with a prefix are a slice of it
+        self.terms: list[str] = []
+        # trigram of the names -> ids of the products
+        self.trigrams: dict[str, set[str]] = {}
+        # what each product was indexed under, products can be mutated behind our back
+        self.indexed: dict[str, tuple[list[str], set[str]]] = {}
 
     async def create_product(self, product: Product) -> Product:
-        self.products[product.id] = product
+        self._unindex(product.id)
+        self._keep(product)
+        self._index(product)
+        self.products_version += 1
         return product
 
+    async def upsert_products(self, products: list[Product]) -> list[Product]:
+        for product in products:
+            self._unindex(product.id)
+            self._keep(product)
+            self._index(product)
+
+        self.products_version += 1
+        return products
+
     async def get_product(self, product_id: str) -> Optional[Product]:
         return self.products.get(product_id)
 
-    async def get_products(self) -> list[Product]:
-        return list(self.products.values())
+    async def get_products_by_ids(self, product_ids: list[str]) -> list[Product]:
+        return [
+            self.products[product_id]
+            for product_id in dict.fromkeys(product_ids)
+            if product_id in self.products
+        ]
+
+    async def get_products_version(self) -> int:
+        return self.products_version
+
+    async def search_products(
+        self, query: str, limit: int, after: Optional[tuple[float, str]] = None
+    ) -> list[ProductMatch]:
+        terms = search_terms(query)[:MAX_SEARCH_TERMS]
+        if not terms:
+            return []
+
+        # every term has to start a word of the product, or be close to a word of its name
+        scores: Optional[dict[str, float]] = None
+        for term in terms:
+            term_scores = self._term_scores(term)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    pid: scores[pid] + score for pid, score in term_scores.items() if pid in scores
+                }
+
+        # best first then by id, like the keyset of the sql search
+        keys = ((-score / len(terms), product_id) for product_id, score in scores.items())
+        if after is not None:
+            keys = (key for key in keys if key > (-after[0], after[1]))
+
+        return [
+            ProductMatch(product=self.products[product_id], score=-key)
+            for key, product_id in heapq.nsmallest(limit, keys)
+        ]
+
+    def _term_scores(self, term: str) -> dict[str, float]:
+        """The products a term matches, with the weight of the best word it starts"""
+        scores: dict[str, float] = {}
+        for index in range(bisect_left(self.terms, term), len(self.terms)):
+            if not self.terms[index].startswith(term):
+                break
+            for product_id, weight in self.postings[self.terms[index]].items():
+                scores[product_id] = max(scores.get(product_id, 0.0), weight)
+
+        # plus the share of the term's trigrams found in the name, for the typos. A name
+        # close enough shares `needed` of them, so it has one of the `len - needed + 1`
+        # rarest, which keeps the trigrams every name has (e.g. "  s") out of the way
+        term_trigrams = _trigrams(term)
+        needed = math.ceil(WORD_SIMILARITY_THRESHOLD * len(term_trigrams))
+        rarest = sorted(term_trigrams, key=lambda trigram: len(self.trigrams.get(trigram, ())))
+        candidates = set(scores).union(
+            *(self.trigrams.get(trigram, ()) for trigram in rarest[: len(rarest) - needed + 1])
+        )
+
+        for product_id in candidates:
+            similarity = len(term_trigrams & self.indexed[product_id][1]) / len(term_trigrams)
+            if product_id in scores or similarity >= WORD_SIMILARITY_THRESHOLD:
+                scores[product_id] = scores.get(product_id, 0.0) + similarity
+
+        return scores
+
+    def _index(self, product: Product) -> None:
+        weights = dict.fromkeys(search_terms(product.description), DESCRIPTION_WEIGHT)
+        weights.update(dict.fromkeys(search_terms(product.name), NAME_WEIGHT))
+        trigrams = _trigrams(product.name)
+        self.indexed[product.id] = (list(weights), trigrams)
+
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                insort(self.terms, term)
+            self.postings[term][product.id] = weight
+
+        for trigram in trigrams:
+            self.trigrams.setdefault(trigram, set()).add(product.id)
+
+    def _unindex(self, product_id: str) -> None:
+        if product_id not in self.indexed:
+            return
+        terms, trigrams = self.indexed.pop(product_id)
+
+        for term in terms:
+            postings = self.postings[term]
+            del postings[product_id]
+            if not postings:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+
+        for trigram in trigrams:
+            product_ids = self.trigrams[trigram]
+            product_ids.discard(product_id)
+            if not product_ids:
+                del self.trigrams[trigram]
+
+    async def existing_product_ids(self, product_ids: list[str]) -> set[str]:
+        return {product_id for product_id in product_ids if product_id in self.products}
+
+    async def existing_category_ids(self, category_ids: list[str]) -> set[str]:
+        return {category_id for category_id in category_ids if category_id in self.categories}
+
+    async def get_product_categories(self, product_ids: list[str]) -> dict[str, Optional[str]]:
+        return {
+            product_id: self.products[product_id].category_id
+            for product_id in product_ids
+            if product_id in self.products
+        }
+
+    async def get_products(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> list[Product]:
+        return paginate(self.products, self.product_ids, limit, after)
 
     async def update_product(self, product: Product) -> Product:
-        self.products[product.id] = product
+        self._unindex(product.id)
+        self._keep(product)
+        self._index(product)
+        self.products_version += 1
         return product
 
     async def delete_product(self, product_id: str) -> None:
+        self._unindex(product_id)
         del self.products[product_id]
+        del self.product_ids[bisect_left(self.product_ids, product_id)]
+        self.products_version += 1
 
     async def add_category(self, category: ProductCategory) -> ProductCategory:
+        if category.id not in self.categories:
+            insort(self.category_ids, category.id)
         self.categories[category.id] = category
+        self.categories_version += 1
         return category
 
     async def get_category(self, category_id: str) -> Optional[ProductCategory]:
         return self.categories.get(category_id)
 
-    async def get_categories(self) -> list[ProductCategory]:
-        return list(self.categories.values())
+    async def get_categories_version(self) -> int:
+        return self.categories_version
+
+    async def get_categories(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> list[ProductCategory]:
+        return paginate(self.categories, self.category_ids, limit, after)
+
+    def _keep(self, product: Product) -> None:
+        if product.id not in self.products:
+            insort(self.product_ids, product.id)
+        self.products[product.id] = product
+
+
+def _trigrams(text: str) -> set[str]:
+    """The trigrams of the words of a text, padded like pg_trgm pads them"""
+    return {
+        padded[i : i + 3]
+        for word in search_terms(text)
+        for padded in [f"  {word} "]
+        for i in range(len(padded) - 2)
+    }
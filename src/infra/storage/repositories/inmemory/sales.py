@@ -1,49 +1,211 @@
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime
-from typing import Optional
+from itertools import islice
+from typing import AsyncIterator, Iterable, Optional
 
-from src.domain.sales.models import Sale
+from src.domain.sales.models import (
+    GRANULARITY_STEPS,
+    Granularity,
+    Sale,
+    SalesBucket,
+    SalesGrouping,
+    SalesMetric,
+    SalesSummary,
+    SalesTotal,
+)
 from src.domain.product.models import Product
+from src.domain.product.repository import AbstractProductRepository
 from src.domain.sales.repository import AbstractSalesRepository
+from src.services.sales.bucketing import bucket_sales
+from src.services.sales.ranking import top_totals
+
+
+def _key(sale: Sale) -> tuple[datetime, str]:
+    return sale.created_at, sale.id
+
+
+def _created_at(sale: Sale) -> datetime:
+    return sale.created_at
 
 
 class SalesRepository(AbstractSalesRepository):
-    def __init__(self) -> None:
+    def __init__(self, catalog: Optional[AbstractProductRepository] = None) -> None:
+        # kept sorted by (created_at, id), same order as the sql pagination,
+        # so date ranges and cursors are a couple of bisects away. sales are
+        # indexed when added, so don't move their created_at afterwards
         self.sales: list[Sale] = []
+        self.sales_by_product: dict[str, list[Sale]] = {}
+        self.sales_by_category: dict[str, list[Sale]] = {}
         # as far as for fake in memory storage,
         # its alright to mix in other stuff that u actually need
         # tbh it depends on the level of boundary between the services
         # and I have kept is weaker, since I don't have time to implement an ACL
         self.products: dict[str, Product] = {}
+        # the products repository of the unit of work, for the products the mirror hasn't got
+        self.catalog = catalog
 
     async def add_product(self, product: Product) -> Product:
+        previous = self.products.get(product.id)
         self.products[product.id] = product
+
+        # sales carry the category of their product, like the sql ones
+        if previous is None or previous.category_id != product.category_id:
+            await self.set_product_category(product.id, product.category_id)
+
         return product
 
     async def add_sale(self, sale: Sale) -> Sale:
-        self.sales.append(sale)
+        if sale.category_id is None and sale.product_id in self.products:
+            sale.category_id = self.products[sale.product_id].category_id
+
+        insort(self.sales, sale, key=_key)
+        insort(self.sales_by_product.setdefault(sale.product_id, []), sale, key=_key)
+        if sale.category_id is not None:
+            insort(self.sales_by_category.setdefault(sale.category_id, []), sale, key=_key)
         return sale
 
+    async def add_sales(self, sales: list[Sale]) -> int:
+        for sale in sales:
+            await self.add_sale(sale)
+        return len(sales)
+
+    async def check_new_sales(
+        self, sales: list[Sale]
+    ) -> tuple[set[str], set[tuple[str, datetime]]]:
+        product_ids = list({sale.product_id for sale in sales})
+        known = {product_id for product_id in product_ids if product_id in self.products}
+        if self.catalog is not None:
+            known |= await self.catalog.existing_product_ids(product_ids)
+
+        recorded = set()
+        for sale in sales:
+            index = bisect_left(self.sales, _key(sale), key=_key)
+            if index < len(self.sales) and _key(self.sales[index]) == _key(sale):
+                recorded.add((sale.id, sale.created_at))
+
+        return known, recorded
+
+    async def set_product_category(self, product_id: str, category_id: Optional[str]) -> None:
+        for sale in self.sales_by_product.get(product_id, []):
+            if sale.category_id == category_id:
+                continue
+
+            if sale.category_id is not None:
+                previous = self.sales_by_category[sale.category_id]
+                del previous[bisect_left(previous, _key(sale), key=_key)]
+
+            sale.category_id = category_id
+            if category_id is not None:
+                insort(self.sales_by_category.setdefault(category_id, []), sale, key=_key)
+
+    def _candidates(self, product_id: Optional[str], category_id: Optional[str]) -> list[Sale]:
+        """The sorted list the matching sales live in"""
+        if product_id:
+            sales = self.sales_by_product.get(product_id, [])
+            if category_id:
+                return [sale for sale in sales if sale.category_id == category_id]
+            return sales
+
+        if category_id:
+            return self.sales_by_category.get(category_id, [])
+
+        return self.sales
+
+    @staticmethod
+    def _window(
+        sales: list[Sale],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        after: Optional[tuple[datetime, str]],
+    ) -> Iterable[Sale]:
+        lo, hi = 0, len(sales)
+        if start_date:
+            lo = bisect_left(sales, start_date, key=_created_at)
+        if after is not None:
+            lo = max(lo, bisect_right(sales, after, key=_key))
+        if end_date:
+            hi = bisect_right(sales, end_date, key=_created_at)
+
+        return islice(sales, lo, hi)
+
+    async def set_product_categories(self, categories: dict[str, Optional[str]]) -> None:
+        for product_id, category_id in categories.items():
+            await self.set_product_category(product_id, category_id)
+
     async def get_sales_between_dates(
         self,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         product_id: Optional[str] = None,
         category_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[tuple[datetime, str]] = None,
     ) -> list[Sale]:
-        results = self.sales
+        sales = self._candidates(product_id, category_id)
+        return list(islice(self._window(sales, start_date, end_date, after), limit))
 
-        if start_date:
-            results = [s for s in results if s.created_at >= start_date]
+    async def stream_sales_between_dates(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sale]:
+        for sale in await self.get_sales_between_dates(
+            start_date, end_date, product_id, category_id
+        ):
+            yield sale
 
-        if end_date:
-            results = [s for s in results if s.created_at <= end_date]
+    async def summarize_sales(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> SalesSummary:
+        summary = SalesSummary(count=0, quantity=0, total_price=0.0)
+        sales = self._candidates(product_id, category_id)
+        for sale in self._window(sales, start_date, end_date, None):
+            summary.count += 1
+            summary.quantity += sale.quantity
+            summary.total_price += sale.total_price
 
-        if product_id:
-            results = [s for s in results if s.product_id == product_id]
+        return summary
 
-        if category_id:
-            # filter by category, assuming products are available
-            product_ids = [p.id for p in self.products.values() if p.category_id == category_id]
-            results = [s for s in results if s.product_id in product_ids]
+    async def aggregate_sales(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: Granularity = "day",
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> list[SalesBucket]:
+        sales = await self.get_sales_between_dates(start, end, product_id, category_id)
+        return bucket_sales(sales, start, end, GRANULARITY_STEPS[granularity])
+
+    async def top_sales(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        metric: SalesMetric = "revenue",
+        n: int = 10,
+        group_by: SalesGrouping = "product",
+        category_id: Optional[str] = None,
+    ) -> list[SalesTotal]:
+        totals: dict[str, SalesTotal] = {}
+
+        for sale in await self.get_sales_between_dates(start, end, category_id=category_id):
+            key = sale.product_id if group_by == "product" else sale.category_id
+            if key is None:
+                continue
+
+            total = totals.get(key)
+            if total is None:
+                total = totals[key] = SalesTotal(id=key, total_price=0.0, quantity=0, count=0)
+
+            total.total_price += sale.total_price
+            total.quantity += sale.quantity
+            total.count += 1
 
-        return results
+        return top_totals(totals.values(), metric, n)
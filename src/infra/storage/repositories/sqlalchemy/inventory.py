@@ -1,6 +1,7 @@
 from typing import List, Optional
 
-from sqlalchemy import select
+from sqlalchemy import DateTime, Integer, bindparam, func, insert, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.domain.inventory.models import InventoryItem as DomainItem, InventoryUpdate as DomainUpdate
@@ -9,44 +10,112 @@ from src.infra.storage.models.inventory import (
     InventoryItem as ItemORM,
     InventoryUpdate as UpdateORM,
 )
+from src.infra.storage.repositories.sqlalchemy.pagination import paginate
+from src.infra.storage.repositories.sqlalchemy.versions import table_version
 
 
 class InventoryRepository(AbstractInventoryRepository):
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
 
-    async def add_inventory_update(self, update: DomainUpdate) -> None:
-        # persist the update record
-        orm_update = UpdateORM(
-            id=update.id,
-            product_id=update.product_id,
-            quantity=update.quantity,
-            created_at=update.created_at,
-        )
-        self.session.add(orm_update)
-
-        # adjust or create the current inventory item tally
-        existing = await self.session.get(ItemORM, update.product_id)
-        if existing:
-            existing.quantity = existing.quantity + update.quantity
-        else:
-            new_item = ItemORM(
+    async def add_inventory_update(self, update: DomainUpdate) -> DomainItem:
+        # persist the update record and adjust (or create) the current tally
+        # in a single statement, so concurrent updates to the same product
+        # can't lose each other's increments
+        ledger = (
+            insert(UpdateORM)
+            .values(
+                id=update.id,
                 product_id=update.product_id,
                 quantity=update.quantity,
+                created_at=update.created_at,
+            )
+            .returning(UpdateORM.product_id, UpdateORM.quantity)
+            .cte("ledger")
+        )
+
+        query = pg_insert(ItemORM).from_select(
+            ["product_id", "quantity"], select(ledger.c.product_id, ledger.c.quantity)
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[ItemORM.product_id],
+            set_={"quantity": ItemORM.quantity + query.excluded.quantity},
+        ).returning(ItemORM.product_id, ItemORM.quantity)
+
+        result = await self.session.execute(query)
+        item = result.one()
+        return DomainItem(product_id=item.product_id, quantity=item.quantity)
+
+    async def add_inventory_updates(self, updates: List[DomainUpdate]) -> List[DomainItem]:
+        # the whole batch travels as four arrays, whatever its size
+        rows = (
+            func.unnest(
+                bindparam("ids", [u.id for u in updates], type_=ARRAY(PG_UUID(as_uuid=False))),
+                bindparam(
+                    "product_ids",
+                    [u.product_id for u in updates],
+                    type_=ARRAY(PG_UUID(as_uuid=False)),
+                ),
+                bindparam("quantities", [u.quantity for u in updates], type_=ARRAY(Integer)),
+                bindparam(
+                    "created_ats",
+                    [u.created_at for u in updates],
+                    type_=ARRAY(DateTime(timezone=True)),
+                ),
+            )
+            .table_valued("id", "product_id", "quantity", "created_at")
+            .render_derived(name="rows")
+        )
+
+        ledger = (
+            insert(UpdateORM)
+            .from_select(
+                ["id", "product_id", "quantity", "created_at"],
+                select(rows.c.id, rows.c.product_id, rows.c.quantity, rows.c.created_at),
             )
-            self.session.add(new_item)
-            await self.session.flush()
+            .returning(UpdateORM.product_id, UpdateORM.quantity)
+            .cte("ledger")
+        )
+
+        # one upsert per product (ON CONFLICT can't touch a row twice), applied
+        # in product_id order so concurrent batches always lock rows in the same order
+        deltas = (
+            select(ledger.c.product_id, func.sum(ledger.c.quantity))
+            .group_by(ledger.c.product_id)
+            .order_by(ledger.c.product_id)
+        )
+
+        query = pg_insert(ItemORM).from_select(["product_id", "quantity"], deltas)
+        query = query.on_conflict_do_update(
+            index_elements=[ItemORM.product_id],
+            set_={"quantity": ItemORM.quantity + query.excluded.quantity},
+        ).returning(ItemORM.product_id, ItemORM.quantity)
+
+        result = await self.session.execute(query)
+        return [
+            DomainItem(product_id=i.product_id, quantity=i.quantity)
+            for i in sorted(result.all(), key=lambda i: i.product_id)
+        ]
 
     async def get_by_product(self, product_id: str) -> Optional[DomainItem]:
-        item = await self.session.get(ItemORM, product_id)
+        query = select(ItemORM.product_id, ItemORM.quantity).where(ItemORM.product_id == product_id)
+        result = await self.session.execute(query)
+        item = result.one_or_none()
         if item:
             return DomainItem(product_id=item.product_id, quantity=item.quantity)
 
-    async def list(self) -> List[DomainItem]:
-        result = await self.session.execute(select(ItemORM))
+    async def list(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> List[DomainItem]:
+        key = (after,) if after is not None else None
+        query = paginate(select(ItemORM), (ItemORM.product_id,), limit, key)
+        result = await self.session.execute(query)
         items = result.scalars().all()
         return [DomainItem(product_id=i.product_id, quantity=i.quantity) for i in items]
 
+    async def get_version(self) -> int:
+        return await table_version(self.session, ItemORM.__tablename__)
+
     async def low_stock_alerts(self, threshold: int = 10) -> List[DomainItem]:
         query = select(ItemORM).where(ItemORM.quantity <= threshold)
         result = await self.session.execute(query)
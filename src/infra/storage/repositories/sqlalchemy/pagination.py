@@ -0,0 +1,28 @@
+from typing import Any, Optional
+
+from sqlalchemy import ColumnElement, Select, tuple_
+
+
+def paginate(
+    query: Select,
+    key: tuple[ColumnElement, ...],
+    limit: Optional[int] = None,
+    after: Optional[tuple[Any, ...]] = None,
+) -> Select:
+    """
+    Keyset pagination, order by the `key` columns and take `limit` rows
+    from the first one past `after`, left untouched when neither is given
+    """
+    if limit is None and after is None:
+        return query
+
+    query = query.order_by(*key)
+
+    # a row comparison, so postgres can seek straight to `after` in an index over `key`
+    if after is not None:
+        query = query.where(tuple_(*key) > after)
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    return query
@@ -1,20 +1,48 @@
+from uuid import UUID
 from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import (
+    ARRAY,
+    Float,
+    and_,
+    any_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    text,
+    update,
+)
 
 from src.domain.product.repository import AbstractProductRepository
-from src.domain.product.models import Product, ProductCategory
+from src.domain.product.models import Product, ProductCategory, ProductMatch
+from src.domain.product.search import MAX_SEARCH_TERMS, search_terms
 from src.infra.storage.models.product import (
     Product as ProductORM,
     ProductCategory as ProductCategoryORM,
 )
+from src.infra.storage.repositories.sqlalchemy.pagination import paginate
+from src.infra.storage.repositories.sqlalchemy.versions import table_version
+
+# whether each database has pg_trgm (see migration 2d9f6a3e8c51), looked up once
+_trigram_support: dict[str, bool] = {}
 
 
 class ProductRepository(AbstractProductRepository):
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
 
+        # written by this transaction, read by the after-commit hooks (see the catalog cache)
+        self.changed_products: list[str] = []
+        self.changed_categories: list[str] = []
+        # their sales are deleted along with them (see the sales cache)
+        self.deleted_products: list[str] = []
+
     async def create_product(self, product: Product) -> Product:
         product_orm = ProductORM(
             id=product.id,
@@ -25,8 +53,57 @@ class ProductRepository(AbstractProductRepository):
         )
         self.session.add(product_orm)
         await self.session.flush()
+
+        self.changed_products.append(product.id)
         return product
 
+    async def upsert_products(self, products: list[Product]) -> list[Product]:
+        if not products:
+            return []
+
+        # one multi-row INSERT ... ON CONFLICT DO UPDATE per batch of rows sqlalchemy
+        # can bind at once ("insertmanyvalues"), the rows come back from RETURNING
+        statement = insert(ProductORM)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ProductORM.id],
+            set_={
+                column: statement.excluded[column]
+                for column in ("name", "category_id", "description", "price")
+            },
+        ).returning(
+            ProductORM.id,
+            ProductORM.name,
+            ProductORM.category_id,
+            ProductORM.description,
+            ProductORM.price,
+        )
+        result = await self.session.execute(
+            statement,
+            [
+                {
+                    "id": product.id,
+                    "name": product.name,
+                    "category_id": product.category_id,
+                    "description": product.description,
+                    "price": product.price,
+                }
+                for product in products
+            ],
+        )
+        rows = result.all()
+
+        self.changed_products += [product.id for product in products]
+        return [
+            Product(
+                id=row.id,
+                name=row.name,
+                category_id=row.category_id,
+                description=row.description,
+                price=row.price,
+            )
+            for row in rows
+        ]
+
     async def get_product(self, product_id: str) -> Optional[Product]:
         query = select(ProductORM).where(ProductORM.id == product_id)
         result = await self.session.execute(query)
@@ -41,8 +118,121 @@ class ProductRepository(AbstractProductRepository):
                 price=product_orm.price,
             )
 
-    async def get_products(self) -> list[Product]:
-        query = select(ProductORM)
+    async def get_products_by_ids(self, product_ids: list[str]) -> list[Product]:
+        # a single array parameter, the statement is the same whatever the number of ids
+        ids = bindparam(
+            "ids", list(dict.fromkeys(_valid_uuids(product_ids))), type_=ARRAY(ProductORM.id.type)
+        )
+        result = await self.session.execute(select(ProductORM).where(ProductORM.id == any_(ids)))
+
+        return [
+            Product(
+                id=product_orm.id,
+                name=product_orm.name,
+                category_id=product_orm.category_id,
+                description=product_orm.description,
+                price=product_orm.price,
+            )
+            for product_orm in result.scalars().all()
+        ]
+
+    async def get_products_version(self) -> int:
+        return await table_version(self.session, ProductORM.__tablename__)
+
+    async def search_products(
+        self, query: str, limit: int, after: Optional[tuple[float, str]] = None
+    ) -> list[ProductMatch]:
+        terms = search_terms(query)[:MAX_SEARCH_TERMS]
+        if not terms:
+            return []
+
+        # every word of the query has to start a word of the product (so that results
+        # come while typing) or, with pg_trgm, be close to a word of its name (typos),
+        # each of which is served by its GIN index
+        has_trigrams = await self._has_trigrams()
+        matches, scores = [], []
+        for term in terms:
+            tsquery = func.to_tsquery("simple", f"{term}:*")
+            match = ProductORM.search_vector.op("@@")(tsquery)
+            score = func.ts_rank(ProductORM.search_vector, tsquery)
+
+            if has_trigrams:
+                match = or_(match, literal(term).op("<%")(ProductORM.name))
+                score = score + func.word_similarity(term, ProductORM.name)
+
+            matches.append(match)
+            scores.append(score)
+
+        scored = (
+            select(
+                ProductORM.id,
+                ProductORM.name,
+                ProductORM.category_id,
+                ProductORM.description,
+                ProductORM.price,
+                cast(sum(scores[1:], scores[0]) / len(terms), Float).label("score"),
+            )
+            .where(and_(*matches))
+            .subquery()
+        )
+
+        search = select(scored).order_by(scored.c.score.desc(), scored.c.id).limit(limit)
+        if after is not None:
+            search = search.where(
+                or_(
+                    scored.c.score < after[0],
+                    and_(scored.c.score == after[0], scored.c.id > after[1]),
+                )
+            )
+
+        result = await self.session.execute(search)
+        return [
+            ProductMatch(
+                product=Product(
+                    id=row.id,
+                    name=row.name,
+                    category_id=row.category_id,
+                    description=row.description,
+                    price=row.price,
+                ),
+                score=row.score,
+            )
+            for row in result
+        ]
+
+    async def _has_trigrams(self) -> bool:
+        database = str(self.session.bind.url)
+        if database not in _trigram_support:
+            _trigram_support[database] = await self.session.scalar(
+                text("select exists (select 1 from pg_extension where extname = 'pg_trgm')")
+            )
+
+        return _trigram_support[database]
+
+    async def existing_product_ids(self, product_ids: list[str]) -> set[str]:
+        # anything that isn't a UUID can't be a product, and would make postgres reject the query
+        query = select(ProductORM.id).where(ProductORM.id.in_(_valid_uuids(product_ids)))
+        result = await self.session.execute(query)
+        return set(result.scalars().all())
+
+    async def existing_category_ids(self, category_ids: list[str]) -> set[str]:
+        query = select(ProductCategoryORM.id).where(
+            ProductCategoryORM.id.in_(_valid_uuids(category_ids))
+        )
+        result = await self.session.execute(query)
+        return set(result.scalars().all())
+
+    async def get_product_categories(self, product_ids: list[str]) -> dict[str, Optional[str]]:
+        query = select(ProductORM.id, ProductORM.category_id).where(
+            ProductORM.id.in_(_valid_uuids(product_ids))
+        )
+        result = await self.session.execute(query)
+        return {row.id: row.category_id for row in result}
+
+    async def get_products(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> list[Product]:
+        query = paginate(select(ProductORM), (ProductORM.id,), limit, _key(after))
         result = await self.session.execute(query)
         products_orm = result.scalars().all()
 
@@ -71,6 +261,7 @@ class ProductRepository(AbstractProductRepository):
         )
         result = await self.session.execute(query)
         updated_product_orm = result.scalar_one()
+        self.changed_products.append(product.id)
 
         return Product(
             id=updated_product_orm.id,
@@ -83,6 +274,8 @@ class ProductRepository(AbstractProductRepository):
     async def delete_product(self, product_id: str) -> None:
         query = delete(ProductORM).where(ProductORM.id == product_id)
         await self.session.execute(query)
+        self.changed_products.append(product_id)
+        self.deleted_products.append(product_id)
 
     async def add_category(self, category: ProductCategory) -> ProductCategory:
         category_orm = ProductCategoryORM(
@@ -92,6 +285,8 @@ class ProductRepository(AbstractProductRepository):
         )
         self.session.add(category_orm)
         await self.session.flush()
+
+        self.changed_categories.append(category.id)
         return category
 
     async def get_category(self, category_id: str) -> Optional[ProductCategory]:
@@ -106,8 +301,14 @@ class ProductRepository(AbstractProductRepository):
                 description=category_orm.description,
             )
 
-    async def get_categories(self) -> list[ProductCategory]:
-        category_orms = await self.session.execute(select(ProductCategoryORM))
+    async def get_categories_version(self) -> int:
+        return await table_version(self.session, ProductCategoryORM.__tablename__)
+
+    async def get_categories(
+        self, limit: Optional[int] = None, after: Optional[str] = None
+    ) -> list[ProductCategory]:
+        query = paginate(select(ProductCategoryORM), (ProductCategoryORM.id,), limit, _key(after))
+        category_orms = await self.session.execute(query)
         categories_orm = category_orms.scalars().all()
 
         return [
@@ -118,3 +319,19 @@ class ProductRepository(AbstractProductRepository):
             )
             for category_orm in categories_orm
         ]
+
+
+def _valid_uuids(values: list[str]) -> list[str]:
+    valid = []
+    for value in values:
+        try:
+            UUID(value)
+        except ValueError:
+            continue
+        valid.append(value)
+
+    return valid
+
+
+def _key(after: Optional[str]) -> Optional[tuple[str]]:
+    return (after,) if after is not None else None
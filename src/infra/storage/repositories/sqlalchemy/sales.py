@@ -1,58 +1,308 @@
-from datetime import datetime
-from typing import List, Optional, Any
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import AsyncIterator, List, Optional, Any
 
-from sqlalchemy import select, and_
+from sqlalchemy import (
+    BigInteger,
+    Date,
+    DateTime,
+    Float,
+    Integer,
+    Interval,
+    Select,
+    Subquery,
+    and_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    null,
+    select,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.domain.sales.models import Sale as DomainSale
+from src.domain.sales.models import (
+    GRANULARITY_STEPS,
+    Granularity,
+    Sale as DomainSale,
+    SalesBucket,
+    SalesGrouping,
+    SalesMetric,
+    SalesSummary,
+    SalesTotal,
+)
 from src.domain.sales.repository import AbstractSalesRepository
-from src.infra.storage.models.sales import Sale as SaleORM
+from src.infra.storage.models.sales import Sale as SaleORM, SalesDailyRollup as RollupORM
 from src.infra.storage.models.product import Product as ProductORM
+from src.infra.storage.repositories.sqlalchemy.pagination import paginate
+
+_UTC = literal_column("'UTC'")
+
+# columns written by the bulk path, in the order of its records
+_COPIED_COLUMNS = ("id", "product_id", "quantity", "total_price", "created_at", "category_id")
 
 
 class SalesRepository(AbstractSalesRepository):
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
+        # sales written in this transaction, for whoever follows them after the commit
+        self.added: list[DomainSale] = []
+        # (product_id, category_id) of the products moved to another category
+        self.recategorized: list[tuple[str, Optional[str]]] = []
 
     async def add_sale(self, sale: DomainSale) -> DomainSale:
-        orm = SaleORM(
-            id=sale.id,
+        # insert the sale and fold it into its day of the rollup in one statement
+        # the category is copied from the product unless given
+        category_id = (
+            sale.category_id
+            if sale.category_id is not None
+            else select(ProductORM.category_id)
+            .where(ProductORM.id == sale.product_id)
+            .scalar_subquery()
+        )
+        new_sale = (
+            insert(SaleORM)
+            .values(
+                id=sale.id,
+                product_id=sale.product_id,
+                quantity=sale.quantity,
+                total_price=sale.total_price,
+                created_at=sale.created_at,
+                category_id=category_id,
+            )
+            .returning(SaleORM.category_id)
+            .cte("new_sale")
+        )
+
+        query = pg_insert(RollupORM).values(
+            day=_as_utc(sale.created_at).date(),
             product_id=sale.product_id,
             quantity=sale.quantity,
-            total_price=sale.total_price,
-            created_at=sale.created_at,
+            revenue=sale.total_price,
+            count=1,
         )
-        self.session.add(orm)
-        await self.session.flush()
+        query = query.on_conflict_do_update(
+            index_elements=[RollupORM.day, RollupORM.product_id],
+            set_={
+                "quantity": RollupORM.quantity + query.excluded.quantity,
+                "revenue": RollupORM.revenue + query.excluded.revenue,
+                "count": RollupORM.count + query.excluded.count,
+            },
+        ).add_cte(new_sale)
+        query = query.returning(select(new_sale.c.category_id).scalar_subquery())
+
+        sale.category_id = (await self.session.execute(query)).scalar_one()
+        self.added.append(sale)
         return sale
 
+    async def check_new_sales(
+        self, sales: List[DomainSale]
+    ) -> tuple[set[str], set[tuple[str, datetime]]]:
+        if not sales:
+            return set(), set()
+
+        # the products that exist, with a null created_at, then the sales already recorded
+        products = select(
+            ProductORM.id, cast(null(), DateTime(timezone=True)).label("created_at")
+        ).where(ProductORM.id.in_({sale.product_id for sale in sales}))
+
+        keys = (
+            func.unnest(
+                bindparam(
+                    "sale_ids", [sale.id for sale in sales], type_=ARRAY(PG_UUID(as_uuid=False))
+                ),
+                bindparam(
+                    "created_ats",
+                    [sale.created_at for sale in sales],
+                    type_=ARRAY(DateTime(timezone=True)),
+                ),
+            )
+            .table_valued("id", "created_at")
+            .render_derived(name="keys")
+        )
+        recorded = (
+            select(SaleORM.id, SaleORM.created_at).join(
+                keys, and_(SaleORM.id == keys.c.id, SaleORM.created_at == keys.c.created_at)
+            )
+            # the range of the batch, so only the partitions it spans are looked at
+            .where(
+                SaleORM.created_at.between(
+                    min(sale.created_at for sale in sales), max(sale.created_at for sale in sales)
+                )
+            )
+        )
+
+        known, found = set(), set()
+        for row_id, created_at in await self.session.execute(union_all(products, recorded)):
+            if created_at is None:
+                known.add(row_id)
+            else:
+                found.add((row_id, created_at))
+
+        return known, found
+
+    async def add_sales(self, sales: List[DomainSale]) -> int:
+        if not sales:
+            return 0
+
+        # the category is copied from the product like in add_sale, one lookup for the batch
+        uncategorized = {s.product_id for s in sales if s.category_id is None}
+        if uncategorized:
+            categories = dict(
+                (
+                    await self.session.execute(
+                        select(ProductORM.id, ProductORM.category_id).where(
+                            ProductORM.id.in_(uncategorized)
+                        )
+                    )
+                )
+                .tuples()
+                .all()
+            )
+            for sale in sales:
+                if sale.category_id is None:
+                    sale.category_id = categories.get(sale.product_id)
+
+        records = [
+            (s.id, s.product_id, s.quantity, s.total_price, s.created_at, s.category_id)
+            for s in sales
+        ]
+
+        # through the session first: asyncpg only begins the transaction on the first
+        # statement it runs itself, a COPY before it would commit on its own
+        await self._add_to_rollup(sales)
+
+        connection = await self.session.connection()
+        raw = (await connection.get_raw_connection()).driver_connection
+
+        if hasattr(raw, "copy_records_to_table"):
+            # asyncpg: binary COPY, postgres routes the rows to their partitions
+            await raw.copy_records_to_table("sales", records=records, columns=_COPIED_COLUMNS)
+        else:
+            # other drivers: one multi-row insert, the rows travel as one array per column
+            columns = list(zip(*records))
+            rows = (
+                func.unnest(
+                    *(
+                        bindparam(name, list(values), type_=ARRAY(type_))
+                        for name, values, type_ in zip(
+                            _COPIED_COLUMNS,
+                            columns,
+                            (
+                                PG_UUID(as_uuid=False),
+                                PG_UUID(as_uuid=False),
+                                Integer,
+                                Float,
+                                DateTime(timezone=True),
+                                PG_UUID(as_uuid=False),
+                            ),
+                        )
+                    )
+                )
+                .table_valued(*_COPIED_COLUMNS)
+                .render_derived(name="rows")
+            )
+            await self.session.execute(
+                insert(SaleORM).from_select(_COPIED_COLUMNS, select(*rows.c))
+            )
+
+        self.added.extend(sales)
+        return len(sales)
+
+    async def _add_to_rollup(self, sales: List[DomainSale]) -> None:
+        """Fold sales into the rollup, one upsert for all their (day, product) pairs"""
+        totals: dict[tuple[date, str], list] = defaultdict(lambda: [0, 0.0, 0])
+        for sale in sales:
+            total = totals[_as_utc(sale.created_at).date(), sale.product_id]
+            total[0] += sale.quantity
+            total[1] += sale.total_price
+            total[2] += 1
+
+        # sorted so concurrent batches lock the rollup rows in the same order
+        keys = sorted(totals)
+        rows = (
+            func.unnest(
+                bindparam("days", [day for day, _ in keys], type_=ARRAY(Date)),
+                bindparam(
+                    "product_ids",
+                    [product for _, product in keys],
+                    type_=ARRAY(PG_UUID(as_uuid=False)),
+                ),
+                bindparam("quantities", [totals[k][0] for k in keys], type_=ARRAY(BigInteger)),
+                bindparam("revenues", [totals[k][1] for k in keys], type_=ARRAY(Float)),
+                bindparam("counts", [totals[k][2] for k in keys], type_=ARRAY(BigInteger)),
+            )
+            .table_valued("day", "product_id", "quantity", "revenue", "count")
+            .render_derived(name="rows")
+        )
+
+        query = pg_insert(RollupORM).from_select(
+            ["day", "product_id", "quantity", "revenue", "count"], select(*rows.c)
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[RollupORM.day, RollupORM.product_id],
+            set_={
+                "quantity": RollupORM.quantity + query.excluded.quantity,
+                "revenue": RollupORM.revenue + query.excluded.revenue,
+                "count": RollupORM.count + query.excluded.count,
+            },
+        )
+        await self.session.execute(query)
+
+    async def set_product_category(self, product_id: str, category_id: Optional[str]) -> None:
+        query = (
+            update(SaleORM)
+            .where(SaleORM.product_id == product_id)
+            .where(SaleORM.category_id.is_distinct_from(category_id))
+            .values(category_id=category_id)
+        )
+        await self.session.execute(query)
+        self.recategorized.append((product_id, category_id))
+
+    async def set_product_categories(self, categories: dict[str, Optional[str]]) -> None:
+        if not categories:
+            return
+
+        # one update joined to the (product, category) pairs, instead of one per product
+        moves = (
+            func.unnest(
+                bindparam("product_ids", list(categories), type_=ARRAY(PG_UUID(as_uuid=False))),
+                bindparam(
+                    "category_ids",
+                    list(categories.values()),
+                    type_=ARRAY(PG_UUID(as_uuid=False)),
+                ),
+            )
+            .table_valued("product_id", "category_id")
+            .render_derived(name="moves")
+        )
+        query = (
+            update(SaleORM)
+            .where(SaleORM.product_id == moves.c.product_id)
+            .where(SaleORM.category_id.is_distinct_from(moves.c.category_id))
+            .values(category_id=moves.c.category_id)
+        )
+        await self.session.execute(query)
+        self.recategorized.extend(categories.items())
+
     async def get_sales_between_dates(
         self,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         product_id: Optional[str] = None,
         category_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[tuple[datetime, str]] = None,
     ) -> List[DomainSale]:
 
-        query = select(SaleORM)
-        filters: list[Any] = []
-
-        if start_date:
-            filters.append(SaleORM.created_at >= start_date)
-
-        if end_date:
-            filters.append(SaleORM.created_at <= end_date)
-
-        if product_id:
-            filters.append(SaleORM.product_id == product_id)
-
-        # if filtering by category, join into ProductORM
-        if category_id is not None:
-            query = query.join(ProductORM, SaleORM.product_id == ProductORM.id)
-            filters.append(ProductORM.category_id == category_id)
-
-        if filters:
-            query = query.where(and_(*filters))
+        query = _filter_sales(select(SaleORM), start_date, end_date, product_id, category_id)
+        query = paginate(query, (SaleORM.created_at, SaleORM.id), limit, after)
 
         result = await self.session.execute(query)
         results = result.scalars().all()
@@ -64,6 +314,367 @@ class SalesRepository(AbstractSalesRepository):
                 quantity=s.quantity,
                 total_price=s.total_price,
                 created_at=s.created_at,
+                category_id=s.category_id,
             )
             for s in results
         ]
+
+    async def stream_sales_between_dates(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[DomainSale]:
+        # plain columns through a server side cursor, `batch_size` rows per
+        # fetch, nothing is kept in the session's identity map
+        query = select(
+            SaleORM.id,
+            SaleORM.product_id,
+            SaleORM.quantity,
+            SaleORM.total_price,
+            SaleORM.created_at,
+            SaleORM.category_id,
+        )
+        query = _filter_sales(query, start_date, end_date, product_id, category_id)
+
+        result = await self.session.stream(query.execution_options(yield_per=batch_size))
+        async for s in result:
+            yield DomainSale(
+                id=s.id,
+                product_id=s.product_id,
+                quantity=s.quantity,
+                total_price=s.total_price,
+                created_at=s.created_at,
+                category_id=s.category_id,
+            )
+
+    async def summarize_sales(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> SalesSummary:
+        start = _as_utc(start_date) if start_date else None
+        end = _as_utc(end_date) if end_date else None
+
+        # whole days come from the rollup, a single row whatever the number of sales,
+        # only the partial days at the edges are read from `sales`
+        rows = _sales_rows(start, end, product_id, category_id)
+
+        query = select(
+            func.coalesce(func.sum(rows.c.count), 0),
+            func.coalesce(func.sum(rows.c.quantity), 0),
+            func.coalesce(func.sum(rows.c.total_price), 0.0),
+        )
+        count, quantity, total_price = (await self.session.execute(query)).one()
+
+        return SalesSummary(count=count, quantity=quantity, total_price=total_price)
+
+    async def aggregate_sales(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: Granularity = "day",
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> List[SalesBucket]:
+        start, end = _as_utc(start), _as_utc(end)
+
+        # buckets are whole days counted from `start`, so when it is a midnight
+        # no bucket cuts through a day and the rollup can stand in for the raw sales
+        rows = _sales_rows(start, end, product_id, category_id, use_rollup=_is_midnight(start))
+
+        # date_bin gives fixed width buckets counted from `start`,
+        # exactly like the buckets compare_sales labels
+        bucket = func.date_bin(
+            bindparam("step", GRANULARITY_STEPS[granularity], type_=Interval),
+            rows.c.created_at,
+            bindparam("origin", start, type_=DateTime(timezone=True)),
+            type_=DateTime(timezone=True),
+        ).label("bucket")
+
+        query = (
+            select(
+                bucket,
+                func.sum(rows.c.total_price),
+                func.sum(rows.c.quantity),
+                func.sum(rows.c.count),
+            )
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+
+        result = await self.session.execute(query)
+
+        return [
+            SalesBucket(start=row[0], total_price=row[1], quantity=row[2], count=row[3])
+            for row in result.all()
+        ]
+
+    async def top_sales(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        metric: SalesMetric = "revenue",
+        n: int = 10,
+        group_by: SalesGrouping = "product",
+        category_id: Optional[str] = None,
+    ) -> List[SalesTotal]:
+        start = _as_utc(start) if start else None
+        end = _as_utc(end) if end else None
+
+        # a group by over the rollup (plus the partial days at the edges), so
+        # the cost follows the number of days and products, not of sales
+        rows = _sales_rows(start, end, category_id=category_id)
+
+        total_price = func.sum(rows.c.total_price)
+        quantity = func.sum(rows.c.quantity)
+        count = func.sum(rows.c.count)
+
+        if group_by == "product":
+            key = rows.c.product_id
+            query = select(key, total_price, quantity, count)
+        else:
+            key = ProductORM.category_id
+            query = (
+                select(key, total_price, quantity, count)
+                .join(ProductORM, rows.c.product_id == ProductORM.id)
+                .where(key.isnot(None))
+            )
+
+        ranked_by = {"revenue": total_price, "quantity": quantity, "count": count}[metric]
+        query = query.group_by(key).order_by(ranked_by.desc(), key).limit(n)
+
+        result = await self.session.execute(query)
+
+        return [
+            SalesTotal(id=str(row[0]), total_price=row[1], quantity=row[2], count=row[3])
+            for row in result.all()
+        ]
+
+    async def aggregate_sales_periods(
+        self,
+        periods: list[tuple[datetime, datetime]],
+        granularity: Granularity = "day",
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> list[list[SalesBucket]]:
+        if not periods:
+            return []
+
+        # the rows of every period, tagged with it and with the origin of its buckets,
+        # so that a single group by totals all of them in one round trip
+        parts: list[Select] = []
+        for index, (start, end) in enumerate(periods):
+            start, end = _as_utc(start), _as_utc(end)
+            rows = _sales_rows(start, end, product_id, category_id, use_rollup=_is_midnight(start))
+            parts.append(
+                select(
+                    literal(index).label("period"),
+                    literal(start, DateTime(timezone=True)).label("origin"),
+                    rows.c.created_at,
+                    rows.c.total_price,
+                    rows.c.quantity,
+                    rows.c.count,
+                )
+            )
+
+        rows = union_all(*parts).subquery("period_rows")
+        bucket = func.date_bin(
+            bindparam("step", GRANULARITY_STEPS[granularity], type_=Interval),
+            rows.c.created_at,
+            rows.c.origin,
+            type_=DateTime(timezone=True),
+        ).label("bucket")
+
+        query = (
+            select(
+                rows.c.period,
+                bucket,
+                func.sum(rows.c.total_price),
+                func.sum(rows.c.quantity),
+                func.sum(rows.c.count),
+            )
+            .group_by(rows.c.period, bucket)
+            .order_by(rows.c.period, bucket)
+        )
+
+        result = await self.session.execute(query)
+
+        series: list[list[SalesBucket]] = [[] for _ in periods]
+        for period, start, total_price, quantity, count in result.all():
+            series[period].append(
+                SalesBucket(start=start, total_price=total_price, quantity=quantity, count=count)
+            )
+
+        return series
+
+    async def backfill_daily_rollup(
+        self, start_day: Optional[date] = None, end_day: Optional[date] = None
+    ) -> int:
+        """
+        Rebuild the rollup rows of the days in [start_day, end_day] (every day if omitted)
+        from the raw sales, returns the number of rollup rows written
+        """
+        sale_day = cast(func.timezone(_UTC, SaleORM.created_at), Date)
+
+        clear = delete(RollupORM)
+        rebuild = select(
+            sale_day,
+            SaleORM.product_id,
+            func.sum(SaleORM.quantity),
+            func.sum(SaleORM.total_price),
+            func.count(),
+        ).group_by(sale_day, SaleORM.product_id)
+
+        if start_day:
+            clear = clear.where(RollupORM.day >= start_day)
+            rebuild = rebuild.where(SaleORM.created_at >= _midnight(start_day))
+
+        if end_day:
+            clear = clear.where(RollupORM.day <= end_day)
+            rebuild = rebuild.where(SaleORM.created_at < _midnight(end_day + timedelta(days=1)))
+
+        await self.session.execute(clear)
+        result = await self.session.execute(
+            insert(RollupORM).from_select(
+                ["day", "product_id", "quantity", "revenue", "count"], rebuild
+            )
+        )
+        return result.rowcount
+
+
+def _filter_sales(
+    query: Select,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    product_id: Optional[str] = None,
+    category_id: Optional[str] = None,
+) -> Select:
+    """Restrict a query over sales to a date range, a product and/or a category"""
+    filters: list[Any] = []
+
+    if start_date:
+        filters.append(SaleORM.created_at >= start_date)
+
+    if end_date:
+        filters.append(SaleORM.created_at <= end_date)
+
+    if product_id:
+        filters.append(SaleORM.product_id == product_id)
+
+    # sales carry their category, no need to go through the products
+    if category_id is not None:
+        filters.append(SaleORM.category_id == category_id)
+
+    if filters:
+        query = query.where(and_(*filters))
+
+    return query
+
+
+def _filter_rollup(
+    query: Select,
+    first_day: Optional[date] = None,
+    last_day: Optional[date] = None,
+    product_id: Optional[str] = None,
+    category_id: Optional[str] = None,
+) -> Select:
+    """Restrict a query over the daily rollup to [first_day, last_day), a product and/or a category"""
+    filters: list[Any] = []
+
+    if first_day:
+        filters.append(RollupORM.day >= first_day)
+
+    if last_day:
+        filters.append(RollupORM.day < last_day)
+
+    if product_id:
+        filters.append(RollupORM.product_id == product_id)
+
+    if category_id is not None:
+        query = query.join(ProductORM, RollupORM.product_id == ProductORM.id)
+        filters.append(ProductORM.category_id == category_id)
+
+    if filters:
+        query = query.where(and_(*filters))
+
+    return query
+
+
+def _sales_rows(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    product_id: Optional[str] = None,
+    category_id: Optional[str] = None,
+    use_rollup: bool = True,
+) -> Subquery:
+    """
+    The sales in [start, end] as (created_at, product_id, total_price, quantity, count) rows.
+
+    With `use_rollup` the whole UTC days of the range are read from the daily rollup,
+    one row per day and product stamped at midnight, and only the partial days
+    at the edges are read from `sales`.
+    """
+    raw = select(
+        SaleORM.created_at,
+        SaleORM.product_id,
+        SaleORM.total_price,
+        SaleORM.quantity,
+        literal_column("1").label("count"),
+    )
+
+    first_day = _midnight(start.date()) if start else None
+    if first_day and first_day < start:
+        first_day += timedelta(days=1)
+    last_day = _midnight(end.date()) if end else None
+
+    if not use_rollup or (first_day and last_day and first_day >= last_day):
+        return _filter_sales(raw, start, end, product_id, category_id).subquery("sales_rows")
+
+    parts: list[Select] = []
+
+    if start and start < first_day:
+        head = _filter_sales(raw, start, None, product_id, category_id)
+        parts.append(head.where(SaleORM.created_at < first_day))
+
+    rollup = select(
+        func.timezone(_UTC, cast(RollupORM.day, DateTime)).label("created_at"),
+        RollupORM.product_id,
+        RollupORM.revenue.label("total_price"),
+        RollupORM.quantity,
+        RollupORM.count,
+    )
+    parts.append(
+        _filter_rollup(
+            rollup,
+            first_day.date() if first_day else None,
+            last_day.date() if last_day else None,
+            product_id,
+            category_id,
+        )
+    )
+
+    if last_day:
+        parts.append(_filter_sales(raw, last_day, end, product_id, category_id))
+
+    return union_all(*parts).subquery("sales_rows")
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Timezone aware UTC datetime, naive ones are taken to be UTC already"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+
+    return value.astimezone(timezone.utc)
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time(), tzinfo=timezone.utc)
+
+
+def _is_midnight(value: datetime) -> bool:
+    return value == _midnight(value.date())
@@ -0,0 +1,15 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.infra.storage.models.versions import TableVersion
+
+
+async def table_version(session: AsyncSession, table_name: str) -> int:
+    """
+    The write counter of a table, it only ever grows. Read it before the rows
+    it stands for, a write landing in between then makes it look older, never newer.
+    """
+    query = select(func.coalesce(func.sum(TableVersion.version), 0)).where(
+        TableVersion.table_name == table_name
+    )
+    return int(await session.scalar(query))
@@ -1,9 +1,20 @@
-from typing import Optional
+from typing import Literal, Optional
+from dataclasses import dataclass
 
 from src.uow.abstract import AbstractUnitOfWork
+from src.domain.pagination import Page, decode_cursor, make_page
 from src.domain.inventory.models import InventoryItem, InventoryUpdate
 
 
+@dataclass
+class InventoryBatchResult:
+    product_id: str
+    quantity: int
+    status: Literal["applied", "not_found"]
+    # stock level once the whole batch is applied, None if the product doesn't exist
+    current_quantity: Optional[int]
+
+
 class InventoryService:
     def __init__(self, uow: AbstractUnitOfWork):
         self.uow = uow
@@ -18,12 +29,59 @@ class InventoryService:
         async with self.uow:
             return await self.uow.inventory.list()
 
+    async def current_inventory_version(self) -> int:
+        async with self.uow:
+            return await self.uow.inventory.get_version()
+
+    async def current_inventory_page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Page[InventoryItem]:
+        """Fetch a page of inventory items, ordered by product ID"""
+        after = decode_cursor(cursor)[0] if cursor else None
+        async with self.uow:
+            items = await self.uow.inventory.list(limit + 1, after)
+
+        return make_page(items, limit, lambda i: (i.product_id,))
+
     async def add_inventory_update(self, product_id: str, quantity: int) -> Optional[InventoryItem]:
         """Add a new inventory update for a product"""
         update = InventoryUpdate.create(product_id=product_id, quantity=quantity)
         async with self.uow:
-            await self.uow.inventory.add_inventory_update(update)
-            return await self.uow.inventory.get_by_product(product_id)
+            return await self.uow.inventory.add_inventory_update(update)
+
+    async def add_inventory_updates(
+        self, updates: list[tuple[str, int]]
+    ) -> list[InventoryBatchResult]:
+        """
+        Apply a batch of (product_id, quantity) adjustments in one transaction.
+        Adjustments for unknown products are skipped and reported as such.
+        """
+        if not updates:
+            return []
+
+        async with self.uow:
+            known = await self.uow.products.existing_product_ids(
+                list({product_id for product_id, _ in updates})
+            )
+
+            accepted = [
+                InventoryUpdate.create(product_id=product_id, quantity=quantity)
+                for product_id, quantity in updates
+                if product_id in known
+            ]
+            items = await self.uow.inventory.add_inventory_updates(accepted) if accepted else []
+
+        current = {item.product_id: item.quantity for item in items}
+
+        return [
+            InventoryBatchResult(
+                product_id=product_id,
+                quantity=quantity,
+                status="applied" if product_id in known else "not_found",
+                current_quantity=current.get(product_id),
+            )
+            for product_id, quantity in updates
+        ]
 
     async def low_stock_alerts(self, threshold: int = 10) -> list[InventoryItem]:
         """Get a list of inventory items that are at or below the low stock threshold"""
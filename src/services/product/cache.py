@@ -0,0 +1,165 @@
+"""
+Read-through cache of the product catalog, shared by the whole process.
+
+Products and categories are cached by id, along with the full lists of both, for
+`ttl` at most and least recently used first past `max_size` entries. A commit of this
+process that changes the catalog drops exactly the entries it changed. The commits of
+other processes (the other uvicorn workers, the CLI...) only reach the cache through
+an invalidation backend, without one their changes show up after `ttl`. The lists
+served with an ETag are read along with their table's version and never outlive it.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional
+
+if TYPE_CHECKING:
+    from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
+
+# ("product", id), ("category", id), or the lists ("products", None) and ("categories", None)
+CatalogKey = tuple[str, Optional[str]]
+
+PRODUCTS: CatalogKey = ("products", None)
+CATEGORIES: CatalogKey = ("categories", None)
+
+
+class CatalogInvalidations(ABC):
+    """Shares the invalidations of the process with the caches of the other processes"""
+
+    @abstractmethod
+    async def start(self, on_invalidation: Callable[[Optional[list[CatalogKey]]], None]) -> None:
+        """Start receiving the other processes' invalidations, None meaning everything"""
+        pass
+
+    @abstractmethod
+    async def publish(self, keys: list[CatalogKey]) -> None:
+        """Tell the other processes about the entries this one changed"""
+        pass
+
+    @abstractmethod
+    async def stop(self) -> None:
+        pass
+
+
+class LocalInvalidations(CatalogInvalidations):
+    """For single process deployments, nobody to tell"""
+
+    async def start(self, on_invalidation: Callable[[Optional[list[CatalogKey]]], None]) -> None:
+        pass
+
+    async def publish(self, keys: list[CatalogKey]) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class CatalogCache:
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl: timedelta = timedelta(seconds=60),
+        backend: Optional[CatalogInvalidations] = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend or LocalInvalidations()
+
+        # key -> (expiry, version, value), None values are cached too (not found)
+        self.entries: OrderedDict[CatalogKey, tuple[datetime, Optional[int], Any]] = OrderedDict()
+        # bumped by every invalidation, values read across one aren't stored
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self) -> None:
+        await self.backend.start(self.invalidate)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    def get(
+        self, key: CatalogKey, now: Optional[datetime] = None, version: Optional[int] = None
+    ) -> tuple[bool, Any]:
+        """
+        (True, value) when the key is cached and hasn't expired, else (False, None).
+        With a `version` (see the repositories' table versions), only a value stored
+        with that same version is returned, whatever the other processes did.
+        """
+        now = now or datetime.now(timezone.utc)
+
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= now or (version is not None and entry[1] != version):
+            self.misses += 1
+            return False, None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[2]
+
+    def put(
+        self,
+        key: CatalogKey,
+        value: Any,
+        generation: int,
+        now: Optional[datetime] = None,
+        version: Optional[int] = None,
+    ) -> None:
+        """Keep a value from a read that began at `generation`, after reading `version`"""
+        if generation != self.generation:
+            # the catalog changed meanwhile, the read may or may not have seen it
+            return
+
+        now = now or datetime.now(timezone.utc)
+        self.entries[key] = (now + self.ttl, version, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, keys: Optional[Iterable[CatalogKey]]) -> None:
+        """Drop the given entries, or all of them with None"""
+        self.generation += 1
+
+        if keys is None:
+            self.entries.clear()
+            return
+
+        for key in keys:
+            self.entries.pop(key, None)
+
+    async def record_committed(self, uow: "SQLAlchemyUnitOfWork") -> None:
+        """After-commit hook of the units of work, drops what their writes changed"""
+        keys = changed_keys(uow.products.changed_products, uow.products.changed_categories)
+        if not keys:
+            return
+
+        self.invalidate(keys)
+        await self.backend.publish(keys)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "size": len(self.entries),
+            "max_size": self.max_size,
+        }
+
+
+def changed_keys(product_ids: Iterable[str], category_ids: Iterable[str]) -> list[CatalogKey]:
+    """The entries made stale by writes to these products and categories"""
+    keys: list[CatalogKey] = [("product", product_id) for product_id in dict.fromkeys(product_ids)]
+    if keys:
+        keys.append(PRODUCTS)
+
+    categories: list[CatalogKey] = [
+        ("category", category_id) for category_id in dict.fromkeys(category_ids)
+    ]
+    if categories:
+        keys += categories + [CATEGORIES]
+
+    return keys
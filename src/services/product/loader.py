@@ -0,0 +1,59 @@
+"""
+Dataloader style batching of the product lookups by ID.
+
+`load`s awaited within the same tick of the event loop (e.g. `asyncio.gather` over
+the rows of a page that each need their product) are answered by a single
+`get_products_by_ids` query instead of one query each.
+"""
+
+import asyncio
+from typing import Optional
+
+from src.uow.abstract import AbstractUnitOfWork
+from src.domain.product.models import Product
+
+
+class ProductLoader:
+    def __init__(self, uow: AbstractUnitOfWork):
+        self.uow = uow
+
+        # the futures waiting for each id of the batch being gathered
+        self.pending: dict[str, list[asyncio.Future]] = {}
+        # batches share the unit of work, so they run one at a time
+        self.lock = asyncio.Lock()
+        # the loop only keeps weak references to its tasks
+        self.batches: set[asyncio.Task] = set()
+
+    async def load(self, product_id: str) -> Optional[Product]:
+        loop = asyncio.get_running_loop()
+        if not self.pending:
+            # runs once every load already scheduled for this tick has been added
+            loop.call_soon(self._dispatch)
+
+        future = loop.create_future()
+        self.pending.setdefault(product_id, []).append(future)
+        return await future
+
+    def _dispatch(self) -> None:
+        batch, self.pending = self.pending, {}
+        task = asyncio.ensure_future(self._load_batch(batch))
+        self.batches.add(task)
+        task.add_done_callback(self.batches.discard)
+
+    async def _load_batch(self, batch: dict[str, list[asyncio.Future]]) -> None:
+        try:
+            async with self.lock, self.uow:
+                products = await self.uow.products.get_products_by_ids(list(batch))
+        except Exception as exc:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            return
+
+        by_id = {product.id: product for product in products}
+        for product_id, futures in batch.items():
+            for future in futures:
+                # the caller may have given up (cancelled) meanwhile
+                if not future.done():
+                    future.set_result(by_id.get(product_id))
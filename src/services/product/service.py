@@ -1,12 +1,62 @@
-from typing import Optional
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Literal, Optional
 
 from src.uow.abstract import AbstractUnitOfWork
+from src.domain.pagination import InvalidCursor, Page, decode_cursor, make_page
 from src.domain.product.models import Product, ProductCategory
+from src.services.product.cache import CATEGORIES, PRODUCTS, CatalogCache, CatalogKey
+from src.services.product.loader import ProductLoader
+
+
+@dataclass
+class ProductBatchResult:
+    # None when the item didn't even validate
+    id: Optional[str]
+    status: Literal["created", "updated", "invalid", "unknown_category", "duplicate"]
+    # why the item was rejected, for the invalid ones
+    error: Optional[str] = None
 
 
 class ProductService:
-    def __init__(self, uow: AbstractUnitOfWork):
+    def __init__(self, uow: AbstractUnitOfWork, cache: Optional[CatalogCache] = None):
         self.uow = uow
+        # process wide, the writes reach it through the units of work's after-commit hooks
+        self.cache = cache
+        # concurrent `get_product`s of this service share a query
+        self.loader = ProductLoader(uow)
+
+    async def _read_through(
+        self,
+        key: CatalogKey,
+        read: Callable[[], Awaitable[Any]],
+        version: Optional[int] = None,
+        in_uow: bool = True,
+    ) -> Any:
+        """
+        The cached value of `key`, read (and cached) when it isn't.
+        With the `version` of its table, a value cached at another version is read again.
+        Without `in_uow`, `read` opens the unit of work itself (see the loader).
+        """
+        if self.cache is None:
+            return await self._read(read, in_uow)
+
+        found, value = self.cache.get(key, version=version)
+        if found:
+            return value
+
+        generation = self.cache.generation
+        value = await self._read(read, in_uow)
+
+        self.cache.put(key, value, generation, version=version)
+        return value
+
+    async def _read(self, read: Callable[[], Awaitable[Any]], in_uow: bool) -> Any:
+        if not in_uow:
+            return await read()
+
+        async with self.uow:
+            return await read()
 
     async def create_product(
         self, name: str, category_id: str, description: str, price: float
@@ -23,13 +73,113 @@ class ProductService:
 
         return product
 
+    async def save_products(
+        self, products: list[Product], chunk_size: int = 1000
+    ) -> list[ProductBatchResult]:
+        """
+        Create the products, or update those whose ID exists, one transaction per
+        `chunk_size` of them. Products of unknown categories are skipped, and so are all
+        but the last of the products sharing an ID. One result per product, in order.
+        """
+        last = {product.id: index for index, product in enumerate(products)}
+
+        results: dict[int, ProductBatchResult] = {}
+        chunk: list[tuple[int, Product]] = []
+        for index, product in enumerate(products):
+            if last[product.id] != index:
+                results[index] = ProductBatchResult(id=product.id, status="duplicate")
+                continue
+
+            chunk.append((index, product))
+            if len(chunk) >= chunk_size:
+                results.update(await self._save_chunk(chunk))
+                chunk = []
+
+        if chunk:
+            results.update(await self._save_chunk(chunk))
+
+        return [results[index] for index in range(len(products))]
+
+    async def _save_chunk(self, chunk: list[tuple[int, Product]]) -> dict[int, ProductBatchResult]:
+        async with self.uow:
+            known = await self.uow.products.existing_category_ids(
+                list({product.category_id for _, product in chunk})
+            )
+            accepted = [product for _, product in chunk if product.category_id in known]
+            current = await self.uow.products.get_product_categories(
+                [product.id for product in accepted]
+            )
+            await self.uow.products.upsert_products(accepted)
+
+            # sales keep a copy of their product's category, moved in a single update
+            await self.uow.sales.set_product_categories(
+                {
+                    product.id: product.category_id
+                    for product in accepted
+                    if product.id in current and current[product.id] != product.category_id
+                }
+            )
+
+        return {
+            index: ProductBatchResult(
+                id=product.id,
+                status=(
+                    "unknown_category"
+                    if product.category_id not in known
+                    else "updated" if product.id in current else "created"
+                ),
+            )
+            for index, product in chunk
+        }
+
     async def get_product(self, product_id: str) -> Optional[Product]:
+        return await self._read_through(
+            ("product", product_id), lambda: self.loader.load(product_id), in_uow=False
+        )
+
+    async def get_products_by_ids(self, product_ids: list[str]) -> list[Product]:
+        """
+        The existing products among `product_ids`, in the same order, the ones that
+        aren't cached being read with a single query
+        """
+        products = await asyncio.gather(
+            *(self.get_product(product_id) for product_id in dict.fromkeys(product_ids))
+        )
+        return [product for product in products if product is not None]
+
+    async def get_products(self, version: Optional[int] = None) -> list[Product]:
+        """All the products, as of `get_products_version` when it is given"""
+        return await self._read_through(PRODUCTS, lambda: self.uow.products.get_products(), version)
+
+    async def get_products_version(self) -> int:
+        async with self.uow:
+            return await self.uow.products.get_products_version()
+
+    async def get_products_page(self, limit: int, cursor: Optional[str] = None) -> Page[Product]:
+        after = decode_cursor(cursor)[0] if cursor else None
         async with self.uow:
-            return await self.uow.products.get_product(product_id)
+            # one extra product tells whether there is a next page
+            products = await self.uow.products.get_products(limit + 1, after)
+
+        return make_page(products, limit, lambda p: (p.id,))
+
+    async def search_products(
+        self, query: str, limit: int, cursor: Optional[str] = None
+    ) -> Page[Product]:
+        """A page of the products matching `query`, best matches first"""
+        after = None
+        if cursor:
+            score, product_id = decode_cursor(cursor, 2)
+            try:
+                after = (float(score), product_id)
+            except ValueError as e:
+                raise InvalidCursor(f"Invalid cursor: {cursor}") from e
 
-    async def get_products(self) -> list[Product]:
         async with self.uow:
-            return await self.uow.products.get_products()
+            matches = await self.uow.products.search_products(query, limit + 1, after)
+
+        page = make_page(matches, limit, lambda m: (repr(m.score), m.product.id))
+        return Page(items=[match.product for match in page.items], next_cursor=page.next_cursor)
 
     async def update_product(
         self,
@@ -47,8 +197,13 @@ class ProductService:
             price=updated_price,
         )
         async with self.uow:
+            current = await self.uow.products.get_product(product_id)
             updated_product = await self.uow.products.update_product(product)
 
+            # sales keep a copy of their product's category
+            if current is not None and current.category_id != updated_category_id:
+                await self.uow.sales.set_product_category(product_id, updated_category_id)
+
         return updated_product
 
     async def delete_product(self, product_id: str) -> None:
@@ -67,9 +222,25 @@ class ProductService:
         return category
 
     async def get_category(self, category_id: str) -> Optional[ProductCategory]:
+        return await self._read_through(
+            ("category", category_id), lambda: self.uow.products.get_category(category_id)
+        )
+
+    async def get_categories(self, version: Optional[int] = None) -> list[ProductCategory]:
+        """All the categories, as of `get_categories_version` when it is given"""
+        return await self._read_through(
+            CATEGORIES, lambda: self.uow.products.get_categories(), version
+        )
+
+    async def get_categories_version(self) -> int:
         async with self.uow:
-            return await self.uow.products.get_category(category_id)
+            return await self.uow.products.get_categories_version()
 
-    async def get_categories(self) -> list[ProductCategory]:
+    async def get_categories_page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Page[ProductCategory]:
+        after = decode_cursor(cursor)[0] if cursor else None
         async with self.uow:
-            return await self.uow.products.get_categories()
+            categories = await self.uow.products.get_categories(limit + 1, after)
+
+        return make_page(categories, limit, lambda c: (c.id,))
@@ -0,0 +1,53 @@
+"""
+Bucketing of sales that are already in memory, for backends that can't total
+them in the database (the in-memory one) or for ad-hoc lists of sales.
+
+Every sale is read exactly once, in any order, and its bucket found with
+a binary search over the bucket edges, so the cost is linear in the number
+of sales and only logarithmic in the number of buckets.
+"""
+
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Iterable, Sequence
+
+from src.domain.sales.models import Sale, SalesBucket
+
+
+def bucket_sales(
+    sales: Iterable[Sale], start: datetime, end: datetime, step: timedelta
+) -> list[SalesBucket]:
+    """
+    Total `sales` in buckets of `step` counted from `start`, skipping the ones
+    outside of [start, end]. Only non-empty buckets are returned, ordered by start.
+    """
+    size = (end - start) // step + 1
+    edges = [start + index * step for index in range(size + 1)]
+    return _bucket(sales, edges, last=end)
+
+
+def _bucket(sales: Iterable[Sale], edges: Sequence[datetime], last: datetime) -> list[SalesBucket]:
+    size = len(edges) - 1
+    totals, quantities, counts = [0.0] * size, [0] * size, [0] * size
+
+    for sale in sales:
+        # a binary search over the edges, a handful of datetime comparisons
+        # is cheaper than the timedelta arithmetic a fixed step would allow
+        index = bisect_right(edges, sale.created_at) - 1
+        if index < 0 or index >= size or sale.created_at > last:
+            continue
+
+        totals[index] += sale.total_price
+        quantities[index] += sale.quantity
+        counts[index] += 1
+
+    return [
+        SalesBucket(
+            start=edges[index],
+            total_price=totals[index],
+            quantity=quantities[index],
+            count=counts[index],
+        )
+        for index in range(size)
+        if counts[index]
+    ]
@@ -0,0 +1,197 @@
+"""
+Cache of the sales buckets that comparisons are made of, shared by the whole process.
+
+A bucket is keyed by what it totals: (product_id, category_id, granularity, start).
+Once a bucket has been over for a while (`settle`) no new sale can land in it, so it is
+kept until evicted, least recently used first. Buckets that are still open, the one
+holding "now" in particular, are dropped as soon as a sale committed by this process
+lands in them, and after `settle` at the latest for the sales of other processes.
+Deleting or recategorizing a product drops its buckets whatever their age, along with
+those of the categories and of all the sales.
+
+Settled buckets are never checked against the database again. The maintenance commands
+that rewrite history, `sales-partitions` expiring months and `backfill-sales-rollup`,
+run in their own process and nothing tells the cache: the comparisons keep counting the
+sales as they were until the buckets are evicted or the API restarts.
+"""
+
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from src.domain.sales.models import GRANULARITY_STEPS, Granularity, Sale, SalesBucket
+
+if TYPE_CHECKING:
+    from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
+
+BucketKey = tuple[Optional[str], Optional[str], str, datetime]
+
+
+class SalesBucketCache:
+    def __init__(self, max_size: int = 100_000, settle: timedelta = timedelta(seconds=30)):
+        self.max_size = max_size
+        self.settle = settle
+
+        # None for the buckets without sales
+        self.buckets: OrderedDict[BucketKey, Optional[SalesBucket]] = OrderedDict()
+        # when each of the cached open buckets stops being valid
+        self.open: dict[BucketKey, datetime] = {}
+        # end of the latest settled bucket, no sale after it can land in one
+        self.settled_until: Optional[datetime] = None
+        # bumped by every invalidation, results computed across one aren't stored
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def cached(
+        self,
+        product_id: Optional[str],
+        category_id: Optional[str],
+        granularity: Granularity,
+        start: datetime,
+        end: datetime,
+        now: datetime,
+    ) -> tuple[list[SalesBucket], datetime]:
+        """
+        The non-empty cached buckets at the beginning of [start, end), along with
+        the start of the first bucket that has to be computed
+        """
+        step = GRANULARITY_STEPS[granularity]
+        found: list[SalesBucket] = []
+
+        bucket_start = start
+        while bucket_start < end:
+            key = (product_id, category_id, granularity, bucket_start)
+            if key not in self.buckets or self.open.get(key, now) < now:
+                break
+
+            self.buckets.move_to_end(key)
+            bucket = self.buckets[key]
+            if bucket is not None:
+                found.append(bucket)
+
+            self.hits += 1
+            bucket_start += step
+
+        self.misses += -((bucket_start - end) // step)
+        return found, bucket_start
+
+    def store(
+        self,
+        product_id: Optional[str],
+        category_id: Optional[str],
+        granularity: Granularity,
+        start: datetime,
+        end: datetime,
+        buckets: list[SalesBucket],
+        now: datetime,
+        generation: int,
+    ) -> None:
+        """
+        Keep the buckets aggregated over [start, end) from a read that began at `generation`.
+        The last bucket is left out when `end` cuts through it.
+        """
+        if generation != self.generation:
+            # a sale was committed meanwhile, the read may or may not have seen it
+            return
+
+        step = GRANULARITY_STEPS[granularity]
+        by_start = {bucket.start: bucket for bucket in buckets}
+
+        bucket_start = start
+        while bucket_start + step <= end:
+            key = (product_id, category_id, granularity, bucket_start)
+            self.buckets[key] = by_start.get(bucket_start)
+            self.buckets.move_to_end(key)
+
+            if bucket_start + step > now - self.settle:
+                self.open[key] = now + self.settle
+            else:
+                self.open.pop(key, None)
+                if self.settled_until is None or self.settled_until < bucket_start + step:
+                    self.settled_until = bucket_start + step
+
+            bucket_start += step
+
+        while len(self.buckets) > self.max_size:
+            key, _ = self.buckets.popitem(last=False)
+            self.open.pop(key, None)
+
+    def invalidate(self, sales: Iterable[Sale]) -> None:
+        """Drop the cached buckets the sales land in"""
+        sales = list(sales)
+        if not sales:
+            return
+
+        self.generation += 1
+
+        # sales are almost always "now", which only ever lands in the open buckets,
+        # the settled ones are only looked at for the sales older than them
+        oldest = min(sale.created_at for sale in sales)
+        if self.settled_until is not None and oldest < self.settled_until:
+            keys = list(self.buckets)
+        else:
+            keys = list(self.open)
+
+        # sorted sale times, overall and per product, so that checking a bucket
+        # is a bisect whatever the number of sales (bulk loads commit thousands)
+        times = sorted(sale.created_at for sale in sales)
+        times_by_product: dict[str, list[datetime]] = defaultdict(list)
+        for sale in sales:
+            times_by_product[sale.product_id].append(sale.created_at)
+        for product_times in times_by_product.values():
+            product_times.sort()
+
+        stale = [
+            key
+            for key in keys
+            if _lands_in(times if key[0] is None else times_by_product.get(key[0], []), key)
+        ]
+        for key in stale:
+            del self.buckets[key]
+            self.open.pop(key, None)
+
+    def invalidate_products(self, product_ids: Iterable[str]) -> None:
+        """
+        Drop every cached bucket of the products, and those of the categories and of all
+        the sales, which may have counted them: their sales were deleted or moved
+        """
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+
+        self.generation += 1
+
+        # which category the sales were in isn't known anymore, all of them go
+        stale = [key for key in self.buckets if key[0] is None or key[0] in product_ids]
+        for key in stale:
+            del self.buckets[key]
+            self.open.pop(key, None)
+
+    async def record_committed(self, uow: "SQLAlchemyUnitOfWork") -> None:
+        """After-commit hook of the units of work, drops what their writes made stale"""
+        self.invalidate(uow.sales.added)
+        self.invalidate_products(
+            [
+                *uow.products.deleted_products,
+                *(product_id for product_id, _ in uow.sales.recategorized),
+            ]
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.buckets),
+            "max_size": self.max_size,
+        }
+
+
+def _lands_in(times: list[datetime], key: BucketKey) -> bool:
+    """Whether any of the sorted sale `times` is in the bucket, the category isn't looked at"""
+    _, _, granularity, start = key
+
+    index = bisect_left(times, start)
+    return index < len(times) and times[index] < start + GRANULARITY_STEPS[granularity]
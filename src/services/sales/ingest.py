@@ -0,0 +1,155 @@
+"""
+Reading sales from POS exports, as NDJSON (one JSON object per line) or CSV
+(with a header line), without holding the whole export in memory.
+
+Every row has a `product_id`, `quantity` and `total_price`, and optionally
+an `id` and a `created_at` (ISO 8601, UTC when it has no timezone).
+Rows are checked one by one, the ones that don't parse are reported
+with their line number instead of failing the whole export.
+"""
+
+import csv
+import json
+import math
+import codecs
+from uuid import UUID, uuid4
+from functools import lru_cache
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterable, AsyncIterator, Literal, Union
+
+from src.domain.sales.models import Sale
+
+IngestFormat = Literal["ndjson", "csv"]
+
+# rows that failed, as many as are reported back
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class IngestError:
+    line: int
+    message: str
+
+
+@dataclass
+class IngestReport:
+    accepted: int = 0
+    rejected: int = 0
+    # the first MAX_REPORTED_ERRORS rejected rows
+    errors: list[IngestError] = field(default_factory=list)
+
+    def reject(self, line: int, message: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(IngestError(line=line, message=message))
+
+
+async def read_lines(chunks: AsyncIterable[Union[bytes, str]]) -> AsyncIterator[str]:
+    """Split a stream of chunks (e.g. a request body) into lines"""
+    # a character can be split across two chunks, the decoder holds on to its first bytes
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def read_rows(
+    lines: AsyncIterable[str], format: IngestFormat = "ndjson"
+) -> AsyncIterator[tuple[int, Union[dict, str]]]:
+    """
+    (line number, row) of every non-blank line, the row being a dict or,
+    when the line can't even be read as one, the reason why
+    """
+    header = None
+    number = 0
+    async for line in lines:
+        number += 1
+        line = line.rstrip("\r")
+        if not line.strip():
+            continue
+
+        if format == "ndjson":
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, f"invalid JSON: {exc}"
+                continue
+            yield number, row if isinstance(row, dict) else "not a JSON object"
+
+        elif header is None:
+            header = next(csv.reader([line]))
+
+        else:
+            values = next(csv.reader([line]))
+            if len(values) != len(header):
+                yield number, f"expected {len(header)} columns, got {len(values)}"
+                continue
+            yield number, dict(zip(header, values))
+
+
+@lru_cache(maxsize=10_000)
+def _product_id(value: str) -> str:
+    # exports repeat the same few products over and over, parse each once
+    return str(UUID(value))
+
+
+def _quantity(value: object) -> int:
+    """A whole number, int() would truncate 2.9 to 2 and take true for 1"""
+    if isinstance(value, bool):
+        raise ValueError("quantity must be a whole number")
+
+    if isinstance(value, str):
+        # CSV values are strings, "2" but neither "2.9" nor "true"
+        return int(value)
+
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if not isinstance(value, int):
+        raise ValueError("quantity must be a whole number")
+
+    return value
+
+
+def to_sale(row: dict) -> Sale:
+    """The sale of a row, raises ValueError when it isn't one"""
+    try:
+        product_id = _product_id(str(row["product_id"]))
+        quantity = _quantity(row["quantity"])
+        total_price = float(row["total_price"])
+    except KeyError as exc:
+        raise ValueError(f"missing {exc.args[0]}") from None
+    except (TypeError, ValueError) as exc:
+        raise ValueError(str(exc)) from None
+
+    if quantity <= 0:
+        raise ValueError("quantity must be positive")
+    # nan < 0 is False, infinities are floats too
+    if not math.isfinite(total_price):
+        raise ValueError("total_price must be a finite number")
+    if total_price < 0:
+        raise ValueError("total_price can't be negative")
+
+    created_at = row.get("created_at")
+    if created_at:
+        created_at = datetime.fromisoformat(str(created_at))
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+    else:
+        created_at = datetime.now(timezone.utc)
+
+    sale_id = row.get("id")
+    return Sale(
+        id=str(UUID(str(sale_id))) if sale_id else str(uuid4()),
+        product_id=product_id,
+        quantity=quantity,
+        total_price=total_price,
+        created_at=created_at,
+    )
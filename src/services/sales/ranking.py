@@ -0,0 +1,17 @@
+"""
+Ranking of sales totals that are already in memory, for the backends
+that can't rank them in the database.
+"""
+
+from heapq import nsmallest
+from typing import Iterable
+
+from src.domain.sales.models import SalesMetric, SalesTotal
+
+
+def top_totals(totals: Iterable[SalesTotal], metric: SalesMetric, n: int) -> list[SalesTotal]:
+    """
+    The `n` totals with the highest `metric`, highest first, ties broken by id
+    like the database does. Only a heap of `n` totals is kept while reading them.
+    """
+    return nsmallest(n, totals, key=lambda total: (-total.metric(metric), total.id))
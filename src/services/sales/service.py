@@ -1,9 +1,22 @@
-from typing import Optional, Literal
-from datetime import datetime, timedelta
+import asyncio
+from typing import AsyncIterable, AsyncIterator, Callable, Optional, Union
+from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass
 
 from src.uow.abstract import AbstractUnitOfWork
-from src.domain.sales.models import Sale
+from src.domain.pagination import InvalidCursor, Page, decode_cursor, make_page
+from src.domain.sales.models import (
+    GRANULARITY_STEPS,
+    Granularity,
+    Sale,
+    SalesBucket,
+    SalesGrouping,
+    SalesMetric,
+    SalesSummary,
+    SalesTotal,
+)
+from src.services.sales.cache import SalesBucketCache
+from src.services.sales.ingest import IngestReport, to_sale
 
 
 @dataclass
@@ -13,9 +26,19 @@ class SaleComparison:
     second_total: float
 
 
+@dataclass
+class PeriodsComparison:
+    """Same as `SaleComparison`, for any number of periods, in the order they were given"""
+
+    time_label: str
+    totals: list[float]
+
+
 class ProductService:
-    def __init__(self, uow: AbstractUnitOfWork):
+    def __init__(self, uow: AbstractUnitOfWork, cache: Optional[SalesBucketCache] = None):
         self.uow = uow
+        # buckets of earlier comparisons, shared by the services of the whole process
+        self.cache = cache
 
     async def create_sale(self, product_id: str, quantity: int, total_price: float) -> Sale:
         # this is just a test endpoint, its there so I can seed data.
@@ -33,6 +56,56 @@ class ProductService:
 
         return sale
 
+    async def ingest_sales(
+        self, rows: AsyncIterable[tuple[int, Union[dict, str]]], chunk_size: int = 10_000
+    ) -> IngestReport:
+        """
+        Record the sales of an export, read as (line number, row) by `ingest.read_rows`,
+        one transaction per `chunk_size` rows. Rows that aren't valid sales, are sales
+        of unknown products or were already recorded, are rejected and reported instead.
+        """
+        report = IngestReport()
+
+        chunk: list[tuple[int, Sale]] = []
+        async for number, row in rows:
+            if isinstance(row, str):
+                report.reject(number, row)
+                continue
+
+            try:
+                chunk.append((number, to_sale(row)))
+            except ValueError as exc:
+                report.reject(number, str(exc))
+                continue
+
+            if len(chunk) >= chunk_size:
+                await self._ingest_chunk(chunk, report)
+                chunk = []
+
+        if chunk:
+            await self._ingest_chunk(chunk, report)
+
+        return report
+
+    async def _ingest_chunk(self, chunk: list[tuple[int, Sale]], report: IngestReport) -> None:
+        async with self.uow:
+            # exports get replayed, their sales with an id may have been recorded already
+            known, recorded = await self.uow.sales.check_new_sales([sale for _, sale in chunk])
+
+            sales = []
+            for number, sale in chunk:
+                key = (sale.id, sale.created_at)
+                if sale.product_id not in known:
+                    report.reject(number, f"unknown product {sale.product_id}")
+                elif key in recorded:
+                    report.reject(number, f"sale {sale.id} already recorded")
+                else:
+                    # and the same sale can be in there twice
+                    recorded.add(key)
+                    sales.append(sale)
+
+            report.accepted += await self.uow.sales.add_sales(sales)
+
     async def get_sales_between_dates(
         self,
         start_date: Optional[datetime] = None,
@@ -45,6 +118,77 @@ class ProductService:
                 start_date, end_date, product_id, category_id
             )
 
+    async def get_sales_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> Page[Sale]:
+        after = None
+        if cursor:
+            created_at, sale_id = decode_cursor(cursor, length=2)
+            try:
+                after = (datetime.fromisoformat(created_at), sale_id)
+            except ValueError as e:
+                raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+        async with self.uow:
+            sales = await self.uow.sales.get_sales_between_dates(
+                start_date, end_date, product_id, category_id, limit + 1, after
+            )
+
+        return make_page(sales, limit, lambda s: (s.created_at.isoformat(), s.id))
+
+    async def stream_sales_between_dates(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sale]:
+        # the unit of work stays open for as long as the caller keeps iterating
+        async with self.uow:
+            async for sale in self.uow.sales.stream_sales_between_dates(
+                start_date, end_date, product_id, category_id, batch_size
+            ):
+                yield sale
+
+    async def summarize_sales(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> SalesSummary:
+        """
+        Count, quantity and revenue of the sales between two dates, without the sales.
+        """
+        async with self.uow:
+            return await self.uow.sales.summarize_sales(
+                start_date, end_date, product_id, category_id
+            )
+
+    async def top_sales(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        metric: SalesMetric = "revenue",
+        n: int = 10,
+        group_by: SalesGrouping = "product",
+        category_id: Optional[str] = None,
+    ) -> list[SalesTotal]:
+        """
+        Leaderboard of the products (or categories) selling the most between two dates.
+        """
+        async with self.uow:
+            return await self.uow.sales.top_sales(
+                start_date, end_date, metric, n, group_by, category_id
+            )
+
     async def compare_sales(
         self,
         first_start: datetime,
@@ -53,7 +197,7 @@ class ProductService:
         second_end: datetime,
         product_id: Optional[str] = None,
         category_id: Optional[str] = None,
-        granularity: Literal["day", "week", "month"] = "day",
+        granularity: Granularity = "day",
     ) -> list[SaleComparison]:
         """
         Compare sales based on total price or quantity.
@@ -63,70 +207,175 @@ class ProductService:
             first_end - first_start == second_end - second_start
         ), "The time periods must be of the same length."
 
+        # the database totals each bucket, we only line the two periods up.
+        # both periods are read at once, from the same snapshot
         async with self.uow:
-            first_sales = await self.uow.sales.get_sales_between_dates(
-                first_start, first_end, product_id, category_id
-            )
-            second_sales = await self.uow.sales.get_sales_between_dates(
-                second_start, second_end, product_id, category_id
+            periods = [(first_start, first_end), (second_start, second_end)]
+            if self.cache is not None:
+                first_buckets, second_buckets = await self._cached_aggregates(
+                    periods, granularity, product_id, category_id, concurrent=True
+                )
+            else:
+                first_buckets, second_buckets = await self._aggregate_concurrently(
+                    periods, granularity, product_id, category_id
+                )
+
+        step = GRANULARITY_STEPS[granularity]
+        make_label = _label_maker(granularity)
+
+        first_totals = _totals_by_offset(first_buckets, first_start, step)
+        second_totals = _totals_by_offset(second_buckets, second_start, step)
+
+        comparison: list[SaleComparison] = []
+
+        offset = 0
+        while first_start + offset * step < first_end:
+            comparison.append(
+                SaleComparison(
+                    time_label=make_label(first_start + offset * step),
+                    first_total=first_totals.get(offset, 0),
+                    second_total=second_totals.get(offset, 0),
+                )
             )
+            offset += 1
+
+        return comparison
 
-        # Now I will group the sales by the specified granularity, and return the results
-        # those can be displayed in a chart
+    async def compare_periods(
+        self,
+        periods: list[tuple[datetime, datetime]],
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        granularity: Granularity = "day",
+    ) -> list[PeriodsComparison]:
+        """
+        Compare the sales of several (start, end) periods, lined up by bucket.
+        The labels are the ones of the first period.
+        """
 
-        if granularity == "day":
-            step = timedelta(days=1)
+        assert periods, "At least one time period is needed."
+        length = periods[0][1] - periods[0][0]
+        assert all(
+            end - start == length for start, end in periods
+        ), "The time periods must be of the same length."
 
-            def make_label(date: datetime) -> str:
-                return date.strftime("%Y-%m-%d")
+        # every period is totalled by the same query (or scan), instead of one each
+        async with self.uow:
+            if self.cache is not None:
+                series = await self._cached_aggregates(
+                    periods, granularity, product_id, category_id
+                )
+            else:
+                series = await self.uow.sales.aggregate_sales_periods(
+                    periods, granularity, product_id, category_id
+                )
 
-        elif granularity == "week":
-            step = timedelta(weeks=1)
+        step = GRANULARITY_STEPS[granularity]
+        make_label = _label_maker(granularity)
 
-            def make_label(date: datetime) -> str:
-                year, week, _ = date.isocalendar()
-                return f"{year}-W{week:02d}"
+        totals = [
+            _totals_by_offset(buckets, start, step) for buckets, (start, _) in zip(series, periods)
+        ]
 
-        else:
-            step = timedelta(weeks=4)
+        comparison: list[PeriodsComparison] = []
 
-            def make_label(date: datetime) -> str:
-                return date.strftime("%Y-%m")
+        first_start, first_end = periods[0]
+        offset = 0
+        while first_start + offset * step < first_end:
+            comparison.append(
+                PeriodsComparison(
+                    time_label=make_label(first_start + offset * step),
+                    totals=[period_totals.get(offset, 0) for period_totals in totals],
+                )
+            )
+            offset += 1
 
-        def buckets(start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
-            current = start
-            buckets: list[tuple[datetime, datetime]] = []
-            while current < end:
-                next = current + step
-                buckets.append((current, next))
-                current = next
+        return comparison
 
-            return buckets
+    async def _cached_aggregates(
+        self,
+        periods: list[tuple[datetime, datetime]],
+        granularity: Granularity,
+        product_id: Optional[str],
+        category_id: Optional[str],
+        concurrent: bool = False,
+    ) -> list[list[SalesBucket]]:
+        """
+        The buckets of every period over [start, end), the cached ones from the cache
+        and the rest, from the first one missing onwards, in a single aggregate
+        (`concurrent`ly, one per period, when more than one period is missing)
+        """
+        now = datetime.now(timezone.utc)
+        generation = self.cache.generation
 
-        first_bucket = buckets(first_start, first_end)
-        second_bucket = buckets(second_start, second_end)
+        cached, missing = [], []
+        for start, end in periods:
+            buckets, rest = self.cache.cached(product_id, category_id, granularity, start, end, now)
+            cached.append(buckets)
+            if rest < end:
+                missing.append((len(cached) - 1, rest, end))
 
-        comparison: list[SaleComparison] = []
+        aggregate = self.uow.sales.aggregate_sales_periods
+        if concurrent and len(missing) > 1:
+            aggregate = self._aggregate_concurrently
+        computed = await aggregate(
+            [(rest, end) for _, rest, end in missing], granularity, product_id, category_id
+        )
 
-        for (first_start, first_end), (second_start, second_end) in zip(
-            first_bucket, second_bucket
-        ):
-            first_sales_in_bucket = [
-                sale for sale in first_sales if first_start <= sale.created_at < first_end
-            ]
-            second_sales_in_bucket = [
-                sale for sale in second_sales if second_start <= sale.created_at < second_end
-            ]
+        for (index, rest, end), buckets in zip(missing, computed):
+            # the aggregate includes `end` itself, which is past the last bucket shown
+            buckets = [bucket for bucket in buckets if bucket.start < end]
+            self.cache.store(
+                product_id, category_id, granularity, rest, end, buckets, now, generation
+            )
+            cached[index] = cached[index] + buckets
 
-            total_first = sum(sale.total_price for sale in first_sales_in_bucket)
-            total_second = sum(sale.total_price for sale in second_sales_in_bucket)
+        return cached
 
-            comparison.append(
-                SaleComparison(
-                    time_label=make_label(first_start),
-                    first_total=total_first,
-                    second_total=total_second,
+    async def _aggregate_concurrently(
+        self,
+        periods: list[tuple[datetime, datetime]],
+        granularity: Granularity,
+        product_id: Optional[str],
+        category_id: Optional[str],
+    ) -> list[list[SalesBucket]]:
+        """The buckets of every period, aggregated at once, each from its own snapshot reader"""
+        async with self.uow.snapshot_readers(len(periods)) as readers:
+            return list(
+                await asyncio.gather(
+                    *(
+                        reader.sales.aggregate_sales(
+                            start, end, granularity, product_id, category_id
+                        )
+                        for reader, (start, end) in zip(readers, periods)
+                    )
                 )
             )
 
-        return comparison
+
+def _label_maker(granularity: Granularity) -> Callable[[datetime], str]:
+    """labels for the charts, that can be displayed to the user"""
+
+    if granularity == "day":
+
+        def make_label(date: datetime) -> str:
+            return date.strftime("%Y-%m-%d")
+
+    elif granularity == "week":
+
+        def make_label(date: datetime) -> str:
+            year, week, _ = date.isocalendar()
+            return f"{year}-W{week:02d}"
+
+    else:
+
+        def make_label(date: datetime) -> str:
+            return date.strftime("%Y-%m")
+
+    return make_label
+
+
+def _totals_by_offset(
+    buckets: list[SalesBucket], start: datetime, step: timedelta
+) -> dict[int, float]:
+    return {(bucket.start - start) // step: bucket.total_price for bucket in buckets}
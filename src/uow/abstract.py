@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Type, TypeVar
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Type, TypeVar
 from types import TracebackType
 
 from src.domain.product.repository import AbstractProductRepository
@@ -45,3 +46,12 @@ class AbstractUnitOfWork(ABC):
     async def rollback(self) -> None:
         """Roll back the current transaction"""
         raise NotImplementedError
+
+    @asynccontextmanager
+    async def snapshot_readers(self, count: int) -> AsyncIterator[list["AbstractUnitOfWork"]]:
+        """
+        `count` units of work to read from concurrently (e.g. with `asyncio.gather`),
+        all seeing the same data as this one. Only valid inside this unit of work.
+        Nothing to run concurrently by default, every reader is this unit of work.
+        """
+        yield [self] * count
@@ -20,7 +20,7 @@ class InMemoryUnitOfWork(AbstractUnitOfWork):
     def __init__(self) -> None:
         self.products = ProductRepository()
         self.inventory = InventoryRepository()
-        self.sales = SalesRepository()
+        self.sales = SalesRepository(catalog=self.products)
 
     async def __aenter__(self) -> "InMemoryUnitOfWork":
         return self
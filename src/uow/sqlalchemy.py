@@ -1,12 +1,29 @@
-from typing import Optional, Type
+import re
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Optional, Sequence, Type
 from types import TracebackType
 
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.infra.config import config
 from src.uow.abstract import AbstractUnitOfWork
+from src.domain.sales.repository import AbstractSalesReader
 from src.infra.storage.db import get_session_factory
 from src.infra.storage.repositories.sqlalchemy.product import ProductRepository
 from src.infra.storage.repositories.sqlalchemy.inventory import InventoryRepository
 from src.infra.storage.repositories.sqlalchemy.sales import SalesRepository
 
+if TYPE_CHECKING:
+    from src.infra.storage.repositories.columnar.sales import SalesColumns
+
+# a postgres WAL position, e.g. "0/16B3748"
+_LSN_PATTERN = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+
+# an exported snapshot id, e.g. "00000003-0000001B-1"
+_SNAPSHOT_PATTERN = re.compile(r"^[0-9A-Fa-f-]+$")
+
 
 class SQLAlchemyUnitOfWork(AbstractUnitOfWork):
     """
@@ -18,19 +35,57 @@ class SQLAlchemyUnitOfWork(AbstractUnitOfWork):
     inventory: InventoryRepository
     sales: SalesRepository
 
-    def __init__(self) -> None:
-        self.session_factory = get_session_factory()
+    def __init__(
+        self,
+        session_factory: Optional[async_sessionmaker[AsyncSession]] = None,
+        track_consistency: bool = False,
+        after_commit: Sequence[Callable[["SQLAlchemyUnitOfWork"], Awaitable[None]]] = (),
+    ) -> None:
+        # the application passes in the process-wide session factory, so every
+        # unit of work shares one engine and connection pool
+        self.session_factory = session_factory or get_session_factory()
+        self.session: Optional[AsyncSession] = None
+        # the factory of the current session, not always `session_factory` (see the read-only one)
+        self.opened_with = self.session_factory
+
+        # when reads are served by a replica, remember the WAL position of our
+        # last commit so the client can ask the replica to catch up to it
+        self.track_consistency = track_consistency
+        self.consistency_token: Optional[str] = None
+
+        # called once each commit went through, e.g. to keep in-process copies of the data in sync
+        self.after_commit = after_commit
 
     async def __aenter__(self) -> "SQLAlchemyUnitOfWork":
-        self.session = self.session_factory()
+        await self._open(self.session_factory)
+        return self
+
+    async def _open(
+        self, session_factory: async_sessionmaker[AsyncSession], snapshot: Optional[str] = None
+    ) -> None:
+        """
+        Begin a transaction on a new session and bind the repositories to it.
+        With a `snapshot` exported by another transaction, begin a read-only one that sees the same data.
+        """
+        self.opened_with = session_factory
+        self.session = session_factory()
         await self.session.begin()
 
+        if snapshot is not None:
+            assert _SNAPSHOT_PATTERN.match(snapshot), f"Invalid snapshot: {snapshot}"
+            # only repeatable read transactions can import a snapshot, as their first statement
+            await self.session.connection(
+                execution_options={
+                    "isolation_level": "REPEATABLE READ",
+                    "postgresql_readonly": True,
+                }
+            )
+            await self.session.execute(text(f"set transaction snapshot '{snapshot}'"))
+
         self.products = ProductRepository(self.session)
         self.inventory = InventoryRepository(self.session)
         self.sales = SalesRepository(self.session)
 
-        return self
-
     async def __aexit__(
         self,
         exc_type: Optional[Type[BaseException]],
@@ -50,6 +105,37 @@ class SQLAlchemyUnitOfWork(AbstractUnitOfWork):
         assert self.session is not None, "Session not initialized"
         await self.session.commit()
 
+        if self.track_consistency:
+            result = await self.session.execute(text("select pg_current_wal_lsn()::text"))
+            self.consistency_token = result.scalar_one()
+
+        for hook in self.after_commit:
+            await hook(self)
+
+    @asynccontextmanager
+    async def snapshot_readers(
+        self, count: int
+    ) -> AsyncIterator[list["ReadOnlySQLAlchemyUnitOfWork"]]:
+        """
+        `count` read-only units of work, each on its own connection, that see exactly
+        what this transaction sees (bar its own uncommitted writes), so independent
+        reads can run concurrently without mixing up data from different moments
+        """
+        assert self.session is not None, "Session not initialized"
+        result = await self.session.execute(text("select pg_export_snapshot()"))
+        snapshot = result.scalar_one()
+
+        async with AsyncExitStack() as stack:
+            readers = []
+            for _ in range(count):
+                # same server as this transaction, the snapshot only exists there
+                reader = ReadOnlySQLAlchemyUnitOfWork(self.opened_with)
+                stack.push_async_callback(reader.close)
+                readers.append(reader)
+
+            await asyncio.gather(*(r._open(r.session_factory, snapshot) for r in readers))
+            yield readers
+
     async def rollback(self) -> None:
         """Rollback the current transaction"""
         assert self.session is not None, "Session not initialized"
@@ -60,3 +146,102 @@ class SQLAlchemyUnitOfWork(AbstractUnitOfWork):
         if self.session:
             await self.session.close()
             self.session = None
+
+
+class ReadOnlySQLAlchemyUnitOfWork(SQLAlchemyUnitOfWork):
+    """
+    Unit of Work for requests that only read.
+    Transactions are opened READ ONLY, possibly on a replica, and are never committed.
+    """
+
+    # the database's, or the in-process store's that can only be read
+    sales: AbstractSalesReader
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        primary_session_factory: Optional[async_sessionmaker[AsyncSession]] = None,
+        consistency_token: Optional[str] = None,
+        sales_store: Optional["SalesColumns"] = None,
+    ) -> None:
+        # required: a factory made up here would be a new engine (and pool) per unit
+        # of work, that nothing disposes. the lifespan builds the shared read-only ones
+        super().__init__(session_factory)
+
+        # when given, sales are read from this in-process copy instead of the database
+        self.sales_store = sales_store
+
+        # set only when `session_factory` points at a replica, used when
+        # the replica has not caught up with the caller's last write
+        self.primary_session_factory = primary_session_factory
+        self.consistency_token = (
+            consistency_token
+            if consistency_token and _LSN_PATTERN.match(consistency_token)
+            else None
+        )
+
+    async def _open(
+        self, session_factory: async_sessionmaker[AsyncSession], snapshot: Optional[str] = None
+    ) -> None:
+        await super()._open(session_factory, snapshot)
+        if self.sales_store is not None:
+            self.sales = self.sales_store.repository()
+
+    @asynccontextmanager
+    async def snapshot_readers(
+        self, count: int
+    ) -> AsyncIterator[list["ReadOnlySQLAlchemyUnitOfWork"]]:
+        if self.sales_store is not None:
+            # reads come from memory, nothing to gain from more connections
+            yield [self] * count
+            return
+
+        async with super().snapshot_readers(count) as readers:
+            yield readers
+
+    async def __aenter__(self) -> "ReadOnlySQLAlchemyUnitOfWork":
+        await self._open(self.session_factory)
+
+        if (
+            self.primary_session_factory is not None
+            and self.consistency_token is not None
+            and not await self._replica_caught_up()
+        ):
+            # the replica lags too far behind the caller's last write,
+            # read from the primary instead so they see their own writes, and keep
+            # doing so for the rest of the request, so its reads never go back in time
+            await self.close()
+            self.session_factory = self.primary_session_factory
+            self.primary_session_factory = None
+            await self._open(self.session_factory)
+
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        # nothing to persist, closing the session just ends the transaction
+        await self.close()
+
+    async def commit(self) -> None:
+        """Read-only transactions have nothing to commit"""
+
+    async def _replica_caught_up(self) -> bool:
+        """Wait (up to the configured timeout) for the replica to replay the consistency token"""
+        assert self.session is not None, "Session not initialized"
+
+        query = text("select coalesce(pg_last_wal_replay_lsn() >= cast(:token as pg_lsn), true)")
+        deadline = asyncio.get_running_loop().time() + config.db.replica_wait_timeout
+
+        while True:
+            result = await self.session.execute(query, {"token": self.consistency_token})
+            if result.scalar_one():
+                return True
+
+            if asyncio.get_running_loop().time() >= deadline:
+                return False
+
+            await asyncio.sleep(0.02)
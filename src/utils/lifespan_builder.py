@@ -1,7 +1,12 @@
 import asyncio
 from contextlib import asynccontextmanager
+from datetime import timedelta
 
-from src.infra.storage.db import db_url
+from src.infra.config import config
+from src.infra.storage.db import db_url, get_engine, get_session_factory, has_replica, read_only
+from src.services.sales.cache import SalesBucketCache
+from src.services.product.cache import CatalogCache
+from src.infra.storage.catalog_invalidations import PostgresCatalogInvalidations
 from fastapi import FastAPI
 from alembic import command
 from alembic.config import Config
@@ -25,4 +30,73 @@ async def lifespan_builder(app: FastAPI):
     loop = asyncio.get_event_loop()
     await loop.run_in_executor(None, run_migrations)
 
-    yield
+    # one engine (and connection pool) for the whole process,
+    # every request borrows its session from this factory
+    engine = get_engine()
+    app.state.engine = engine
+    app.state.session_factory = get_session_factory(engine)
+
+    # read-only requests go to the replica if there is one, with the
+    # primary kept around for reads that need to see a fresh write
+    replica_engine = get_engine(replica=True) if has_replica() else None
+    if replica_engine is not None:
+        app.state.read_session_factory = get_session_factory(read_only(replica_engine))
+        app.state.primary_read_session_factory = get_session_factory(read_only(engine))
+    else:
+        app.state.read_session_factory = get_session_factory(read_only(engine))
+
+    # optional in-process copy of the sales, kept up to date by every commit
+    app.state.after_commit = []
+    if config.analytics.sales_in_memory:
+        # numpy is only needed when this is on
+        from src.infra.storage.repositories.columnar.sales import SalesColumns
+
+        async with app.state.session_factory() as session:
+            app.state.sales_store = await SalesColumns.load(session, config.db.stream_batch_size)
+        app.state.after_commit.append(app.state.sales_store.record_committed)
+
+    # buckets of the sales comparisons, the committed sales drop the ones they land in
+    if config.analytics.compare_cache_size:
+        app.state.sales_cache = SalesBucketCache(
+            config.analytics.compare_cache_size,
+            timedelta(seconds=config.analytics.compare_cache_settle),
+        )
+        app.state.after_commit.append(app.state.sales_cache.record_committed)
+
+    # products and categories, dropped by the commits that change them, also
+    # those of the other processes when they are told through postgres
+    if config.catalog.cache_size:
+        app.state.catalog_cache = CatalogCache(
+            config.catalog.cache_size,
+            timedelta(seconds=config.catalog.cache_ttl),
+            (
+                PostgresCatalogInvalidations(engine)
+                if config.catalog.cache_backend == "postgres"
+                else None
+            ),
+        )
+        await app.state.catalog_cache.start()
+        app.state.after_commit.append(app.state.catalog_cache.record_committed)
+
+    try:
+        yield
+    finally:
+        if hasattr(app.state, "catalog_cache"):
+            await app.state.catalog_cache.stop()
+
+        await engine.dispose()
+        if replica_engine is not None:
+            await replica_engine.dispose()
+
+        for name in (
+            "sales_store",
+            "sales_cache",
+            "catalog_cache",
+            "after_commit",
+            "primary_read_session_factory",
+            "read_session_factory",
+            "session_factory",
+            "engine",
+        ):
+            if hasattr(app.state, name):
+                delattr(app.state, name)
@@ -137,4 +137,66 @@ def test_low_stock_alerts(database_creation, client: TestClient):
     resp = client.get("/inventory/low-stock-alerts?threshold=10")
     assert resp.status_code == 200
     low_stock_items = resp.json()
-    assert any(item["product_id"] == product["id"] for item in low_stock_items)
\ No newline at end of file
+    assert any(item["product_id"] == product["id"] for item in low_stock_items)
+
+
+def test_batch_inventory_update(database_creation, client: TestClient):
+    resp = client.post(
+        "/categories",
+        json={
+            "name": "Electronics",
+            "description": "Devices and gadgets",
+        },
+    )
+    cat = resp.json()
+
+    products = []
+    for name in ("Smartphone", "Laptop"):
+        resp = client.post(
+            "/products",
+            json={
+                "name": name,
+                "category_id": cat["id"],
+                "description": "",
+                "price": 1.0,
+            },
+        )
+        products.append(resp.json())
+
+    resp = client.post(
+        "/inventory/update/batch",
+        json=[
+            {"product_id": products[0]["id"], "quantity": 20},
+            {"product_id": products[1]["id"], "quantity": 7},
+            {"product_id": "not-a-product", "quantity": 1},
+            {"product_id": products[0]["id"], "quantity": -5},
+        ],
+    )
+    assert resp.status_code == 200
+    results = resp.json()
+
+    assert [r["status"] for r in results] == ["applied", "applied", "not_found", "applied"]
+    assert results[0]["current_quantity"] == 15
+    assert results[1]["current_quantity"] == 7
+
+    resp = client.get(f"/inventory/current/{products[0]['id']}")
+    assert resp.json()["quantity"] == 15
+
+
+def test_current_inventory_answers_conditional_gets(database_creation, client: TestClient):
+    cat = client.post("/categories", json={"name": "Etag", "description": ""}).json()
+    product = client.post(
+        "/products",
+        json={"name": "p", "category_id": cat["id"], "description": "", "price": 1.0},
+    ).json()
+
+    etag = client.get("/inventory/current").headers["ETag"]
+    assert client.get("/inventory/current", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/inventory/update", json={"product_id": product["id"], "quantity": 5})
+    resp = client.get("/inventory/current", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert [item["quantity"] for item in resp.json()] == [5]
+
+    etag = resp.headers["ETag"]
+    assert client.get("/inventory/current", headers={"If-None-Match": etag}).status_code == 304
@@ -113,3 +113,138 @@ def test_products_endpoints(database_creation, client: TestClient):
     resp = client.get(f"/products/{id}")
     assert resp.status_code == 404
     assert resp.json() == {"status": "error", "message": "Product not found"}
+
+
+def test_categories_pagination(database_creation, client: TestClient):
+    created = [
+        client.post("/categories", json={"name": f"Cat {i}", "description": ""}).json()
+        for i in range(3)
+    ]
+
+    resp = client.get("/categories", params={"limit": 2})
+    assert resp.status_code == 200
+    first = resp.json()
+    assert len(first["items"]) == 2
+    assert first["next_cursor"]
+
+    resp = client.get("/categories", params={"limit": 2, "cursor": first["next_cursor"]})
+    assert resp.status_code == 200
+    second = resp.json()
+    assert len(second["items"]) == 1
+    assert second["next_cursor"] is None
+
+    ids = [c["id"] for c in first["items"] + second["items"]]
+    assert ids == sorted(c["id"] for c in created)
+
+    resp = client.get("/categories", params={"cursor": "garbage"})
+    assert resp.status_code == 400
+
+
+def test_lists_answer_conditional_gets(database_creation, client: TestClient):
+    resp = client.get("/categories/")
+    etag = resp.headers["ETag"]
+
+    resp = client.get("/categories/", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == etag
+    assert resp.content == b""
+
+    cat = client.post("/categories", json={"name": "Etag", "description": ""}).json()
+    resp = client.get("/categories/", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert [c["id"] for c in resp.json()] == [cat["id"]]
+
+    # products have their own version, weak tags and lists of tags match too
+    etag = client.get("/products/").headers["ETag"]
+    resp = client.get("/products/", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert resp.status_code == 304
+
+    client.post(
+        "/products",
+        json={"name": "p", "category_id": cat["id"], "description": "", "price": 1.0},
+    )
+    resp = client.get("/products/", params={"limit": 10}, headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert len(resp.json()["items"]) == 1
+
+
+def test_search_products(database_creation, client: TestClient):
+    cat = client.post("/categories", json={"name": "Search", "description": ""}).json()
+    for name in ("Blue mug", "Blue bottle", "Red mug"):
+        client.post(
+            "/products",
+            json={"name": name, "category_id": cat["id"], "description": "", "price": 1.0},
+        )
+
+    resp = client.get("/products/search", params={"q": "blue", "limit": 1})
+    assert resp.status_code == 200
+    first = resp.json()
+    assert len(first["items"]) == 1 and first["next_cursor"]
+
+    resp = client.get("/products/search", params={"q": "blue", "cursor": first["next_cursor"]})
+    second = resp.json()
+    assert second["next_cursor"] is None
+    assert {p["name"] for p in first["items"] + second["items"]} == {"Blue mug", "Blue bottle"}
+
+    resp = client.get("/products/search", params={"q": "mug bl"})
+    assert [p["name"] for p in resp.json()["items"]] == ["Blue mug"]
+
+    assert client.get("/products/search").status_code == 422
+    assert client.get("/products/search", params={"q": "x", "cursor": "nope"}).status_code == 400
+
+
+def test_bulk_products(database_creation, client: TestClient):
+    cat = client.post("/categories", json={"name": "Bulk", "description": ""}).json()
+
+    def item(name: str, **fields) -> dict:
+        return {"name": name, "category_id": cat["id"], "description": "", "price": 1.0, **fields}
+
+    resp = client.post(
+        "/products/bulk",
+        json=[item("Mug"), item("Bottle", price="free"), item("Lamp", category_id="nope")],
+    )
+    assert resp.status_code == 200
+    created, invalid, unknown = resp.json()
+    assert created["status"] == "created"
+    assert invalid == {"id": None, "status": "invalid", "error": invalid["error"]}
+    assert invalid["error"].startswith("price:")
+    assert unknown["status"] == "unknown_category"
+
+    new_id = "0b0c8f7e-1a2b-4c3d-8e9f-000000000001"
+    resp = client.put(
+        "/products/bulk",
+        json=[item("Blue mug", id=created["id"]), item("Cable", id=new_id), item("No id")],
+    )
+    assert [(r["id"], r["status"]) for r in resp.json()] == [
+        (created["id"], "updated"),
+        (new_id, "created"),
+        (None, "invalid"),
+    ]
+    assert client.get(f"/products/{created['id']}").json()["name"] == "Blue mug"
+
+    assert client.post("/products/bulk", json={"name": "Mug"}).status_code == 422
+    assert client.put("/products/bulk", content=b"[{").status_code == 422
+
+
+def test_get_products_by_ids(database_creation, client: TestClient):
+    cat = client.post("/categories", json={"name": "Many", "description": ""}).json()
+    created = [
+        client.post(
+            "/products",
+            json={"name": name, "category_id": cat["id"], "description": "", "price": 1.0},
+        ).json()
+        for name in ("Mug", "Lamp", "Desk")
+    ]
+    ids = [created[2]["id"], "not-a-uuid", created[0]["id"]]
+
+    resp = client.get("/products", params={"ids": ",".join(ids)})
+    assert resp.status_code == 200
+    assert [p["name"] for p in resp.json()] == ["Desk", "Mug"]
+
+    resp = client.post("/products/by-ids", json={"ids": ids})
+    assert [p["name"] for p in resp.json()] == ["Desk", "Mug"]
+
+    too_many = ",".join(created[0]["id"] for _ in range(1001))
+    assert client.get("/products", params={"ids": too_many}).status_code == 422
+    assert client.post("/products/by-ids", json={"ids": ["x"] * 1001}).status_code == 422
@@ -1,4 +1,6 @@
 # tests/test_sales_api.py
+import json
+import uuid
 import pytest
 from unittest.mock import patch
 from datetime import datetime, timedelta, timezone
@@ -163,3 +165,169 @@ def test_compare_sales(database_creation, client: TestClient, seed_product):
 
     assert comparison[0]["first_total"] == pytest.approx(seed_product["price"] * 5)
     assert comparison[0]["second_total"] == pytest.approx(seed_product["price"] * 7)
+
+
+def test_compare_periods(database_creation, client: TestClient, seed_product):
+    now = datetime.now(timezone.utc)
+    starts = [now - timedelta(weeks=weeks, minutes=30) for weeks in (0, 1, 2)]
+
+    for weeks, quantity in ((0, 3), (2, 1)):
+        with patch("src.domain.sales.models.datetime") as mock_datetime:
+            mock_datetime.now.return_value = now - timedelta(weeks=weeks)
+            client.post(
+                "/sales/",
+                json={
+                    "product_id": seed_product["id"],
+                    "quantity": quantity,
+                    "total_price": seed_product["price"] * quantity,
+                },
+            )
+
+    resp = client.post(
+        "/sales/compare/periods",
+        json={
+            "periods": [
+                {"start": start.isoformat(), "end": (start + timedelta(hours=1)).isoformat()}
+                for start in starts
+            ],
+            "product_id": seed_product["id"],
+        },
+    )
+    assert resp.status_code == 200
+
+    comparison = resp.json()
+    assert len(comparison) == 1
+    assert comparison[0]["totals"] == pytest.approx(
+        [seed_product["price"] * 3, 0, seed_product["price"]]
+    )
+
+    resp = client.post(
+        "/sales/compare/periods",
+        json={
+            "periods": [
+                {"start": starts[0].isoformat(), "end": now.isoformat()},
+                {"start": starts[1].isoformat(), "end": starts[0].isoformat()},
+            ]
+        },
+    )
+    assert resp.status_code == 422
+
+
+def test_summarize_sales(database_creation, client: TestClient, seed_product):
+    for quantity in (1, 2, 3):
+        client.post(
+            "/sales/",
+            json={
+                "product_id": seed_product["id"],
+                "quantity": quantity,
+                "total_price": seed_product["price"] * quantity,
+            },
+        )
+
+    resp = client.get("/sales/summary", params={"product_id": seed_product["id"]})
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "count": 3,
+        "quantity": 6,
+        "total_price": pytest.approx(seed_product["price"] * 6),
+    }
+
+    resp = client.get("/sales/summary", params={"category_id": str(uuid.uuid4())})
+    assert resp.json() == {"count": 0, "quantity": 0, "total_price": 0.0}
+
+
+def test_top_sales(database_creation, client: TestClient, seed_product):
+    for quantity in (1, 2, 3):
+        client.post(
+            "/sales/",
+            json={
+                "product_id": seed_product["id"],
+                "quantity": quantity,
+                "total_price": seed_product["price"] * quantity,
+            },
+        )
+
+    resp = client.get("/sales/top", params={"metric": "quantity", "n": 5})
+    assert resp.status_code == 200
+    assert resp.json() == [
+        {
+            "id": seed_product["id"],
+            "total_price": pytest.approx(seed_product["price"] * 6),
+            "quantity": 6,
+            "count": 3,
+        }
+    ]
+
+    resp = client.get("/sales/top", params={"group_by": "category"})
+    assert [t["id"] for t in resp.json()] == [seed_product["category_id"]]
+
+    assert client.get("/sales/top", params={"n": 0}).status_code == 422
+
+
+def test_stream_sales_as_ndjson(database_creation, client: TestClient, seed_product):
+    for quantity in (1, 2, 3):
+        client.post(
+            "/sales/",
+            json={
+                "product_id": seed_product["id"],
+                "quantity": quantity,
+                "total_price": seed_product["price"] * quantity,
+            },
+        )
+
+    resp = client.get(
+        "/sales/between-dates",
+        params={"product_id": seed_product["id"]},
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+
+    sales = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(s["quantity"] for s in sales) == [1, 2, 3]
+    assert all(s["product_id"] == seed_product["id"] for s in sales)
+
+
+def test_ingest_sales_as_ndjson_and_csv(database_creation, client: TestClient, seed_product):
+    ndjson = "\n".join(
+        [
+            json.dumps({"product_id": seed_product["id"], "quantity": 1, "total_price": 42.0}),
+            json.dumps({"product_id": seed_product["id"], "quantity": -1, "total_price": 42.0}),
+        ]
+    )
+    resp = client.post(
+        "/sales/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "accepted": 1,
+        "rejected": 1,
+        "errors": [{"line": 2, "message": "quantity must be positive"}],
+    }
+
+    csv = (
+        "product_id,quantity,total_price,created_at\n"
+        f"{seed_product['id']},2,84.0,2025-03-01T10:00:00Z\n"
+        f"{seed_product['id']},3,126.0,\n"
+    )
+    resp = client.post("/sales/bulk", content=csv, headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 200
+    assert resp.json()["accepted"] == 2
+
+    resp = client.get("/sales/between-dates", params={"product_id": seed_product["id"]})
+    assert sorted(s["quantity"] for s in resp.json()) == [1, 2, 3]
+
+    # sending an export with ids again records nothing twice
+    sale = {"id": resp.json()[0]["id"], "created_at": resp.json()[0]["created_at"]}
+    replay = json.dumps(
+        {**sale, "product_id": seed_product["id"], "quantity": 1, "total_price": 1.0}
+    )
+    resp = client.post(
+        "/sales/bulk", content=replay, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "accepted": 0,
+        "rejected": 1,
+        "errors": [{"line": 1, "message": f"sale {sale['id']} already recorded"}],
+    }
@@ -4,11 +4,13 @@ from typing import AsyncGenerator
 
 import asyncpg
 import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from testcontainers.postgres import PostgresContainer
 from alembic.config import Config
 from alembic import command
 
 from src.infra.config import config
+from src.infra.storage.db import get_engine, get_session_factory, read_only
 
 
 def _parse_db_url(db_url: str) -> dict[str, str | int | None]:
@@ -60,8 +62,23 @@ async def template_database_creation(postgres_container: PostgresContainer) -> s
     cfg.set_main_option("script_location", "src/infra/storage/migrations")
     cfg.set_main_option("sqlalchemy.url", target_db_url)
 
-    # Update the db till the point where there are no seeds added in the DB
-    command.upgrade(cfg, "d51666f213fe")
+    # Bring the db to the latest schema, then empty the tables the seed migration filled
+    command.upgrade(cfg, "head")
+
+    template_connection: asyncpg.Connection = await asyncpg.connect(**_parse_db_url(target_db_url))
+    try:
+        tables = await template_connection.fetch("""
+                select tablename
+                from pg_tables
+                where schemaname = 'public'
+                    and tablename <> 'alembic_version'
+                ;
+            """)
+        await template_connection.execute(
+            f"TRUNCATE {', '.join(table['tablename'] for table in tables)} CASCADE;"
+        )
+    finally:
+        await template_connection.close()
 
     return target_db_url
 
@@ -111,3 +128,17 @@ async def database_creation(
             await admin_connection.execute(f"DROP DATABASE IF EXISTS {db_name};")
         finally:
             await admin_connection.close()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def read_session_factory(
+    database_creation: str,
+) -> AsyncGenerator[async_sessionmaker[AsyncSession], None]:
+    """
+    Read-only session factory on the test DB, like the one the lifespan shares.
+    """
+    engine = get_engine()
+    try:
+        yield get_session_factory(read_only(engine))
+    finally:
+        await engine.dispose()
@@ -0,0 +1,141 @@
+import uuid
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.domain.product.models import Product, ProductCategory
+from src.domain.sales.models import Sale
+from src.infra.storage.repositories.columnar.sales import SalesColumns
+from src.infra.storage.repositories.inmemory.sales import SalesRepository as InMemorySales
+from src.uow.sqlalchemy import ReadOnlySQLAlchemyUnitOfWork, SQLAlchemyUnitOfWork
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_columnar_sales_match_the_inmemory_repository():
+    """
+    Same answers as the plain in-memory repository, even when sales are appended out of order.
+    """
+    rng = random.Random(7)
+    products = {f"{i:032x}": f"cat-{i % 3}" for i in range(1, 7)}
+    sales = [
+        Sale(
+            id=str(uuid.UUID(int=rng.getrandbits(128))),
+            product_id=str(uuid.UUID(rng.choice(list(products)))),
+            quantity=rng.randint(1, 5),
+            total_price=float(rng.randint(1, 100)),
+            # a few share a timestamp, to exercise the (created_at, id) order
+            created_at=START + timedelta(hours=rng.randint(0, 24 * 30)),
+        )
+        for _ in range(500)
+    ]
+
+    store = SalesColumns(capacity=16)
+    store.product_categories.update({str(uuid.UUID(p)): c for p, c in products.items()})
+    store.append(sales[:300])
+    store.append(sales[300:])
+    columnar = store.repository()
+
+    reference = InMemorySales()
+    for product_id, category_id in store.product_categories.items():
+        await reference.add_product(Product(product_id, "p", category_id, "", 1.0))
+    for sale in sales:
+        await reference.add_sale(sale)
+
+    start, end = START + timedelta(days=3, hours=5), START + timedelta(days=20)
+    product_id = sales[0].product_id
+
+    for granularity in ("day", "week", "month"):
+        assert await columnar.aggregate_sales(start, end, granularity) == (
+            await reference.aggregate_sales(start, end, granularity)
+        )
+    assert await columnar.aggregate_sales(start, end, category_id="cat-1") == (
+        await reference.aggregate_sales(start, end, category_id="cat-1")
+    )
+
+    assert await columnar.get_sales_between_dates(start, end, product_id, limit=1000) == (
+        await reference.get_sales_between_dates(start, end, product_id, limit=1000)
+    )
+
+    for metric in ("revenue", "quantity", "count"):
+        for group_by in ("product", "category"):
+            assert await columnar.top_sales(start, end, metric, 4, group_by) == (
+                await reference.top_sales(start, end, metric, 4, group_by)
+            )
+    assert await columnar.top_sales(start, end, category_id="cat-2") == (
+        await reference.top_sales(start, end, category_id="cat-2")
+    )
+
+    for filters in ({}, {"product_id": product_id}, {"category_id": "cat-0"}):
+        assert await columnar.summarize_sales(start, end, **filters) == (
+            await reference.summarize_sales(start, end, **filters)
+        )
+
+    first = await columnar.get_sales_between_dates(start, end, limit=10)
+    after = (first[-1].created_at, first[-1].id)
+    assert await columnar.get_sales_between_dates(start, end, limit=10, after=after) == (
+        await reference.get_sales_between_dates(start, end, limit=10, after=after)
+    )
+
+
+@pytest.mark.asyncio
+async def test_columnar_sales_follow_commits(read_session_factory):
+    """
+    Loaded from the database, then kept up to date by the after-commit hook.
+    """
+    cat = ProductCategory(id=str(uuid.uuid4()), name="c", description=None)
+    old = Product(id=str(uuid.uuid4()), name="old", category_id=cat.id, description="", price=1.0)
+    new = Product(id=str(uuid.uuid4()), name="new", category_id=cat.id, description="", price=1.0)
+    now = datetime.now(timezone.utc)
+
+    async with SQLAlchemyUnitOfWork() as uow:
+        await uow.products.add_category(cat)
+        await uow.products.create_product(old)
+    async with SQLAlchemyUnitOfWork() as uow:
+        await uow.sales.add_sale(Sale(str(uuid.uuid4()), old.id, 1, 10.0, now - timedelta(days=1)))
+
+    async with SQLAlchemyUnitOfWork() as uow:
+        store = await SalesColumns.load(uow.session, batch_size=2)
+    assert store.size == 1
+
+    # a product the store hasn't seen yet, its sales come back with their category
+    async with SQLAlchemyUnitOfWork(after_commit=[store.record_committed]) as uow:
+        await uow.products.create_product(new)
+        await uow.sales.add_sale(Sale(str(uuid.uuid4()), new.id, 2, 20.0, now))
+
+    # rolled back, never recorded
+    with pytest.raises(RuntimeError):
+        async with SQLAlchemyUnitOfWork(after_commit=[store.record_committed]) as uow:
+            await uow.sales.add_sale(Sale(str(uuid.uuid4()), new.id, 3, 30.0, now))
+            raise RuntimeError
+
+    async with ReadOnlySQLAlchemyUnitOfWork(read_session_factory, sales_store=store) as read_uow:
+        from_memory = await read_uow.sales.get_sales_between_dates(category_id=cat.id)
+    async with ReadOnlySQLAlchemyUnitOfWork(read_session_factory) as read_uow:
+        from_db = await read_uow.sales.get_sales_between_dates(category_id=cat.id, limit=10)
+
+    assert from_memory == from_db
+    assert [s.total_price for s in from_memory] == [10.0, 20.0]
+
+    # moving a product moves its sales in the store too
+    other = ProductCategory(id=str(uuid.uuid4()), name="other", description=None)
+    async with SQLAlchemyUnitOfWork() as uow:
+        await uow.products.add_category(other)
+    async with SQLAlchemyUnitOfWork(after_commit=[store.record_committed]) as uow:
+        await uow.sales.set_product_category(new.id, other.id)
+
+    async with ReadOnlySQLAlchemyUnitOfWork(read_session_factory, sales_store=store) as read_uow:
+        moved = await read_uow.sales.get_sales_between_dates(category_id=other.id)
+    assert [(s.product_id, s.category_id) for s in moved] == [(new.id, other.id)]
+
+    # deleting a product deletes its sales, in the store too
+    async with SQLAlchemyUnitOfWork(after_commit=[store.record_committed]) as uow:
+        await uow.products.delete_product(new.id)
+
+    async with ReadOnlySQLAlchemyUnitOfWork(read_session_factory, sales_store=store) as read_uow:
+        assert await read_uow.sales.get_sales_between_dates(category_id=other.id) == []
+        remaining = await read_uow.sales.get_sales_between_dates()
+    assert [(s.product_id, s.total_price) for s in remaining] == [(old.id, 10.0)]
+    assert store.size == 1
@@ -143,3 +143,68 @@ async def test_low_stock_alerts():
     assert len(low) == 1
     assert low[0].product_id == p1
     assert low[0].quantity == 2
+
+
+@pytest.mark.asyncio
+async def test_add_inventory_updates_in_batch():
+    """
+    A batch accumulates per product and returns one item per product, ordered by ID.
+    """
+    uow = InMemoryUnitOfWork()
+    first, second = sorted(str(uuid.uuid4()) for _ in range(2))
+
+    async with uow:
+        items = await uow.inventory.add_inventory_updates(
+            [
+                InventoryUpdate.create(second, 5),
+                InventoryUpdate.create(first, 10),
+                InventoryUpdate.create(second, -2),
+            ]
+        )
+
+    assert items == [
+        InventoryItem(product_id=first, quantity=10),
+        InventoryItem(product_id=second, quantity=3),
+    ]
+    assert len(uow.inventory.inventory_updates) == 3
+
+
+@pytest.mark.asyncio
+async def test_low_stock_follows_quantity_changes():
+    """
+    Items move in and out of the low stock alerts as their quantity changes,
+    lowest quantity first.
+    """
+    uow = InMemoryUnitOfWork()
+
+    async with uow:
+        await uow.inventory.add_inventory_updates(
+            [
+                InventoryUpdate.create("a", 3),
+                InventoryUpdate.create("b", 20),
+                InventoryUpdate.create("c", 8),
+            ]
+        )
+        await uow.inventory.add_inventory_update(InventoryUpdate.create("a", 30))
+        await uow.inventory.add_inventory_update(InventoryUpdate.create("b", -19))
+        low = await uow.inventory.low_stock_alerts(threshold=10)
+
+    assert [(item.product_id, item.quantity) for item in low] == [("b", 1), ("c", 8)]
+
+
+@pytest.mark.asyncio
+async def test_list_inventory_by_pages():
+    uow = InMemoryUnitOfWork()
+    now = datetime.now(timezone.utc)
+
+    async with uow:
+        for product_id, quantity in (("c", 1), ("a", 2), ("b", 3), ("a", 4)):
+            await uow.inventory.add_inventory_update(
+                InventoryUpdate(str(uuid.uuid4()), product_id, quantity, now)
+            )
+
+        first = await uow.inventory.list(limit=2)
+        rest = await uow.inventory.list(limit=2, after=first[-1].product_id)
+
+    assert first == [InventoryItem("a", 6), InventoryItem("b", 3)]
+    assert rest == [InventoryItem("c", 1)]
@@ -182,3 +182,85 @@ async def test_delete_product():
     async with uow:
         gone = await uow.products.get_product(prod.id)
     assert gone is None
+
+
+@pytest.mark.asyncio
+async def test_paginate_products():
+    uow = InMemoryUnitOfWork()
+    prods = [
+        Product(id=str(i), name=f"P{i}", category_id="c", description="", price=1.0)
+        for i in (3, 1, 2)
+    ]
+    async with uow:
+        for p in prods:
+            await uow.products.create_product(p)
+
+    async with uow:
+        first = await uow.products.get_products(limit=2)
+        rest = await uow.products.get_products(limit=2, after=first[-1].id)
+
+    assert [p.id for p in first] == ["1", "2"]
+    assert [p.id for p in rest] == ["3"]
+
+    # the sorted ids follow the writes, and `after` needn't be one of them
+    async with uow:
+        await uow.products.update_product(
+            Product(id="2", name="Q2", category_id="c", description="", price=1.0)
+        )
+        await uow.products.delete_product("1")
+        await uow.products.create_product(
+            Product(id="0", name="P0", category_id="c", description="", price=1.0)
+        )
+        await uow.products.add_category(ProductCategory(id="b", name="b", description=None))
+        await uow.products.add_category(ProductCategory(id="a", name="a", description=None))
+
+        pages = [
+            await uow.products.get_products(limit=2, after="0"),
+            await uow.products.get_products(after="15"),
+            await uow.products.get_categories(limit=1, after="a"),
+        ]
+
+    assert [[item.name for item in page] for page in pages] == [["Q2", "P3"], ["Q2", "P3"], ["b"]]
+
+
+@pytest.mark.asyncio
+async def test_search_products_with_the_inverted_index():
+    uow = InMemoryUnitOfWork()
+
+    def product(name: str, description: str) -> Product:
+        return Product(str(uuid.uuid4()), name, None, description, 1.0)
+
+    phone = product("Smartphone X", "a phone with a great camera")
+    camera = product("Camera Pro", "mirrorless")
+    case = product("Phone case", "fits the Smartphone X")
+    async with uow:
+        for p in (phone, camera, case):
+            await uow.products.create_product(p)
+
+    async def names(query: str, limit: int = 10, after=None) -> list[str]:
+        async with uow:
+            matches = await uow.products.search_products(query, limit, after)
+        return [m.product.name for m in matches]
+
+    # name matches rank above description ones, words match as prefixes
+    assert await names("camera") == ["Camera Pro", "Smartphone X"]
+    assert await names("smart") == ["Smartphone X", "Phone case"]
+    # every word has to match
+    assert await names("phone camera") == ["Smartphone X"]
+    # typos still find the name
+    assert await names("smartphnoe") == ["Smartphone X"]
+    assert await names("!!") == []
+
+    # pages follow each other by (score, id)
+    async with uow:
+        first = await uow.products.search_products("smart", 1)
+    assert await names("smart", 10, (first[0].score, first[0].product.id)) == ["Phone case"]
+
+    # the index follows updates and deletes
+    async with uow:
+        await uow.products.update_product(Product(camera.id, "Lens", None, "", 1.0))
+        await uow.products.delete_product(case.id)
+    assert await names("camera") == ["Smartphone X"]
+    assert await names("lens") == ["Lens"]
+    assert await names("case") == []
+    assert "mirrorless" not in uow.products.terms
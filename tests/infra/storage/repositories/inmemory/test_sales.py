@@ -1,11 +1,12 @@
 # tests/infra/storage/repositories/test_sales.py
 import uuid
+from dataclasses import replace
 from datetime import datetime, timedelta, timezone
 
 import pytest
 
 from src.domain.product.models import Product, ProductCategory
-from src.domain.sales.models import Sale
+from src.domain.sales.models import Sale, SalesBucket, SalesTotal
 from src.uow.inmemory import InMemoryUnitOfWork
 
 
@@ -185,3 +186,115 @@ async def test_get_sales_by_category(database_creation):
     assert len(out) == 1
     assert out[0].id == s1.id
     assert out[0].product_id == p1.id
+
+
+@pytest.mark.asyncio
+async def test_aggregate_sales_by_day():
+    """
+    Sales are totalled in day-wide buckets counted from the start of the range.
+    """
+    uow = InMemoryUnitOfWork()
+    start = datetime(2025, 3, 1, 6, tzinfo=timezone.utc)
+
+    sales = [
+        Sale(str(uuid.uuid4()), "p1", 1, 10.0, start + timedelta(hours=1)),
+        Sale(str(uuid.uuid4()), "p1", 2, 20.0, start + timedelta(hours=23)),
+        Sale(str(uuid.uuid4()), "p1", 3, 30.0, start + timedelta(days=2)),
+        Sale(str(uuid.uuid4()), "p2", 4, 40.0, start + timedelta(hours=2)),
+    ]
+
+    async with uow:
+        for sale in sales:
+            await uow.sales.add_sale(sale)
+
+    async with uow:
+        buckets = await uow.sales.aggregate_sales(
+            start, start + timedelta(days=3), "day", product_id="p1"
+        )
+
+    assert buckets == [
+        SalesBucket(start=start, total_price=30.0, quantity=3, count=2),
+        SalesBucket(start=start + timedelta(days=2), total_price=30.0, quantity=3, count=1),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sales_indexes_follow_inserts_and_recategorization():
+    """
+    Sales added out of order come back sorted, filtered through the product and
+    category indexes, and a product moved to another category takes its sales along.
+    """
+    uow = InMemoryUnitOfWork()
+    first, second = ProductCategory.create("a", "first"), ProductCategory.create("b", "second")
+    products = [Product.create(f"p{i}", first.id, "desc", 1.0) for i in range(3)]
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    sales = [
+        Sale(
+            id=str(uuid.uuid4()),
+            product_id=products[i % 3].id,
+            quantity=1,
+            total_price=1.0,
+            created_at=start + timedelta(hours=i),
+        )
+        for i in range(12)
+    ]
+
+    async with uow:
+        for product in products:
+            await uow.sales.add_product(product)
+        for sale in reversed(sales):
+            await uow.sales.add_sale(sale)
+
+        window = await uow.sales.get_sales_between_dates(
+            start + timedelta(hours=2), start + timedelta(hours=9), category_id=first.id
+        )
+        assert window == sales[2:10]
+
+        page = await uow.sales.get_sales_between_dates(
+            category_id=first.id, limit=3, after=(sales[4].created_at, sales[4].id)
+        )
+        assert page == sales[5:8]
+
+        await uow.sales.add_product(replace(products[0], category_id=second.id))
+        moved = await uow.sales.get_sales_between_dates(category_id=second.id)
+        stayed = await uow.sales.get_sales_between_dates(category_id=first.id)
+        by_product = await uow.sales.get_sales_between_dates(
+            product_id=products[1].id, category_id=second.id
+        )
+
+    assert moved == sales[0::3]
+    assert stayed == [s for s in sales if s.product_id != products[0].id]
+    assert by_product == []
+
+
+@pytest.mark.asyncio
+async def test_top_sales():
+    """
+    Products and categories ranked by each metric, ties broken by id.
+    """
+    uow = InMemoryUnitOfWork()
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    async with uow:
+        for product_id, category_id in (("a", "x"), ("b", "x"), ("c", "y"), ("d", "y")):
+            await uow.sales.add_product(Product(product_id, product_id, category_id, "", 1.0))
+
+        for hour, (product_id, quantity, price) in enumerate(
+            [("a", 1, 50.0), ("b", 5, 10.0), ("b", 1, 10.0), ("c", 2, 30.0), ("d", 6, 5.0)]
+        ):
+            sale = Sale(
+                str(uuid.uuid4()), product_id, quantity, price, start + timedelta(hours=hour)
+            )
+            await uow.sales.add_sale(sale)
+
+        by_revenue = await uow.sales.top_sales(metric="revenue", n=2)
+        by_quantity = await uow.sales.top_sales(metric="quantity", n=3)
+        by_count = await uow.sales.top_sales(start + timedelta(hours=1), metric="count", n=10)
+        categories = await uow.sales.top_sales(group_by="category", category_id="y")
+
+    assert by_revenue == [SalesTotal("a", 50.0, 1, 1), SalesTotal("c", 30.0, 2, 1)]
+    assert [t.id for t in by_quantity] == ["b", "d", "c"]
+    # b has two sales, c and d tie on one
+    assert [(t.id, t.count) for t in by_count] == [("b", 2), ("c", 1), ("d", 1)]
+    assert categories == [SalesTotal("y", 35.0, 8, 2)]
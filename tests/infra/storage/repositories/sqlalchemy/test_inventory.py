@@ -1,9 +1,11 @@
 import uuid
+import asyncio
 from datetime import datetime, timedelta, timezone
 
 import pytest
 
 from src.domain.inventory.models import InventoryItem, InventoryUpdate
+from src.infra.storage.db import get_engine, get_session_factory
 from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
 
 
@@ -143,3 +145,75 @@ async def test_low_stock_alerts(database_creation):
     assert len(low) == 1
     assert low[0].product_id == p1
     assert low[0].quantity == 2
+
+
+@pytest.mark.asyncio
+async def test_add_inventory_update_returns_item(database_creation):
+    """
+    The update hands back the resulting tally without a second lookup.
+    """
+    uow = SQLAlchemyUnitOfWork()
+    product_id = str(uuid.uuid4())
+
+    async with uow:
+        first = await uow.inventory.add_inventory_update(InventoryUpdate.create(product_id, 10))
+        second = await uow.inventory.add_inventory_update(InventoryUpdate.create(product_id, -3))
+
+    assert first == InventoryItem(product_id=product_id, quantity=10)
+    assert second == InventoryItem(product_id=product_id, quantity=7)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_inventory_updates_are_not_lost(database_creation):
+    """
+    Hundreds of parallel updates to the same product, each in its own
+    transaction, must add up to the exact total.
+    """
+    engine = get_engine()
+    session_factory = get_session_factory(engine)
+    product_id = str(uuid.uuid4())
+    quantities = [i % 7 - 2 for i in range(300)]
+
+    async def apply(quantity: int) -> None:
+        async with SQLAlchemyUnitOfWork(session_factory) as uow:
+            await uow.inventory.add_inventory_update(InventoryUpdate.create(product_id, quantity))
+
+    try:
+        await asyncio.gather(*(apply(quantity) for quantity in quantities))
+
+        async with SQLAlchemyUnitOfWork(session_factory) as uow:
+            item = await uow.inventory.get_by_product(product_id)
+    finally:
+        await engine.dispose()
+
+    assert item is not None
+    assert item.quantity == sum(quantities)
+
+
+@pytest.mark.asyncio
+async def test_add_inventory_updates_in_batch(database_creation):
+    """
+    A batch writes every ledger row and one aggregated tally per product, ordered by ID.
+    """
+    uow = SQLAlchemyUnitOfWork()
+    first, second = sorted(str(uuid.uuid4()) for _ in range(2))
+
+    async with uow:
+        await uow.inventory.add_inventory_update(InventoryUpdate.create(second, 1))
+
+    async with uow:
+        items = await uow.inventory.add_inventory_updates(
+            [
+                InventoryUpdate.create(second, 5),
+                InventoryUpdate.create(first, 10),
+                InventoryUpdate.create(second, -2),
+            ]
+        )
+
+    assert items == [
+        InventoryItem(product_id=first, quantity=10),
+        InventoryItem(product_id=second, quantity=4),
+    ]
+
+    async with uow:
+        assert (await uow.inventory.get_by_product(second)).quantity == 4
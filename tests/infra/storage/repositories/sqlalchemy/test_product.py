@@ -1,5 +1,6 @@
 import uuid
 import pytest
+from sqlalchemy import text
 
 from src.domain.product.models import Product, ProductCategory
 from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
@@ -182,3 +183,135 @@ async def test_delete_product(database_creation):
     async with uow:
         gone = await uow.products.get_product(prod.id)
     assert gone is None
+
+
+@pytest.mark.asyncio
+async def test_versions_follow_every_write(database_creation):
+    uow = SQLAlchemyUnitOfWork()
+    cat = ProductCategory(id=str(uuid.uuid4()), name="Versioned", description=None)
+    prod = Product(id=str(uuid.uuid4()), name="v", category_id=cat.id, description="", price=1.0)
+
+    async def versions() -> tuple[int, int, int]:
+        async with uow:
+            return (
+                await uow.products.get_products_version(),
+                await uow.products.get_categories_version(),
+                await uow.inventory.get_version(),
+            )
+
+    seen = [await versions()]
+    async with uow:
+        await uow.products.add_category(cat)
+    seen.append(await versions())
+    async with uow:
+        await uow.products.create_product(prod)
+        await uow.products.update_product(prod)
+    seen.append(await versions())
+
+    # reads don't count
+    async with uow:
+        await uow.products.get_products()
+    assert await versions() == seen[-1]
+
+    # deleting the category clears the product's, a write to products too
+    async with uow:
+        await uow.session.execute(text("delete from product_categories"))
+    seen.append(await versions())
+
+    products, categories, _ = zip(*seen)
+    assert categories[0] < categories[1] == categories[2] < categories[3]
+    assert products[0] == products[1] < products[2] < products[3]
+
+
+@pytest.mark.asyncio
+async def test_search_products(database_creation):
+    uow = SQLAlchemyUnitOfWork()
+
+    def product(name: str, description: str) -> Product:
+        return Product(str(uuid.uuid4()), name, None, description, 1.0)
+
+    phone = product("Smartphone X", "a phone with a great camera")
+    camera = product("Camera Pro", "mirrorless")
+    case = product("Phone case", "fits the Smartphone X")
+    async with uow:
+        for p in (phone, camera, case):
+            await uow.products.create_product(p)
+
+    async def names(query: str, limit: int = 10, after=None) -> list[str]:
+        async with uow:
+            matches = await uow.products.search_products(query, limit, after)
+        return [m.product.name for m in matches]
+
+    # name matches rank above description ones, words match as prefixes
+    assert await names("camera") == ["Camera Pro", "Smartphone X"]
+    assert await names("smart") == ["Smartphone X", "Phone case"]
+    assert await names("phone camera") == ["Smartphone X"]
+    assert await names("!!") == []
+
+    # pages follow each other by (score, id)
+    async with uow:
+        first = await uow.products.search_products("smart", 1)
+    assert await names("smart", 10, (first[0].score, first[0].product.id)) == ["Phone case"]
+
+    # the search vector follows updates
+    async with uow:
+        await uow.products.update_product(Product(camera.id, "Lens", None, "", 1.0))
+    assert await names("camera") == ["Smartphone X"]
+
+    async with uow:
+        has_trigrams = await uow.products._has_trigrams()
+    if has_trigrams:
+        assert (await names("smartphnoe"))[:1] == ["Smartphone X"]
+
+
+@pytest.mark.asyncio
+async def test_upsert_products(database_creation):
+    uow = SQLAlchemyUnitOfWork()
+    cat = ProductCategory(id=str(uuid.uuid4()), name="Bulk", description=None)
+    other = ProductCategory(id=str(uuid.uuid4()), name="Bulk other", description=None)
+    products = [
+        Product(id=str(uuid.uuid4()), name=f"Bulk {i}", category_id=cat.id, description="", price=i)
+        for i in range(3)
+    ]
+
+    async with uow:
+        await uow.products.add_category(cat)
+        await uow.products.add_category(other)
+        assert await uow.products.existing_category_ids([cat.id, "nope", str(uuid.uuid4())]) == {
+            cat.id
+        }
+
+    async with uow:
+        saved = await uow.products.upsert_products(products[:2])
+        assert uow.products.changed_products == [p.id for p in products[:2]]
+    assert saved == products[:2]
+
+    # the existing ones are updated, the others created, in the same statement
+    renamed = Product(products[0].id, "Renamed", other.id, "now searchable", 9.0)
+    async with uow:
+        current = await uow.products.get_product_categories([p.id for p in products] + ["nope"])
+        await uow.products.upsert_products([renamed, products[2]])
+    assert current == {products[0].id: cat.id, products[1].id: cat.id}
+
+    async with uow:
+        listed = {p.id: p for p in await uow.products.get_products()}
+        matches = await uow.products.search_products("searchable", 10)
+    assert listed == {p.id: p for p in [renamed, products[1], products[2]]}
+    assert [m.product for m in matches] == [renamed]
+
+
+@pytest.mark.asyncio
+async def test_get_products_by_ids(database_creation):
+    uow = SQLAlchemyUnitOfWork()
+    products = [
+        Product(id=str(uuid.uuid4()), name=f"Many {i}", category_id=None, description="", price=i)
+        for i in range(3)
+    ]
+    async with uow:
+        await uow.products.upsert_products(products)
+
+    ids = [products[2].id, "not-a-uuid", str(uuid.uuid4()), products[0].id, products[2].id]
+    async with uow:
+        found = await uow.products.get_products_by_ids(ids)
+        assert await uow.products.get_products_by_ids([]) == []
+    assert sorted(found, key=lambda p: p.name) == [products[0], products[2]]
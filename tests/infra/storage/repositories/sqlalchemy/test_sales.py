@@ -1,11 +1,14 @@
 # tests/infra/storage/repositories/test_sales.py
 import uuid
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 
 import pytest
+from sqlalchemy import select, update
 
 from src.domain.product.models import Product, ProductCategory
-from src.domain.sales.models import Sale
+from src.domain.sales.models import Sale, SalesBucket, SalesSummary, SalesTotal
+from src.infra.storage.models.sales import SalesDailyRollup
+from src.services.product.service import ProductService
 from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
 
 
@@ -195,3 +198,526 @@ async def test_get_sales_by_category(database_creation):
     assert len(out) == 1
     assert out[0].id == s1.id
     assert out[0].product_id == p1.id
+
+
+@pytest.mark.asyncio
+async def test_aggregate_sales_by_day(database_creation):
+    """
+    Sales are totalled in the database, in day-wide buckets counted from the start of the range.
+    """
+    uow = SQLAlchemyUnitOfWork()
+
+    cat = ProductCategory(id=str(uuid.uuid4()), name="agg", description=None)
+    p1 = Product(id=str(uuid.uuid4()), name="p1", category_id=cat.id, description="", price=1.0)
+    p2 = Product(id=str(uuid.uuid4()), name="p2", category_id=cat.id, description="", price=1.0)
+
+    start = datetime(2025, 3, 1, 6, tzinfo=timezone.utc)
+    sales = [
+        Sale(str(uuid.uuid4()), p1.id, 1, 10.0, start + timedelta(hours=1)),
+        Sale(str(uuid.uuid4()), p1.id, 2, 20.0, start + timedelta(hours=23)),
+        Sale(str(uuid.uuid4()), p1.id, 3, 30.0, start + timedelta(days=2)),
+        Sale(str(uuid.uuid4()), p2.id, 4, 40.0, start + timedelta(hours=2)),
+    ]
+
+    async with uow:
+        await uow.products.add_category(cat)
+    async with uow:
+        await uow.products.create_product(p1)
+        await uow.products.create_product(p2)
+    async with uow:
+        for sale in sales:
+            await uow.sales.add_sale(sale)
+
+    async with uow:
+        by_product = await uow.sales.aggregate_sales(
+            start, start + timedelta(days=3), "day", product_id=p1.id
+        )
+        by_category = await uow.sales.aggregate_sales(
+            start, start + timedelta(days=3), "week", category_id=cat.id
+        )
+
+    assert by_product == [
+        SalesBucket(start=start, total_price=30.0, quantity=3, count=2),
+        SalesBucket(start=start + timedelta(days=2), total_price=30.0, quantity=3, count=1),
+    ]
+    assert by_category == [SalesBucket(start=start, total_price=100.0, quantity=10, count=4)]
+
+
+@pytest.mark.asyncio
+async def test_daily_rollup_matches_raw_sales(database_creation):
+    """
+    Every sale is folded into the daily rollup, and totals read through the
+    rollup (whole days) plus the raw sales (partial last day) match the raw sales.
+    """
+    uow = SQLAlchemyUnitOfWork()
+
+    cat = ProductCategory(id=str(uuid.uuid4()), name="rollup", description=None)
+    product = Product(id=str(uuid.uuid4()), name="p", category_id=cat.id, description="", price=1.0)
+
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    sales = [
+        Sale(str(uuid.uuid4()), product.id, 1, 10.0, start + timedelta(hours=1)),
+        Sale(str(uuid.uuid4()), product.id, 2, 20.0, start + timedelta(hours=20)),
+        Sale(str(uuid.uuid4()), product.id, 3, 30.0, start + timedelta(days=1, hours=5)),
+        Sale(str(uuid.uuid4()), product.id, 4, 40.0, start + timedelta(days=2, hours=1)),
+        # after the end of the range, on its last (partial) day
+        Sale(str(uuid.uuid4()), product.id, 5, 50.0, start + timedelta(days=2, hours=13)),
+    ]
+
+    async with uow:
+        await uow.products.add_category(cat)
+    async with uow:
+        await uow.products.create_product(product)
+    async with uow:
+        for sale in sales:
+            await uow.sales.add_sale(sale)
+
+    async with uow:
+        rollup = await uow.session.execute(
+            select(SalesDailyRollup.day, SalesDailyRollup.revenue, SalesDailyRollup.count).order_by(
+                SalesDailyRollup.day
+            )
+        )
+        assert [tuple(row) for row in rollup] == [
+            (date(2025, 3, 1), 30.0, 2),
+            (date(2025, 3, 2), 30.0, 1),
+            (date(2025, 3, 3), 90.0, 2),
+        ]
+
+    end = start + timedelta(days=2, hours=12)
+    async with uow:
+        buckets = await uow.sales.aggregate_sales(start, end, "day", category_id=cat.id)
+
+    assert buckets == [
+        SalesBucket(start=start, total_price=30.0, quantity=3, count=2),
+        SalesBucket(start=start + timedelta(days=1), total_price=30.0, quantity=3, count=1),
+        SalesBucket(start=start + timedelta(days=2), total_price=40.0, quantity=4, count=1),
+    ]
+
+    # rebuilding from the raw sales gives the same rollup
+    async with uow:
+        assert await uow.sales.backfill_daily_rollup(date(2025, 3, 1), date(2025, 3, 3)) == 3
+    async with uow:
+        assert await uow.sales.aggregate_sales(start, end, "day", category_id=cat.id) == buckets
+
+
+@pytest.mark.asyncio
+async def test_aggregate_sales_periods_in_one_query(database_creation):
+    """
+    Totalling several periods at once gives the same buckets as totalling each of them,
+    whether or not their start lets them read the rollup.
+    """
+    uow = SQLAlchemyUnitOfWork()
+
+    cat = ProductCategory(id=str(uuid.uuid4()), name="periods", description=None)
+    product = Product(id=str(uuid.uuid4()), name="p", category_id=cat.id, description="", price=1.0)
+
+    base = datetime(2025, 3, 3, tzinfo=timezone.utc)
+    sales = [
+        Sale(str(uuid.uuid4()), product.id, i % 3 + 1, 10.0 * i, base + timedelta(hours=7 * i))
+        for i in range(60)
+    ]
+
+    async with uow:
+        await uow.products.add_category(cat)
+    async with uow:
+        await uow.products.create_product(product)
+    async with uow:
+        for sale in sales:
+            await uow.sales.add_sale(sale)
+
+    length = timedelta(days=3, hours=12)
+    starts = [base, base + timedelta(days=4), base + timedelta(days=8, hours=5), base]
+    periods = [(start, start + length) for start in starts]
+
+    async with uow:
+        series = await uow.sales.aggregate_sales_periods(periods, "day", category_id=cat.id)
+        expected = [
+            await uow.sales.aggregate_sales(start, end, "day", category_id=cat.id)
+            for start, end in periods
+        ]
+
+    assert series == expected
+    assert all(series)
+    assert series[0] == series[3]
+
+
+@pytest.mark.asyncio
+async def test_top_sales(database_creation):
+    """
+    Products and categories are ranked in the database, through the rollup for whole days
+    and the raw sales otherwise, with the same totals either way.
+    """
+    uow = SQLAlchemyUnitOfWork()
+
+    cats = [ProductCategory(id=str(uuid.uuid4()), name=f"c{i}", description=None) for i in range(2)]
+    products = [Product(str(uuid.uuid4()), f"p{i}", cats[i % 2].id, "", 1.0) for i in range(4)]
+
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    sales = [
+        Sale(
+            str(uuid.uuid4()),
+            products[i % 4].id,
+            i % 3 + 1,
+            10.0 * (i % 5),
+            start + timedelta(hours=5 * i),
+        )
+        for i in range(40)
+    ]
+
+    async with uow:
+        for cat in cats:
+            await uow.products.add_category(cat)
+    async with uow:
+        for product in products:
+            await uow.products.create_product(product)
+    async with uow:
+        for sale in sales:
+            await uow.sales.add_sale(sale)
+
+    def expected(start, end, metric, group_by, n):
+        totals = {}
+        for sale in sales:
+            if not start <= sale.created_at <= end:
+                continue
+            product = next(p for p in products if p.id == sale.product_id)
+            key = sale.product_id if group_by == "product" else product.category_id
+            total = totals.setdefault(key, SalesTotal(key, 0.0, 0, 0))
+            total.total_price += sale.total_price
+            total.quantity += sale.quantity
+            total.count += 1
+        ranked = sorted(totals.values(), key=lambda t: (-t.metric(metric), t.id))
+        return ranked[:n]
+
+    # from a midnight and from the middle of a day, whole days through the rollup either way
+    for first in (start, start + timedelta(hours=7)):
+        last = start + timedelta(days=6, hours=3)
+        for metric in ("revenue", "quantity", "count"):
+            for group_by in ("product", "category"):
+                async with uow:
+                    top = await uow.sales.top_sales(first, last, metric, 3, group_by)
+                assert top == expected(first, last, metric, group_by, 3)
+
+    async with uow:
+        in_category = await uow.sales.top_sales(category_id=cats[1].id, n=10)
+    assert {t.id for t in in_category} == {products[1].id, products[3].id}
+
+    # the rollup is what the whole days are read from, even when the range starts mid-day
+    async with uow:
+        await uow.session.execute(
+            update(SalesDailyRollup)
+            .where(SalesDailyRollup.day == date(2025, 3, 3))
+            .where(SalesDailyRollup.product_id == products[0].id)
+            .values(count=SalesDailyRollup.count + 100)
+        )
+        top = await uow.sales.top_sales(start + timedelta(hours=7), last, "count", 1)
+    counted = {
+        t.id: t.count for t in expected(start + timedelta(hours=7), last, "count", "product", 4)
+    }
+    assert [(t.id, t.count) for t in top] == [(products[0].id, counted[products[0].id] + 100)]
+
+
+@pytest.mark.asyncio
+async def test_summarize_sales(database_creation):
+    """
+    The summary matches the sales between the dates, read through the rollup or not.
+    """
+    uow = SQLAlchemyUnitOfWork()
+
+    cat = ProductCategory(id=str(uuid.uuid4()), name="summary", description=None)
+    products = [Product(str(uuid.uuid4()), f"p{i}", cat.id, "", 1.0) for i in range(2)]
+
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    sales = [
+        Sale(str(uuid.uuid4()), products[i % 2].id, i + 1, 1.5 * i, start + timedelta(hours=9 * i))
+        for i in range(12)
+    ]
+
+    async with uow:
+        await uow.products.add_category(cat)
+    async with uow:
+        for product in products:
+            await uow.products.create_product(product)
+    async with uow:
+        for sale in sales:
+            await uow.sales.add_sale(sale)
+
+    def expected(first, last, product_id=None):
+        matching = [
+            s for s in sales if first <= s.created_at <= last and product_id in (None, s.product_id)
+        ]
+        return SalesSummary(
+            count=len(matching),
+            quantity=sum(s.quantity for s in matching),
+            total_price=sum(s.total_price for s in matching),
+        )
+
+    last = start + timedelta(days=3, hours=2)
+    async with uow:
+        for first in (start, start + timedelta(hours=8)):
+            assert await uow.sales.summarize_sales(first, last) == expected(first, last)
+            assert await uow.sales.summarize_sales(first, last, products[1].id, cat.id) == expected(
+                first, last, products[1].id
+            )
+
+        assert await uow.sales.summarize_sales(category_id=cat.id) == expected(
+            start, sales[-1].created_at
+        )
+        assert await uow.sales.summarize_sales(start - timedelta(days=9), start) == (
+            SalesSummary(count=1, quantity=1, total_price=0.0)
+        )
+        assert await uow.sales.summarize_sales(end_date=start - timedelta(days=1)) == (
+            SalesSummary(count=0, quantity=0, total_price=0.0)
+        )
+
+    # whole days are read from the rollup even when the range starts mid-day
+    async with uow:
+        await uow.session.execute(
+            update(SalesDailyRollup)
+            .where(SalesDailyRollup.day == date(2025, 3, 2))
+            .values(count=SalesDailyRollup.count + 100)
+        )
+        summary = await uow.sales.summarize_sales(start + timedelta(hours=8), last)
+    assert summary.count == expected(start + timedelta(hours=8), last).count + 100 * 2
+
+
+@pytest.mark.asyncio
+async def test_sales_carry_the_category_of_their_product(database_creation):
+    """
+    The category is copied onto the sale when it is written, and follows the product
+    when it moves to another category.
+    """
+    uow = SQLAlchemyUnitOfWork()
+    service = ProductService(uow)
+
+    first = await service.add_category("first", "")
+    second = await service.add_category("second", "")
+    product = await service.create_product("p", first.id, "", 1.0)
+
+    async with uow:
+        sale = await uow.sales.add_sale(Sale.create(product.id, 1, 1.0))
+    assert sale.category_id == first.id
+
+    async with uow:
+        assert await uow.sales.get_sales_between_dates(category_id=first.id) == [sale]
+
+    await service.update_product(product.id, "p", second.id, "", 1.0)
+
+    async with uow:
+        assert await uow.sales.get_sales_between_dates(category_id=first.id) == []
+        moved = await uow.sales.get_sales_between_dates(category_id=second.id)
+    assert [(s.id, s.category_id) for s in moved] == [(sale.id, second.id)]
+
+
+@pytest.mark.asyncio
+async def test_set_product_categories(database_creation):
+    """Many products' sales move in one update, each to its own category, or to none"""
+    uow = SQLAlchemyUnitOfWork()
+    service = ProductService(uow)
+
+    first = await service.add_category("first", "")
+    second = await service.add_category("second", "")
+    products = [await service.create_product(f"p{i}", first.id, "", 1.0) for i in range(3)]
+
+    async with uow:
+        sales = [await uow.sales.add_sale(Sale.create(p.id, 1, 1.0)) for p in products]
+
+    moves = {products[0].id: second.id, products[1].id: None}
+    async with uow:
+        await uow.sales.set_product_categories(moves)
+        assert uow.sales.recategorized == list(moves.items())
+
+    async with uow:
+        stored = await uow.sales.get_sales_between_dates()
+    assert {s.id: s.category_id for s in stored} == {
+        sales[0].id: second.id,
+        sales[1].id: None,
+        sales[2].id: first.id,
+    }
+
+
+@pytest.mark.asyncio
+async def test_add_sales_in_bulk(database_creation):
+    """
+    Bulk loaded sales get the category of their product and are folded into
+    the daily rollup, on top of what it already had, as if added one by one.
+    """
+    uow = SQLAlchemyUnitOfWork()
+
+    cat = ProductCategory(id=str(uuid.uuid4()), name="bulk", description=None)
+    product = Product(id=str(uuid.uuid4()), name="p", category_id=cat.id, description="", price=1.0)
+    other = Product(id=str(uuid.uuid4()), name="o", category_id=None, description="", price=1.0)
+
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    async with uow:
+        await uow.products.add_category(cat)
+    async with uow:
+        await uow.products.create_product(product)
+        await uow.products.create_product(other)
+    async with uow:
+        await uow.sales.add_sale(Sale(str(uuid.uuid4()), product.id, 1, 10.0, start))
+
+    sales = [
+        Sale(str(uuid.uuid4()), product.id, 2, 20.0, start + timedelta(hours=3)),
+        Sale(str(uuid.uuid4()), product.id, 3, 30.0, start + timedelta(days=1)),
+        Sale(str(uuid.uuid4()), other.id, 4, 40.0, start + timedelta(days=1, hours=2)),
+    ]
+    async with uow:
+        assert await uow.sales.add_sales(sales) == 3
+        assert uow.sales.added == sales
+
+    async with uow:
+        stored = await uow.sales.get_sales_between_dates()
+        assert [(s.quantity, s.category_id) for s in stored] == [
+            (1, cat.id),
+            (2, cat.id),
+            (3, cat.id),
+            (4, None),
+        ]
+
+        rollup = await uow.session.execute(
+            select(SalesDailyRollup.day, SalesDailyRollup.product_id, SalesDailyRollup.count)
+        )
+        rows = {tuple(row) for row in rollup}
+
+    assert rows == {
+        (date(2025, 3, 1), product.id, 2),
+        (date(2025, 3, 2), product.id, 1),
+        (date(2025, 3, 2), other.id, 1),
+    }
+    async with uow:
+        buckets = await uow.sales.aggregate_sales(start, start + timedelta(days=2), "day")
+    assert buckets == [
+        SalesBucket(start=start, total_price=30.0, quantity=3, count=2),
+        SalesBucket(start=start + timedelta(days=1), total_price=70.0, quantity=7, count=2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_add_sales_is_rolled_back_with_its_transaction(database_creation):
+    """
+    The bulk path writes in the transaction of the unit of work, not on its own,
+    even as the first thing it does (the sales have their category, nothing is looked up)
+    """
+    uow = SQLAlchemyUnitOfWork()
+
+    cat = ProductCategory(id=str(uuid.uuid4()), name="c", description=None)
+    product = Product(id=str(uuid.uuid4()), name="p", category_id=cat.id, description="", price=1.0)
+    async with uow:
+        await uow.products.add_category(cat)
+        await uow.products.create_product(product)
+
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    sales = [
+        Sale(str(uuid.uuid4()), product.id, 1, 10.0, start + timedelta(hours=i), cat.id)
+        for i in range(3)
+    ]
+    with pytest.raises(RuntimeError):
+        async with uow:
+            await uow.sales.add_sales(sales)
+            raise RuntimeError
+
+    async with uow:
+        assert await uow.sales.get_sales_between_dates() == []
+        assert (await uow.sales.summarize_sales()).count == 0
+
+
+@pytest.mark.asyncio
+async def test_check_new_sales(database_creation):
+    uow = SQLAlchemyUnitOfWork()
+
+    product = Product(id=str(uuid.uuid4()), name="p", category_id=None, description="", price=1.0)
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    recorded = Sale(str(uuid.uuid4()), product.id, 1, 10.0, start)
+    async with uow:
+        await uow.products.create_product(product)
+    async with uow:
+        await uow.sales.add_sales([recorded])
+
+    unknown = str(uuid.uuid4())
+    sales = [
+        # the same sale, in another timezone
+        Sale(recorded.id, product.id, 1, 10.0, start.astimezone(timezone(timedelta(hours=2)))),
+        # same id, another time: another row of the table
+        Sale(recorded.id, product.id, 1, 10.0, start + timedelta(days=40)),
+        Sale(str(uuid.uuid4()), unknown, 1, 10.0, start),
+    ]
+    async with uow:
+        known, found = await uow.sales.check_new_sales(sales)
+
+    assert known == {product.id}
+    assert found == {(recorded.id, start)}
+
+
+@pytest.mark.asyncio
+async def test_stream_sales_between_dates(database_creation):
+    """
+    Streaming in small batches yields exactly the sales a plain query returns.
+    """
+    uow = SQLAlchemyUnitOfWork()
+
+    cat = ProductCategory(id=str(uuid.uuid4()), name="stream", description=None)
+    product = Product(id=str(uuid.uuid4()), name="p", category_id=cat.id, description="", price=1.0)
+    now = datetime.now(timezone.utc)
+
+    async with uow:
+        await uow.products.add_category(cat)
+    async with uow:
+        await uow.products.create_product(product)
+    async with uow:
+        for i in range(7):
+            await uow.sales.add_sale(
+                Sale(str(uuid.uuid4()), product.id, i + 1, 1.0, now - timedelta(hours=i))
+            )
+
+    start = now - timedelta(hours=4, minutes=30)
+    async with uow:
+        streamed = [
+            sale
+            async for sale in uow.sales.stream_sales_between_dates(
+                start_date=start, category_id=cat.id, batch_size=2
+            )
+        ]
+        expected = await uow.sales.get_sales_between_dates(start_date=start, category_id=cat.id)
+
+    assert len(streamed) == 5
+    assert sorted(streamed, key=lambda s: s.id) == sorted(expected, key=lambda s: s.id)
+
+
+@pytest.mark.asyncio
+async def test_paginate_sales_between_dates(database_creation):
+    """
+    Pages follow (created_at, id), so sales sharing a timestamp are neither skipped nor repeated.
+    """
+    uow = SQLAlchemyUnitOfWork()
+
+    cat = ProductCategory(id=str(uuid.uuid4()), name="pages", description=None)
+    product = Product(id=str(uuid.uuid4()), name="p", category_id=cat.id, description="", price=1.0)
+    now = datetime.now(timezone.utc)
+
+    async with uow:
+        await uow.products.add_category(cat)
+    async with uow:
+        await uow.products.create_product(product)
+    async with uow:
+        for i in range(5):
+            # pairs of sales at the same instant
+            created_at = now - timedelta(hours=i // 2)
+            await uow.sales.add_sale(Sale(str(uuid.uuid4()), product.id, 1, 1.0, created_at))
+
+    pages = []
+    after = None
+    while True:
+        async with uow:
+            page = await uow.sales.get_sales_between_dates(
+                product_id=product.id, limit=2, after=after
+            )
+        if not page:
+            break
+        pages.append(page)
+        after = (page[-1].created_at, page[-1].id)
+
+    assert [len(p) for p in pages] == [2, 2, 1]
+    walked = [s for p in pages for s in p]
+    assert walked == sorted(walked, key=lambda s: (s.created_at, s.id))
+    assert len({s.id for s in walked}) == 5
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from src.infra.storage.catalog_invalidations import (
+    MAX_NOTIFIED_KEYS,
+    PostgresCatalogInvalidations,
+)
+from src.infra.storage.db import get_engine
+from src.services.product.cache import PRODUCTS, CatalogCache
+
+
+async def _eventually(condition) -> None:
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("condition never held")
+
+
+@pytest.mark.asyncio
+async def test_invalidations_reach_the_other_processes(database_creation):
+    # one engine per cache, like two uvicorn workers
+    engines = [get_engine(), get_engine()]
+    caches = [CatalogCache(backend=PostgresCatalogInvalidations(engine)) for engine in engines]
+    for cache in caches:
+        await cache.start()
+
+    try:
+        for cache in caches:
+            for key in (("product", "a"), ("product", "b"), PRODUCTS):
+                cache.put(key, key[1], cache.generation)
+
+        await caches[0].backend.publish([("product", "a"), PRODUCTS])
+        await _eventually(lambda: caches[1].get(("product", "a")) == (False, None))
+        assert caches[1].get(PRODUCTS) == (False, None)
+        assert caches[1].get(("product", "b")) == (True, "b")
+
+        # the sender isn't told about its own invalidations
+        await asyncio.sleep(0.1)
+        assert caches[0].get(("product", "a")) == (True, "a")
+
+        # too many keys for a notification, everything goes
+        await caches[0].backend.publish([("product", str(i)) for i in range(MAX_NOTIFIED_KEYS + 1)])
+        await _eventually(lambda: caches[1].stats()["size"] == 0)
+    finally:
+        for cache, engine in zip(caches, engines):
+            await cache.stop()
+            await engine.dispose()
@@ -0,0 +1,90 @@
+import json
+import uuid
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+
+from src.domain.product.models import Product, ProductCategory
+from src.domain.sales.models import Sale
+from src.infra.storage.models.sales import Sale as SaleORM
+from src.infra.storage.partitions import create_sales_partitions, expire_sales_partitions
+from src.infra.storage.repositories.sqlalchemy.sales import _filter_sales
+from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
+
+
+def _scanned(plan: dict) -> set[str]:
+    """Relations a plan reads from"""
+    relations = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", []):
+        relations |= _scanned(child)
+    return relations
+
+
+async def _explain(uow: SQLAlchemyUnitOfWork, start: datetime, end: datetime) -> set[str]:
+    # the exact query get_sales_between_dates runs
+    query = _filter_sales(select(SaleORM), start, end)
+    sql = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+
+    async with uow:
+        plan = await uow.session.scalar(text(f"explain (format json) {sql}"))
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return _scanned(plan[0]["Plan"])
+
+
+@pytest.mark.asyncio
+async def test_date_ranges_only_scan_their_partitions(database_creation):
+    uow = SQLAlchemyUnitOfWork()
+    async with uow:
+        await create_sales_partitions(uow.session, date(2025, 1, 1), date(2025, 4, 1))
+
+    feb = await _explain(
+        uow, datetime(2025, 2, 3, tzinfo=timezone.utc), datetime(2025, 2, 9, tzinfo=timezone.utc)
+    )
+    assert feb == {"sales_2025_02"}
+
+    feb_mar = await _explain(
+        uow, datetime(2025, 2, 20, tzinfo=timezone.utc), datetime(2025, 3, 9, tzinfo=timezone.utc)
+    )
+    assert feb_mar == {"sales_2025_02", "sales_2025_03"}
+
+
+@pytest.mark.asyncio
+async def test_new_partition_takes_over_sales_from_default(database_creation):
+    uow = SQLAlchemyUnitOfWork()
+
+    cat = ProductCategory(id=str(uuid.uuid4()), name="c", description=None)
+    product = Product(id=str(uuid.uuid4()), name="p", category_id=cat.id, description="", price=1.0)
+    sale = Sale(str(uuid.uuid4()), product.id, 1, 1.0, datetime(2030, 5, 14, tzinfo=timezone.utc))
+
+    async with uow:
+        await uow.products.add_category(cat)
+        await uow.products.create_product(product)
+    async with uow:
+        # no partition for that month yet
+        await uow.sales.add_sale(sale)
+
+    where = text("select tableoid::regclass::text from sales where id = :id")
+    async with uow:
+        assert await uow.session.scalar(where, {"id": sale.id}) == "sales_default"
+
+    async with uow:
+        created = await create_sales_partitions(uow.session, date(2030, 5, 1), date(2030, 6, 1))
+    assert created == ["sales_2030_05", "sales_2030_06"]
+
+    async with uow:
+        assert await uow.session.scalar(where, {"id": sale.id}) == "sales_2030_05"
+
+    async with uow:
+        expired = await expire_sales_partitions(uow.session, date(2030, 6, 1), drop=True)
+    assert expired[-1] == "sales_2030_05"
+
+    async with uow:
+        assert await uow.sales.get_sales_between_dates(product_id=product.id) == []
+        # the rollup forgot them too, whole days or not
+        for start in (None, datetime(2030, 5, 1, tzinfo=timezone.utc)):
+            summary = await uow.sales.summarize_sales(start, product_id=product.id)
+            assert summary.count == 0
@@ -0,0 +1,32 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from src.domain.sales.models import Sale, SalesBucket
+from src.services.sales.bucketing import bucket_sales
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _sale(created_at: datetime, quantity: int = 1, total_price: float = 10.0) -> Sale:
+    return Sale(
+        id="s", product_id="p", quantity=quantity, total_price=total_price, created_at=created_at
+    )
+
+
+def test_bucket_sales_fixed_step():
+    sales = [
+        _sale(START, 1, 10.0),
+        _sale(START + timedelta(hours=23), 2, 20.0),
+        _sale(START + timedelta(days=2, hours=1), 3, 30.0),
+        # outside of the range
+        _sale(START - timedelta(seconds=1)),
+        _sale(START + timedelta(days=4)),
+    ]
+    random.shuffle(sales)
+
+    buckets = bucket_sales(sales, START, START + timedelta(days=3), timedelta(days=1))
+
+    assert buckets == [
+        SalesBucket(start=START, total_price=30.0, quantity=3, count=2),
+        SalesBucket(start=START + timedelta(days=2), total_price=30.0, quantity=3, count=1),
+    ]
@@ -3,6 +3,7 @@ import pytest
 from src.uow.inmemory import InMemoryUnitOfWork
 from src.services.inventory.service import InventoryService
 from src.domain.inventory.models import InventoryItem
+from src.domain.product.models import Product
 
 
 @pytest.mark.asyncio
@@ -92,3 +93,28 @@ async def test_isolation_between_tests():
     service2 = InventoryService(uow2)
     all_items = await service2.current_inventory_list()
     assert all_items == []
+
+
+@pytest.mark.asyncio
+async def test_batch_inventory_updates():
+    uow = InMemoryUnitOfWork()
+    service = InventoryService(uow)
+
+    # only known products can be adjusted
+    for pid in ("p1", "p2"):
+        await uow.products.create_product(Product.create(pid, "cat", "", 1.0))
+    p1, p2 = await uow.products.get_products()
+
+    results = await service.add_inventory_updates(
+        [(p1.id, 10), (p2.id, 4), ("missing", 3), (p1.id, -2)]
+    )
+
+    assert [r.status for r in results] == ["applied", "applied", "not_found", "applied"]
+    # the resulting stock reflects the whole batch
+    assert results[0].current_quantity == 8
+    assert results[1].current_quantity == 4
+    assert results[2].current_quantity is None
+    assert results[3].current_quantity == 8
+
+    assert (await service.current_inventory(p1.id)).quantity == 8
+    assert await service.current_inventory("missing") is None
@@ -4,6 +4,7 @@ import pytest
 
 from src.uow.inmemory import InMemoryUnitOfWork
 from src.services.product.service import ProductService
+from src.domain.sales.models import Sale
 from src.domain.product.models import Product, ProductCategory
 
 
@@ -132,3 +133,41 @@ async def test_category_endpoints():
     assert got1 and got1.name == "Alpha"
     got2 = await service.get_category(c2.id)
     assert got2 and got2.description == "second"
+
+
+@pytest.mark.asyncio
+async def test_save_products_in_chunks():
+    uow = InMemoryUnitOfWork()
+    service = ProductService(uow)
+
+    old = await service.add_category("Old", "")
+    new = await service.add_category("New", "")
+    moved = await service.create_product("Mug", old.id, "", 1.0)
+    sale = await uow.sales.add_sale(Sale.create(moved.id, 1, 1.0, category_id=old.id))
+
+    fresh = Product.create("Bottle", new.id, "", 2.0)
+    results = await service.save_products(
+        [
+            Product(moved.id, "Blue mug", old.id, "", 1.0),
+            fresh,
+            Product.create("Lost", "no-such-category", "", 3.0),
+            Product(moved.id, "Blue mug", new.id, "", 1.5),
+        ],
+        chunk_size=2,
+    )
+
+    assert [(r.id, r.status) for r in results] == [
+        (moved.id, "duplicate"),
+        (fresh.id, "created"),
+        (results[2].id, "unknown_category"),
+        (moved.id, "updated"),
+    ]
+    assert (await service.get_product(moved.id)).price == pytest.approx(1.5)
+    assert await service.get_product(fresh.id) == fresh
+    assert await service.get_product(results[2].id) is None
+
+    # the last write wins, and the sales follow the product to its new category
+    assert sale.category_id == new.id
+    async with uow:
+        matches = await uow.products.search_products("blue", 10)
+    assert [m.product.id for m in matches] == [moved.id]
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.services.product.cache import PRODUCTS, CatalogCache, changed_keys
+from src.services.product.service import ProductService
+from src.uow.inmemory import InMemoryUnitOfWork
+
+NOW = datetime(2025, 1, 10, 12, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_catalog_reads_go_through_the_cache():
+    uow = InMemoryUnitOfWork()
+    cache = CatalogCache()
+    service = ProductService(uow, cache)
+
+    category = await service.add_category("c", "")
+    product = await service.create_product("p", category.id, "", 1.0)
+
+    assert await service.get_product(product.id) == product
+    assert await service.get_products() == [product]
+    assert await service.get_category(category.id) == category
+    assert await service.get_categories() == [category]
+    assert (cache.hits, cache.misses) == (0, 4)
+
+    # changed behind the cache's back, still served from it
+    await service.update_product(product.id, "renamed", category.id, "", 2.0)
+    assert (await service.get_product(product.id)).name == "p"
+    assert (await service.get_products())[0].name == "p"
+    assert (cache.hits, cache.misses) == (2, 4)
+
+    # what the after-commit hook does with the update
+    cache.invalidate(changed_keys([product.id], []))
+    assert (await service.get_product(product.id)).name == "renamed"
+    assert (await service.get_products())[0].name == "renamed"
+    assert await service.get_category(category.id) == category
+    assert (cache.hits, cache.misses) == (3, 6)
+
+    # unknown products are cached too, until something is written under their id
+    assert await service.get_product("missing") is None
+    assert await service.get_product("missing") is None
+    assert (cache.hits, cache.misses) == (4, 7)
+    assert cache.stats()["hit_ratio"] == pytest.approx(4 / 11)
+
+
+def test_entries_expire_and_are_evicted():
+    cache = CatalogCache(max_size=2, ttl=timedelta(seconds=10))
+
+    cache.put(("product", "a"), "a", cache.generation, NOW)
+    cache.put(("product", "b"), "b", cache.generation, NOW)
+    assert cache.get(("product", "a"), NOW) == (True, "a")
+
+    # b is the least recently used
+    cache.put(("product", "c"), "c", cache.generation, NOW)
+    assert cache.get(("product", "b"), NOW) == (False, None)
+    assert cache.get(("product", "a"), NOW + timedelta(seconds=9)) == (True, "a")
+    assert cache.get(("product", "a"), NOW + timedelta(seconds=10)) == (False, None)
+
+
+def test_reads_across_an_invalidation_are_not_stored():
+    cache = CatalogCache()
+
+    generation = cache.generation
+    cache.invalidate([("product", "a"), PRODUCTS])
+    cache.put(("product", "a"), "stale", generation, NOW)
+    assert cache.get(("product", "a"), NOW) == (False, None)
+
+    # None drops everything
+    cache.put(("product", "a"), "a", cache.generation, NOW)
+    cache.invalidate(None)
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_versioned_lists_are_read_again_at_a_new_version():
+    uow = InMemoryUnitOfWork()
+    cache = CatalogCache()
+    service = ProductService(uow, cache)
+
+    await service.create_product("p", None, "", 1.0)
+    version = await service.get_products_version()
+    assert len(await service.get_products(version)) == 1
+    assert len(await service.get_products(version)) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # another process wrote, nothing was invalidated here but the version moved
+    await service.create_product("q", None, "", 1.0)
+    version = await service.get_products_version()
+    assert len(await service.get_products(version)) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
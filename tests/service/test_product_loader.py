@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from src.services.product.cache import CatalogCache
+from src.services.product.service import ProductService
+from src.uow.inmemory import InMemoryUnitOfWork
+
+
+def count_batches(uow: InMemoryUnitOfWork) -> list[list[str]]:
+    """Records the ids of every get_products_by_ids the repository gets"""
+    batches = []
+    get_products_by_ids = uow.products.get_products_by_ids
+
+    async def recorded(product_ids: list[str]):
+        batches.append(product_ids)
+        return await get_products_by_ids(product_ids)
+
+    uow.products.get_products_by_ids = recorded
+    return batches
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_share_a_query():
+    uow = InMemoryUnitOfWork()
+    service = ProductService(uow)
+    category = await service.add_category("c", "")
+    products = [await service.create_product(f"p{i}", category.id, "", 1.0) for i in range(3)]
+    batches = count_batches(uow)
+
+    ids = [p.id for p in products]
+    found = await asyncio.gather(*(service.get_product(i) for i in ids + [ids[0], "missing"]))
+    assert found == products + [products[0], None]
+    assert batches == [ids + ["missing"]]
+
+    # awaited one after the other, one query each
+    assert await service.get_product(ids[0]) == products[0]
+    assert await service.get_product(ids[1]) == products[1]
+    assert len(batches) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_products_by_ids_reads_only_what_isnt_cached():
+    uow = InMemoryUnitOfWork()
+    service = ProductService(uow, CatalogCache())
+    category = await service.add_category("c", "")
+    a, b, c = [await service.create_product(name, category.id, "", 1.0) for name in "abc"]
+    batches = count_batches(uow)
+
+    assert await service.get_product(b.id) == b
+    assert await service.get_products_by_ids([c.id, "missing", b.id, a.id, c.id]) == [c, b, a]
+    assert batches == [[b.id], [c.id, "missing", a.id]]
+
+
+@pytest.mark.asyncio
+async def test_a_failed_batch_fails_its_loads():
+    uow = InMemoryUnitOfWork()
+    service = ProductService(uow)
+
+    async def broken(product_ids: list[str]):
+        raise RuntimeError("database is down")
+
+    uow.products.get_products_by_ids = broken
+    results = await asyncio.gather(
+        service.get_product("a"), service.get_product("b"), return_exceptions=True
+    )
+    assert [str(r) for r in results] == ["database is down"] * 2
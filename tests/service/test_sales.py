@@ -1,12 +1,27 @@
 # tests/services/test_sales_service.py
+import json
+import uuid
 import pytest
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
+from unittest.mock import patch
 
 from src.uow.inmemory import InMemoryUnitOfWork
+from src.domain.pagination import InvalidCursor
+from src.services.product.service import ProductService as ProductCatalog
+from src.services.sales.ingest import read_lines, read_rows, to_sale
 from src.services.sales.service import ProductService, SaleComparison
 
 
+async def _sale_at(
+    service: ProductService, created_at: datetime, product_id: str, quantity: int, price: float
+):
+    """Create a sale through the service, as if it happened at `created_at`"""
+    with patch("src.domain.sales.models.datetime") as mock_datetime:
+        mock_datetime.now.return_value = created_at
+        return await service.create_sale(product_id, quantity, price)
+
+
 @pytest.mark.asyncio
 async def test_get_sales_initially_empty():
     uow = InMemoryUnitOfWork()
@@ -23,15 +38,10 @@ async def test_create_and_get_sales_between_dates_roundtrip():
     service = ProductService(uow)
 
     now = datetime.now(timezone.utc)
-    # create three sales via the service
-    s1 = await service.create_sale("p1", 1, 10.0)
-    s2 = await service.create_sale("p1", 2, 20.0)
-    s3 = await service.create_sale("p2", 1, 5.0)
-
-    # override their created_at so we can reliably query
-    s1.created_at = now - timedelta(days=2)
-    s2.created_at = now - timedelta(days=1)
-    s3.created_at = now
+    # create three sales via the service, at times we can reliably query
+    s1 = await _sale_at(service, now - timedelta(days=2), "p1", 1, 10.0)
+    s2 = await _sale_at(service, now - timedelta(days=1), "p1", 2, 20.0)
+    s3 = await _sale_at(service, now, "p2", 1, 5.0)
 
     # fetch only the last 2 days for product "p1"
     start = now - timedelta(days=2)
@@ -45,6 +55,27 @@ async def test_create_and_get_sales_between_dates_roundtrip():
     assert prices == [10.0, 20.0]
 
 
+@pytest.mark.asyncio
+async def test_get_sales_page_walks_every_sale():
+    uow = InMemoryUnitOfWork()
+    service = ProductService(uow)
+
+    created = [await service.create_sale("p1", i + 1, 1.0) for i in range(5)]
+
+    seen = []
+    page = await service.get_sales_page(limit=2, product_id="p1")
+    seen += page.items
+    while page.next_cursor:
+        page = await service.get_sales_page(limit=2, cursor=page.next_cursor, product_id="p1")
+        seen += page.items
+
+    assert sorted(s.id for s in seen) == sorted(s.id for s in created)
+    assert len(seen) == 5
+
+    with pytest.raises(InvalidCursor):
+        await service.get_sales_page(limit=2, cursor="not-a-cursor")
+
+
 @pytest.mark.asyncio
 async def test_compare_sales_day_granularity():
     uow = InMemoryUnitOfWork()
@@ -58,16 +89,12 @@ async def test_compare_sales_day_granularity():
     second_end = now - timedelta(days=8)
 
     # bucket 1 and 2 in first period
-    a = await service.create_sale("X", 1, 100.0)
-    b = await service.create_sale("X", 1, 200.0)
-    a.created_at = first_start + timedelta(hours=1)
-    b.created_at = first_start + timedelta(days=1, hours=2)
+    await _sale_at(service, first_start + timedelta(hours=1), "X", 1, 100.0)
+    await _sale_at(service, first_start + timedelta(days=1, hours=2), "X", 1, 200.0)
 
     # same shape two periods earlier
-    c = await service.create_sale("X", 1, 10.0)
-    d = await service.create_sale("X", 1, 20.0)
-    c.created_at = second_start + timedelta(hours=3)
-    d.created_at = second_start + timedelta(days=1, hours=4)
+    await _sale_at(service, second_start + timedelta(hours=3), "X", 1, 10.0)
+    await _sale_at(service, second_start + timedelta(days=1, hours=4), "X", 1, 20.0)
 
     comp: List[SaleComparison] = await service.compare_sales(
         first_start=first_start,
@@ -104,10 +131,8 @@ async def test_compare_sales_week_and_month_granularity():
 
     # one sale per week in each period
     for i in range(2):
-        sf = await service.create_sale("Y", 1, 50.0 * (i + 1))
-        ss = await service.create_sale("Y", 1, 5.0 * (i + 1))
-        sf.created_at = first_start + timedelta(weeks=i, hours=1)
-        ss.created_at = second_start + timedelta(weeks=i, hours=2)
+        await _sale_at(service, first_start + timedelta(weeks=i, hours=1), "Y", 1, 50.0 * (i + 1))
+        await _sale_at(service, second_start + timedelta(weeks=i, hours=2), "Y", 1, 5.0 * (i + 1))
 
     # weekly buckets
     weekly = await service.compare_sales(
@@ -138,6 +163,38 @@ async def test_compare_sales_week_and_month_granularity():
     assert monthly[0].time_label == first_start.strftime("%Y-%m")
 
 
+@pytest.mark.asyncio
+async def test_compare_periods_lines_up_every_period():
+    uow = InMemoryUnitOfWork()
+    service = ProductService(uow)
+
+    # this week, the four before it and the same week a year ago
+    this_week = datetime(2025, 6, 2, tzinfo=timezone.utc)
+    starts = [this_week - timedelta(weeks=weeks) for weeks in (0, 1, 2, 3, 4, 52)]
+    periods = [(start, start + timedelta(weeks=1)) for start in starts]
+
+    for index, start in enumerate(starts):
+        await _sale_at(service, start + timedelta(hours=1), "Z", 1, 10.0 * (index + 1))
+        await _sale_at(service, start + timedelta(days=6, hours=1), "Z", 1, 1.0)
+
+    comp = await service.compare_periods(periods, product_id="Z", granularity="day")
+
+    assert len(comp) == 7
+    assert comp[0].time_label == "2025-06-02"
+    assert comp[0].totals == [10.0, 20.0, 30.0, 40.0, 50.0, 60.0]
+    assert comp[3].totals == [0] * 6
+    assert comp[6].totals == [1.0] * 6
+
+    # two periods give the same totals as compare_sales
+    pair = await service.compare_sales(*periods[0], *periods[5], product_id="Z")
+    assert [(c.first_total, c.second_total) for c in pair] == [
+        (c.totals[0], c.totals[5]) for c in comp
+    ]
+
+    with pytest.raises(AssertionError):
+        await service.compare_periods([periods[0], (starts[1], starts[1] + timedelta(days=3))])
+
+
 @pytest.mark.asyncio
 async def test_compare_sales_asserts_on_mismatched_periods():
     uow = InMemoryUnitOfWork()
@@ -151,3 +208,118 @@ async def test_compare_sales_asserts_on_mismatched_periods():
             second_start=now - timedelta(days=3),
             second_end=now,
         )
+
+
+@pytest.mark.asyncio
+async def test_ingest_sales_reports_the_rejected_rows():
+    uow = InMemoryUnitOfWork()
+    service = ProductService(uow)
+    product = await ProductCatalog(uow).create_product("p", None, "", 2.0)
+
+    async def lines():
+        for line in [
+            json.dumps({"product_id": product.id, "quantity": 1, "total_price": 2.0}),
+            "",
+            "not json",
+            json.dumps({"product_id": product.id, "quantity": 0, "total_price": 2.0}),
+            json.dumps({"product_id": str(uuid.uuid4()), "quantity": 1, "total_price": 2.0}),
+            json.dumps(
+                {
+                    "product_id": product.id,
+                    "quantity": 2,
+                    "total_price": 4.0,
+                    "created_at": "2025-03-01T10:00:00",
+                }
+            ),
+            json.dumps({"quantity": 1, "total_price": 2.0}),
+        ]:
+            yield line
+
+    report = await service.ingest_sales(read_rows(lines()), chunk_size=2)
+
+    assert (report.accepted, report.rejected) == (2, 4)
+    assert sorted(error.line for error in report.errors) == [3, 4, 5, 7]
+    assert {error.line: error.message for error in report.errors}[7] == "missing product_id"
+
+    sales = await service.get_sales_between_dates()
+    assert sorted(sale.quantity for sale in sales) == [1, 2]
+    assert datetime(2025, 3, 1, 10, tzinfo=timezone.utc) in {sale.created_at for sale in sales}
+
+
+@pytest.mark.asyncio
+async def test_ingest_sales_rejects_replayed_sales():
+    uow = InMemoryUnitOfWork()
+    service = ProductService(uow)
+    product = await ProductCatalog(uow).create_product("p", None, "", 2.0)
+
+    sale = {
+        "id": str(uuid.uuid4()),
+        "product_id": product.id,
+        "quantity": 1,
+        "total_price": 2.0,
+        "created_at": "2025-03-01T10:00:00Z",
+    }
+
+    async def lines():
+        # twice in the export, then once more when it is sent again
+        for line in [sale, sale, {**sale, "created_at": "2025-03-01T11:00:00Z"}]:
+            yield json.dumps(line)
+
+    first = await service.ingest_sales(read_rows(lines()))
+    assert (first.accepted, first.rejected) == (2, 1)
+    assert [(e.line, e.message) for e in first.errors] == [
+        (2, f"sale {sale['id']} already recorded")
+    ]
+
+    replayed = await service.ingest_sales(read_rows(lines()), chunk_size=2)
+    assert (replayed.accepted, replayed.rejected) == (0, 3)
+    assert len(await service.get_sales_between_dates()) == 2
+
+
+@pytest.mark.asyncio
+async def test_read_csv_rows():
+    async def lines():
+        for line in ["product_id,quantity,total_price", "a,1,2.0\r", "b,1"]:
+            yield line
+
+    rows = [row async for row in read_rows(lines(), "csv")]
+    assert rows == [
+        (2, {"product_id": "a", "quantity": "1", "total_price": "2.0"}),
+        (3, "expected 3 columns, got 2"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_read_lines_across_chunks():
+    async def chunks():
+        # "é" is two bytes, split between the chunks
+        for chunk in [b'{"note":"caf\xc3', b'\xa9"}\n{"note":', b'"\xc3\xa9t\xc3\xa9"}']:
+            yield chunk
+
+    lines = [line async for line in read_lines(chunks())]
+    assert lines == ['{"note":"café"}', '{"note":"été"}']
+
+
+@pytest.mark.parametrize(
+    "values, message",
+    [
+        ({"quantity": 2.9}, "quantity must be a whole number"),
+        ({"quantity": True}, "quantity must be a whole number"),
+        ({"quantity": "2.9"}, "invalid literal for int() with base 10: '2.9'"),
+        ({"total_price": float("nan")}, "total_price must be a finite number"),
+        ({"total_price": "Infinity"}, "total_price must be a finite number"),
+        ({"total_price": "-inf"}, "total_price must be a finite number"),
+    ],
+)
+def test_to_sale_rejects_what_it_would_otherwise_store_wrong(values, message):
+    row = {"product_id": str(uuid.uuid4()), "quantity": 2, "total_price": 4.0, **values}
+    with pytest.raises(ValueError) as exc:
+        to_sale(row)
+    assert str(exc.value) == message
+
+
+def test_to_sale_reads_json_and_csv_quantities():
+    product_id = str(uuid.uuid4())
+    for quantity in (3, 3.0, "3"):
+        sale = to_sale({"product_id": product_id, "quantity": quantity, "total_price": "4.5"})
+        assert (sale.quantity, sale.total_price) == (3, 4.5)
@@ -0,0 +1,157 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from src.domain.product.models import Product, ProductCategory
+from src.domain.sales.models import Sale, SalesBucket
+from src.services.sales.cache import SalesBucketCache
+from src.services.sales.service import ProductService
+from src.uow.inmemory import InMemoryUnitOfWork
+from src.uow.sqlalchemy import SQLAlchemyUnitOfWork
+
+DAY = timedelta(days=1)
+
+
+@pytest.mark.asyncio
+async def test_past_buckets_are_read_once():
+    uow = InMemoryUnitOfWork()
+    cache = SalesBucketCache()
+    service = ProductService(uow, cache)
+
+    start = datetime(2025, 1, 6, tzinfo=timezone.utc)
+    async with uow:
+        for day in range(14):
+            await uow.sales.add_sale(
+                Sale(f"s{day}", "p", 1, 10.0 * day, start + day * DAY + timedelta(hours=1))
+            )
+
+    periods = [(start, start + 7 * DAY), (start + 7 * DAY, start + 14 * DAY)]
+    first = await service.compare_periods(periods, product_id="p")
+    assert (cache.hits, cache.misses) == (0, 14)
+
+    # the first week is also a week of the same product and granularity
+    pair = await service.compare_sales(*periods[1], *periods[0], product_id="p")
+    assert (cache.hits, cache.misses) == (14, 14)
+
+    assert [c.totals for c in first] == [[c.second_total, c.first_total] for c in pair]
+    assert first[0].totals == [0.0, 70.0]
+
+
+@pytest.mark.asyncio
+async def test_compare_sales_reads_what_is_missing_from_snapshot_readers():
+    uow = InMemoryUnitOfWork()
+    service = ProductService(uow, SalesBucketCache())
+
+    start = datetime(2025, 1, 6, tzinfo=timezone.utc)
+    async with uow:
+        for day in range(14):
+            await uow.sales.add_sale(Sale(f"s{day}", "p", 1, 10.0 * day, start + day * DAY))
+
+    periods = (start, start + 7 * DAY, start + 7 * DAY, start + 14 * DAY)
+    with patch.object(uow, "snapshot_readers", wraps=uow.snapshot_readers) as readers:
+        # both weeks are missing, each is aggregated by a reader of its own
+        cold = await service.compare_sales(*periods, product_id="p")
+        readers.assert_called_once_with(2)
+
+        # and neither is anymore
+        warm = await service.compare_sales(*periods, product_id="p")
+        readers.assert_called_once()
+
+    assert cold == warm
+    assert [c.second_total - c.first_total for c in cold] == [70.0] * 7
+
+
+def test_sales_drop_the_buckets_they_land_in():
+    now = datetime(2025, 1, 10, 12, tzinfo=timezone.utc)
+    today, last_week = now.replace(hour=0), now.replace(hour=0) - 7 * DAY
+    cache = SalesBucketCache(settle=timedelta(minutes=1))
+
+    def stored(product_id, start):
+        return cache.cached(product_id, None, "day", start, start + DAY, now)[1] > start
+
+    for product_id in ("a", "b"):
+        for start in (today, last_week):
+            bucket = SalesBucket(start=start, total_price=1.0, quantity=1, count=1)
+            cache.store(product_id, None, "day", start, start + DAY, [bucket], now, 0)
+
+    # only the open bucket of the sale's product is looked at
+    cache.invalidate([Sale("s1", "a", 1, 1.0, now)])
+    assert not stored("a", today)
+    assert stored("b", today) and stored("a", last_week)
+    assert cache.open.keys() == {("b", None, "day", today)}
+
+    # a backdated sale reaches the settled buckets too
+    cache.invalidate([Sale("s2", "b", 1, 1.0, last_week + timedelta(hours=3))])
+    assert not stored("b", last_week)
+    assert stored("a", last_week)
+
+    # nor is a read that started before an invalidation kept
+    cache.store("a", None, "day", today, today + DAY, [], now, cache.generation - 1)
+    assert not stored("a", today)
+
+
+@pytest.mark.asyncio
+async def test_deleted_and_recategorized_products_drop_their_buckets(database_creation):
+    cache = SalesBucketCache()
+    service = ProductService(SQLAlchemyUnitOfWork(after_commit=[cache.record_committed]), cache)
+
+    cats = [ProductCategory(id=str(uuid.uuid4()), name=f"c{i}", description=None) for i in range(2)]
+    products = [Product(str(uuid.uuid4()), f"p{i}", cats[0].id, "", 1.0) for i in range(2)]
+    start = datetime(2025, 1, 6, tzinfo=timezone.utc)
+
+    async with service.uow as uow:
+        for cat in cats:
+            await uow.products.add_category(cat)
+        for product in products:
+            await uow.products.create_product(product)
+    async with service.uow as uow:
+        for day in range(7):
+            for product in products:
+                sale = Sale(str(uuid.uuid4()), product.id, 1, 10.0, start + day * DAY)
+                await uow.sales.add_sale(sale)
+
+    async def totals(**filters):
+        (comparison,) = await service.compare_periods(
+            [(start, start + 7 * DAY)], granularity="week", **filters
+        )
+        return comparison.totals[0]
+
+    # settled long ago, they'd be cached until evicted
+    assert [await totals(category_id=cats[0].id), await totals(category_id=cats[1].id)] == [
+        140.0,
+        0.0,
+    ]
+    assert [await totals(product_id=products[0].id), await totals()] == [70.0, 140.0]
+
+    # the product moves to the other category, along with its sales
+    async with service.uow as uow:
+        products[0].category_id = cats[1].id
+        await uow.products.update_product(products[0])
+        await uow.sales.set_product_category(products[0].id, cats[1].id)
+    assert [await totals(category_id=cats[0].id), await totals(category_id=cats[1].id)] == [
+        70.0,
+        70.0,
+    ]
+
+    # and go away with it
+    async with service.uow as uow:
+        await uow.products.delete_product(products[0].id)
+    assert await totals(category_id=cats[1].id) == 0.0
+    assert [await totals(product_id=products[0].id), await totals()] == [0.0, 70.0]
+    assert await totals(product_id=products[1].id) == 70.0
+
+
+def test_least_recently_used_buckets_are_evicted():
+    now = datetime(2025, 1, 10, tzinfo=timezone.utc)
+    start = now - 30 * DAY
+    cache = SalesBucketCache(max_size=10)
+
+    cache.store(None, None, "day", start, start + 8 * DAY, [], now, 0)
+    cache.cached(None, None, "day", start, start + DAY, now)
+    cache.store(None, None, "day", start + 8 * DAY, start + 12 * DAY, [], now, 0)
+
+    assert len(cache.buckets) == 10
+    assert (None, None, "day", start) in cache.buckets
+    assert (None, None, "day", start + DAY) not in cache.buckets
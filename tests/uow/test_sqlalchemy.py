@@ -0,0 +1,97 @@
+import uuid
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.domain.product.models import ProductCategory
+from src.uow.sqlalchemy import ReadOnlySQLAlchemyUnitOfWork, SQLAlchemyUnitOfWork
+
+
+@pytest.mark.asyncio
+async def test_read_only_uow_reads_committed_data(read_session_factory):
+    """
+    Data written through the regular unit of work is visible to the read-only one.
+    """
+    category = ProductCategory(id=str(uuid.uuid4()), name="cat", description=None)
+
+    async with SQLAlchemyUnitOfWork() as uow:
+        await uow.products.add_category(category)
+
+    async with ReadOnlySQLAlchemyUnitOfWork(read_session_factory) as read_uow:
+        fetched = await read_uow.products.get_category(category.id)
+
+    assert fetched == category
+
+
+@pytest.mark.asyncio
+async def test_read_only_uow_rejects_writes(read_session_factory):
+    """
+    The transaction is opened READ ONLY, so postgres refuses any write.
+    """
+    category = ProductCategory(id=str(uuid.uuid4()), name="cat", description=None)
+
+    with pytest.raises(DBAPIError, match="read-only transaction"):
+        async with ReadOnlySQLAlchemyUnitOfWork(read_session_factory) as read_uow:
+            await read_uow.products.add_category(category)
+
+
+@pytest.mark.asyncio
+async def test_consistency_token_round_trip(read_session_factory):
+    """
+    A tracked write hands out its WAL position, which a read-only unit of work accepts.
+    """
+    category = ProductCategory(id=str(uuid.uuid4()), name="cat", description=None)
+
+    write_uow = SQLAlchemyUnitOfWork(track_consistency=True)
+    async with write_uow:
+        await write_uow.products.add_category(category)
+
+    assert write_uow.consistency_token is not None
+    assert "/" in write_uow.consistency_token
+
+    read_uow = ReadOnlySQLAlchemyUnitOfWork(
+        read_session_factory, consistency_token=write_uow.consistency_token
+    )
+    assert read_uow.consistency_token == write_uow.consistency_token
+
+    async with read_uow:
+        assert await read_uow.products.get_category(category.id) == category
+
+
+def test_invalid_consistency_token_is_ignored():
+    # an unbound factory, nothing is read
+    read_uow = ReadOnlySQLAlchemyUnitOfWork(
+        async_sessionmaker(), consistency_token="'; drop table sales; --"
+    )
+    assert read_uow.consistency_token is None
+
+
+@pytest.mark.asyncio
+async def test_snapshot_readers_share_a_snapshot(read_session_factory):
+    """
+    Readers run on their own connections, and all of them miss what got committed after the export.
+    """
+    before = ProductCategory(id=str(uuid.uuid4()), name="before", description=None)
+    after = ProductCategory(id=str(uuid.uuid4()), name="after", description=None)
+
+    async with SQLAlchemyUnitOfWork() as uow:
+        await uow.products.add_category(before)
+
+    async with ReadOnlySQLAlchemyUnitOfWork(read_session_factory) as read_uow:
+        async with read_uow.snapshot_readers(2) as readers:
+            async with SQLAlchemyUnitOfWork() as uow:
+                await uow.products.add_category(after)
+
+            pids = await asyncio.gather(
+                *(r.session.scalar(text("select pg_backend_pid()")) for r in readers)
+            )
+            seen = await asyncio.gather(*(r.products.get_categories() for r in readers))
+
+            with pytest.raises(DBAPIError, match="read-only transaction"):
+                await readers[0].products.add_category(after)
+
+    assert len(set(pids)) == 2
+    assert seen == [[before], [before]]
@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from src.entrypoint.main import app
+from src.infra.config import config
+
+
+def test_connections_are_reused_across_requests(database_creation):
+    # entering the client runs the lifespan, which creates the shared engine
+    with TestClient(app) as client:
+        engine = app.state.engine
+
+        connections = []
+        event.listen(
+            engine.sync_engine,
+            "connect",
+            lambda dbapi_connection, _: connections.append(dbapi_connection),
+        )
+
+        for _ in range(5):
+            resp = client.get("/products/")
+            assert resp.status_code == 200
+
+        # every request borrowed the same pooled connection
+        assert len(connections) == 1
+        assert engine.pool.checkedout() == 0
+
+    # the engine is disposed on shutdown
+    assert not hasattr(app.state, "engine")
+    assert not hasattr(app.state, "session_factory")
+
+
+def test_sales_served_from_memory(database_creation, monkeypatch):
+    monkeypatch.setattr(config.analytics, "sales_in_memory", True)
+
+    with TestClient(app) as client:
+        store = app.state.sales_store
+        assert store.size == 0
+
+        cat = client.post("/categories", json={"name": "c", "description": ""}).json()
+        product = client.post(
+            "/products",
+            json={"name": "p", "category_id": cat["id"], "description": "", "price": 1.0},
+        ).json()
+        resp = client.post(
+            "/sales", json={"product_id": product["id"], "quantity": 2, "total_price": 2.0}
+        )
+        assert resp.status_code == 201
+
+        # appended once committed, and read back from the store
+        assert store.size == 1
+        sale_id = resp.json()["id"]
+        assert store.sales_at(store.select())[0].id == sale_id
+
+        resp = client.get("/sales/between-dates", params={"category_id": cat["id"]})
+        assert [s["id"] for s in resp.json()] == [sale_id]
+
+    assert not hasattr(app.state, "sales_store")
+
+
+def test_compare_sales_cached_until_a_sale_lands(database_creation):
+    with TestClient(app) as client:
+        cat = client.post("/categories", json={"name": "c", "description": ""}).json()
+        product = client.post(
+            "/products",
+            json={"name": "p", "category_id": cat["id"], "description": "", "price": 1.0},
+        ).json()
+        sale = {"product_id": product["id"], "quantity": 1, "total_price": 2.0}
+        client.post("/sales", json=sale)
+
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        params = {
+            "first_start": today.isoformat(),
+            "first_end": (today + timedelta(days=1)).isoformat(),
+            "second_start": (today - timedelta(days=7)).isoformat(),
+            "second_end": (today - timedelta(days=6)).isoformat(),
+            "product_id": product["id"],
+        }
+
+        def compare() -> float:
+            return client.get("/sales/compare", params=params).json()[0]["first_total"]
+
+        assert compare() == 2.0
+        assert compare() == 2.0
+        assert client.get("/metrics").json()["sales_bucket_cache"]["hits"] == 2
+
+        # the open bucket is dropped by the commit of the new sale
+        client.post("/sales", json=sale)
+        assert compare() == 4.0
+
+        stats = client.get("/metrics").json()["sales_bucket_cache"]
+        assert (stats["hits"], stats["misses"]) == (3, 3)
+
+    assert not hasattr(app.state, "sales_cache")
+
+
+@pytest.mark.parametrize("backend", ["local", "postgres"])
+def test_catalog_cached_until_it_changes(database_creation, monkeypatch, backend):
+    monkeypatch.setattr(config.catalog, "cache_backend", backend)
+
+    with TestClient(app) as client:
+        cat = client.post("/categories", json={"name": "c", "description": ""}).json()
+        product = client.post(
+            "/products",
+            json={"name": "p", "category_id": cat["id"], "description": "", "price": 1.0},
+        ).json()
+
+        assert client.get(f"/products/{product['id']}").json()["name"] == "p"
+        assert client.get(f"/products/{product['id']}").json()["name"] == "p"
+        assert [c["id"] for c in client.get("/categories/").json()] == [cat["id"]]
+
+        # the update's commit drops the product and the list, not the categories
+        client.put(
+            f"/products/{product['id']}",
+            json={"name": "q", "category_id": cat["id"], "description": "", "price": 1.0},
+        )
+        assert client.get(f"/products/{product['id']}").json()["name"] == "q"
+        assert [p["name"] for p in client.get("/products/").json()] == ["q"]
+        client.get("/categories/")
+
+        stats = client.get("/metrics").json()["catalog_cache"]
+        assert (stats["hits"], stats["misses"]) == (2, 4)
+
+        other = client.post("/categories", json={"name": "d", "description": ""}).json()
+        assert len(client.get("/categories/").json()) == 2
+
+        client.delete(f"/products/{product['id']}")
+        assert client.get(f"/products/{product['id']}").status_code == 404
+        assert client.get(f"/categories/{other['id']}").json()["name"] == "d"
+
+    assert not hasattr(app.state, "catalog_cache")
+
+
+def test_catalog_cache_skipped_with_a_consistency_token(database_creation):
+    with TestClient(app) as client:
+        cat = client.post("/categories", json={"name": "c", "description": ""}).json()
+        product = client.post(
+            "/products",
+            json={"name": "p", "category_id": cat["id"], "description": "", "price": 1.0},
+        ).json()
+        client.get(f"/products/{product['id']}")
+
+        # a read that has to see its writes goes to the database, the cache isn't even filled
+        headers = {"X-Consistency-Token": "0/16B3748"}
+        for _ in range(2):
+            assert client.get(f"/products/{product['id']}", headers=headers).json()["name"] == "p"
+            client.get("/categories/", headers=headers)
+
+        stats = client.get("/metrics").json()["catalog_cache"]
+        assert (stats["hits"], stats["misses"], stats["size"]) == (0, 1, 1)